@@ -17,9 +17,16 @@ those files or uses, then remove it here.
 After any change, re-run data_pipeline to regenerate all files and re-run these
 checks.
 """
+import numpy as np
+import pandas as pd
+
 from logging_util import get_logger
+
 logger = get_logger(__name__)
 
+# maximum relative change in the total of a column allowed when converting it to float32
+COMPACT_FLOAT_TOLERANCE = 1e-6
+
 
 COLUMNS = {
     "eia923_allocated": {
@@ -325,6 +332,22 @@ COLUMNS = {
         "plant_regression_shift_mw",
         "plant_regression_rsq_adj",
     },
+    "multiyear_gross_to_net_factors": {
+        "plant_id_eia",
+        "subplant_id",
+        "multiyear_subplant_ratio",
+        "multiyear_subplant_shift_mw",
+        "subplant_regression_ratio",
+        "subplant_regression_shift_mw",
+        "subplant_regression_rsq_adj",
+        "subplant_regression_observations",
+        "multiyear_plant_ratio",
+        "multiyear_plant_shift_mw",
+        "plant_regression_ratio",
+        "plant_regression_shift_mw",
+        "plant_regression_rsq_adj",
+        "plant_regression_observations",
+    },
     "shaped_aggregated_plants": {
         "plant_id_eia",
         "report_date",
@@ -457,9 +480,38 @@ def get_dtypes():
     return dtypes_to_use
 
 
-def apply_dtypes(df):
-    """Applies specified dtypes to a dataframe and identifies if a dtype is not specified for a column."""
-    dtypes = get_dtypes()
+def get_compact_dtypes():
+    """
+    Returns a dictionary of the dtypes used by `apply_dtypes(df, compact=True)`, which
+    use less memory than those from `get_dtypes()`: string ids and codes are categorical
+    and float64 columns are float32.
+    """
+    compact_dtypes = {}
+    for col, dtype in get_dtypes().items():
+        if dtype == "str":
+            compact_dtypes[col] = "category"
+        elif dtype == "float64":
+            compact_dtypes[col] = "float32"
+        else:
+            compact_dtypes[col] = dtype
+    return compact_dtypes
+
+
+def apply_dtypes(df, compact=False):
+    """
+    Applies specified dtypes to a dataframe and identifies if a dtype is not specified for a column.
+
+    If `compact` is True, the dtypes from `get_compact_dtypes()` are used to reduce the
+    memory used by large dataframes such as the hourly CEMS data. A column is only
+    converted to float32 if its total is unchanged (see `COMPACT_FLOAT_TOLERANCE`), and
+    `datetime_utc` is converted to an int32 hour ordinal (see `to_hour_ordinal()`) if
+    all of the datetimes are on the hour. Note that grouping by the categorical columns
+    should use `observed=True` to avoid creating groups for every category.
+
+    If `compact` is False, a compact dataframe is converted back to the standard dtypes,
+    including converting an hour ordinal `datetime_utc` back to UTC datetimes.
+    """
+    dtypes = get_compact_dtypes() if compact else get_dtypes()
     datetime_columns = ["datetime_utc", "datetime_local", "report_date"]
     cols_missing_dtypes = [
         col
@@ -471,4 +523,55 @@ def apply_dtypes(df):
             "The following columns do not have dtypes assigned in `column_checks.get_dtypes()`"
         )
         logger.warning(cols_missing_dtypes)
-    return df.astype({col: dtypes[col] for col in df.columns if col in dtypes})
+    if compact:
+        for col in df.columns:
+            if (dtypes.get(col) == "float32") and not can_convert_to_float32(df[col]):
+                logger.warning(
+                    f"Keeping {col} as float64 since its total changes as float32"
+                )
+                dtypes[col] = "float64"
+    df = df.astype({col: dtypes[col] for col in df.columns if col in dtypes})
+    if "datetime_utc" in df.columns:
+        if compact:
+            hour_ordinal = to_hour_ordinal(df["datetime_utc"])
+            if hour_ordinal is not None:
+                df["datetime_utc"] = hour_ordinal
+        elif pd.api.types.is_integer_dtype(df["datetime_utc"]):
+            df["datetime_utc"] = from_hour_ordinal(df["datetime_utc"])
+    return df
+
+
+def can_convert_to_float32(series):
+    """
+    Checks whether the total of `series` as float32 is the same as its float64 total,
+    within a relative tolerance of `COMPACT_FLOAT_TOLERANCE`.
+    """
+    values = series.to_numpy(dtype="float64", na_value=np.NaN)
+    total = np.nansum(values)
+    compact_total = np.nansum(values.astype("float32"), dtype="float64")
+    return abs(compact_total - total) <= COMPACT_FLOAT_TOLERANCE * abs(total)
+
+
+def to_hour_ordinal(datetimes):
+    """
+    Converts a series of datetimes to an int32 series of the number of hours since
+    1970-01-01 00:00 UTC, or returns None if any datetimes are missing or not on the hour.
+
+    Timezone-naive datetimes are assumed to be in UTC. Use `from_hour_ordinal()` to
+    convert the hour ordinal back to UTC datetimes.
+    """
+    if datetimes.isna().any():
+        return None
+    if datetimes.dt.tz is not None:
+        datetimes = datetimes.dt.tz_convert(None)
+    hours, remainder = np.divmod(
+        datetimes.to_numpy(dtype="datetime64[ns]").view("int64"), 3_600_000_000_000
+    )
+    if (remainder != 0).any():
+        return None
+    return pd.Series(hours.astype("int32"), index=datetimes.index, name=datetimes.name)
+
+
+def from_hour_ordinal(hour_ordinal):
+    """Converts a series of hour ordinals from `to_hour_ordinal()` to UTC datetimes."""
+    return pd.to_datetime(hour_ordinal.astype("int64"), unit="h", utc=True)
@@ -5,13 +5,16 @@ import sys
 
 from gridemissions.load import BaData
 from gridemissions.eia_api import KEYS, SRC
-from filepaths import outputs_folder, manual_folder, results_folder
+from filepaths import manual_folder, results_folder
+from load_data import load_intermediate_data
 from logging_util import get_logger
 
 from output_data import (
     GENERATED_EMISSION_RATE_COLS,
     CONSUMED_EMISSION_RATE_COLS,
     output_to_results,
+    parse_csv_file_name,
+    read_csv,
     TIME_RESOLUTIONS,
 )
 
@@ -109,10 +112,9 @@ def get_average_emission_factors(prefix: str, year: int):
 
     Structure: EMISSIONS_FACTORS[poll][adjustment][fuel]
     """
-    genavg = pd.read_csv(
-        outputs_folder(f"{prefix}annual_generation_averages_by_fuel_{year}.csv"),
-        index_col="fuel_category",
-    )
+    genavg = load_intermediate_data(
+        "annual_generation_averages_by_fuel", prefix, year
+    ).set_index("fuel_category")
     efs = {}
     for pol in POLLUTANTS:
         efs[pol] = {}
@@ -204,11 +206,19 @@ class HourlyConsumed:
         year: int,
         small: bool = False,
         skip_outputs: bool = False,
+        include_metric: bool = True,
+        csv_writer: str = "pandas",
+        csv_compression: str = None,
+        results_dataset: bool = False,
     ):
         self.prefix = prefix
         self.year = year
         self.small = small
         self.skip_outputs = skip_outputs
+        self.include_metric = include_metric
+        self.csv_writer = csv_writer
+        self.csv_compression = csv_compression
+        self.results_dataset = results_dataset
 
         # 930 data
         self.eia930 = BaData(eia930_file)
@@ -366,6 +376,10 @@ class HourlyConsumed:
                     f"/carbon_accounting/{time_resolution}/",
                     self.prefix,
                     skip_outputs=self.skip_outputs,
+                    include_metric=self.include_metric,
+                    csv_writer=self.csv_writer,
+                    csv_compression=self.csv_compression,
+                    results_dataset=self.results_dataset,
                 )
         return
 
@@ -398,15 +412,16 @@ class HourlyConsumed:
         for f in os.listdir(
             results_folder(f"{self.prefix}/power_sector_data/hourly/us_units/")
         ):
-            if ".DS_Store" in f:
+            parsed = parse_csv_file_name(f)
+            if parsed is None:
                 continue
-            this_ba = pd.read_csv(
+            ba_name = parsed[0]
+            this_ba = read_csv(
                 results_folder(f"{self.prefix}/power_sector_data/hourly/us_units/") + f,
                 index_col="datetime_utc",
                 parse_dates=True,
             )
             this_ba = this_ba[this_ba.fuel_category == "total"]
-            ba_name = f.replace(".csv", "")
             for adj in ADJUSTMENTS:
                 for pol in POLLUTANTS:
                     this_rate = rates.get((adj, pol), {})
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 import os
+import shutil
+import pyarrow.dataset as ds
 import sqlalchemy as sa
 
 import pudl.analysis.allocate_net_gen as allocate_gen_fuel
@@ -10,13 +12,18 @@ import pudl.output.pudltabl
 import load_data
 import validation
 import emissions
+import output_data
 from emissions import CLEAN_FUELS
 from column_checks import get_dtypes, apply_dtypes
+from keyed_joins import broadcast_join, isin_keys
 from filepaths import manual_folder, outputs_folder, downloads_folder
 from logging_util import get_logger
 
 logger = get_logger(__name__)
 
+# default number of plants cleaned at a time by clean_cems_partitioned()
+CEMS_PLANTS_PER_PARTITION = 200
+
 DATA_COLUMNS = [
     "net_generation_mwh",
     "fuel_consumed_mmbtu",
@@ -943,6 +950,110 @@ def clean_cems(year: int, small: bool, primary_fuel_table, subplant_emission_fac
     if small:
         cems = smallerize_test_data(df=cems, random_seed=42)
 
+    return clean_cems_data(cems, year, primary_fuel_table, subplant_emission_factors)
+
+
+def clean_cems_partitioned(
+    year: int,
+    small: bool,
+    primary_fuel_table,
+    subplant_emission_factors,
+    partition_folder: str,
+    plants_per_partition: int = CEMS_PLANTS_PER_PARTITION,
+):
+    """
+    Cleans the CEMS data in the same way as `clean_cems()`, but loads and cleans the data
+    for `plants_per_partition` plants at a time, so that the peak memory use is limited by
+    the size of each partition rather than the full year of data.
+
+    Each cleaned partition is written as a parquet file to `partition_folder`, which is
+    emptied first. Since every cleaning step only depends on the data for each plant,
+    the partitions together contain the same data as `clean_cems()`, sorted by plant
+    and month. Use `process_cems_partitions()` to prepare the partitions for the rest of
+    the pipeline without loading all of them at once.
+    Returns:
+        a `pyarrow.dataset.Dataset` of the cleaned partitions, which can be loaded with
+        `load_data.load_partitioned_data()`
+    """
+    # get the list of plants in the order that they are loaded by clean_cems()
+    plant_ids = load_data.load_cems_ids(year, year)["plant_id_eia"].unique()
+    if small:
+        plant_ids = smallerize_test_data(
+            df=pd.DataFrame({"plant_id_eia": plant_ids}), random_seed=42
+        )["plant_id_eia"].to_numpy()
+
+    if os.path.exists(partition_folder):
+        shutil.rmtree(partition_folder)
+    os.makedirs(partition_folder)
+
+    partitions = range(0, len(plant_ids), plants_per_partition)
+    for partition_number, start in enumerate(partitions):
+        partition_plant_ids = plant_ids[start : start + plants_per_partition]
+        logger.info(
+            f"Cleaning CEMS data for partition {partition_number + 1} of {len(partitions)}"
+        )
+        cems = load_data.load_cems_data(year, plant_ids=partition_plant_ids)
+        cems = clean_cems_data(
+            cems, year, primary_fuel_table, subplant_emission_factors
+        )
+        # all of the partitions are written with the same schema
+        output_data.write_intermediate_parquet(
+            cems,
+            os.path.join(partition_folder, f"part-{partition_number:04}.parquet"),
+        )
+
+    return ds.dataset(partition_folder, format="parquet")
+
+
+def process_cems_partitions(
+    cems_partitions, path_prefix, year, skip_outputs, file_format="csv"
+):
+    """
+    Prepares the cleaned CEMS partitions from `clean_cems_partitioned()` for the rest of
+    the pipeline, loading the unit-level data for one partition at a time.
+
+    For each partition, this exports the cleaned data to the `cems_cleaned` intermediate
+    file, summarizes the measurement quality, converts the data to compact dtypes (see
+    `apply_dtypes()`), adjusts the emissions for biomass, and aggregates the data to
+    unit-months and to subplants. Only the aggregated data for all of the partitions is
+    held in memory.
+    Returns:
+        cems: the biomass-adjusted data aggregated by `aggregate_cems_to_subplant()`
+        cems_unit_months: the output of `aggregate_cems_to_unit_month()`, which is used
+            in place of the unit-level data to create the plant attributes and identify
+            the hourly data source
+        cems_quality: the output of `validation.summarize_cems_measurement_quality()`
+    """
+    # parquet does not store float16, so re-apply the dtypes after loading
+    partitions = (
+        apply_dtypes(load_data.load_partitioned_data(path))
+        for path in sorted(cems_partitions.files)
+    )
+    cems_subplant = []
+    cems_unit_months = []
+    mass_by_quality = []
+    for cems in output_data.output_intermediate_data_partitioned(
+        partitions, "cems_cleaned", path_prefix, year, skip_outputs, file_format
+    ):
+        mass_by_quality.append(validation.sum_cems_mass_by_measurement_quality(cems))
+        cems = apply_dtypes(cems, compact=True)
+        cems = emissions.adjust_emissions_for_biomass(cems)
+        cems_unit_months.append(aggregate_cems_to_unit_month(cems))
+        cems_subplant.append(aggregate_cems_to_subplant(cems))
+        del cems
+
+    return (
+        pd.concat(cems_subplant, ignore_index=True),
+        pd.concat(cems_unit_months, ignore_index=True),
+        validation.calculate_cems_measurement_quality(mass_by_quality),
+    )
+
+
+def clean_cems_data(cems, year: int, primary_fuel_table, subplant_emission_factors):
+    """
+    Cleans CEMS data loaded by `load_data.load_cems_data()`. This is used by
+    `clean_cems()` and `clean_cems_partitioned()`.
+    """
     # remove non-grid connected plants
     cems = remove_plants(
         cems,
@@ -1041,14 +1152,7 @@ def manually_remove_steam_units(df):
         f"Removing {len(units_to_remove)} units that only produce steam and do not report to EIA"
     )
 
-    df = df.merge(
-        units_to_remove,
-        how="outer",
-        on=["plant_id_eia", "emissions_unit_id_epa"],
-        indicator="source",
-        validate="m:1",
-    )
-    df = df[df["source"] == "left_only"].drop(columns=["source"])
+    df = df[~isin_keys(df, units_to_remove, ["plant_id_eia", "emissions_unit_id_epa"])]
 
     return df
 
@@ -1056,38 +1160,63 @@ def manually_remove_steam_units(df):
 def remove_incomplete_unit_months(cems):
 
     # get a count of how many hours are reported in each month for each unit
-    unit_hours_in_month = (
-        cems[["plant_id_eia", "report_date", "emissions_unit_id_epa", "datetime_utc"]]
-        .groupby(["plant_id_eia", "report_date", "emissions_unit_id_epa"], dropna=False)
-        .count()
-        .reset_index()
+    unit_month_ids, unit_months = get_key_groups(
+        cems, ["plant_id_eia", "report_date", "emissions_unit_id_epa"]
+    )
+    unit_hours_in_month = np.bincount(
+        unit_month_ids,
+        weights=cems["datetime_utc"].notna().to_numpy(),
+        minlength=len(unit_months),
     )
 
     # identify months where there is not complete data
     # The fewest number of hours in a month is 28*24 = 672
-    unit_months_to_remove = unit_hours_in_month[
-        unit_hours_in_month["datetime_utc"] < 600
-    ].drop(columns="datetime_utc")
+    unit_months_to_remove = unit_hours_in_month < 600
 
     logger.info(
-        f"Removing {len(unit_months_to_remove)} unit-months with incomplete hourly data"
+        f"Removing {unit_months_to_remove.sum()} unit-months with incomplete hourly data"
     )
 
-    cems = cems.merge(
-        unit_months_to_remove,
-        how="outer",
-        on=["plant_id_eia", "report_date", "emissions_unit_id_epa"],
-        validate="m:1",
-        indicator="to_remove",
+    cems = cems[~unit_months_to_remove[unit_month_ids]]
+
+    return cems
+
+
+def assign_fuel_type_to_cems(cems, year, primary_fuel_table):
+    """
+    Assigns a fuel type to each observation in CEMS
+
+    All of the sources of fuel codes vary only by unit or unit-month, so the fuel code
+    is assigned to each unique unit-month and then broadcast to the hourly observations.
+    """
+
+    # identify the unique unit-months and the unit-month of each observation
+    unit_month_ids, unit_months = get_key_groups(
+        cems, ["plant_id_eia", "emissions_unit_id_epa", "subplant_id", "report_date"]
+    )
+    # the maximum fuel consumption of each unit-month is used to check whether fuel
+    # consumption is associated with an 'OTH' fuel code
+    unit_months["fuel_consumed_mmbtu"] = (
+        cems["fuel_consumed_mmbtu"].groupby(unit_month_ids).max().to_numpy()
     )
 
-    cems = cems[cems["to_remove"] != "both"].drop(columns="to_remove")
+    unit_months = assign_fuel_type_to_cems_unit_months(
+        unit_months, year, primary_fuel_table
+    )
+
+    cems["energy_source_code"] = unit_months["energy_source_code"].to_numpy()[
+        unit_month_ids
+    ]
 
     return cems
 
 
-def assign_fuel_type_to_cems(cems, year, primary_fuel_table):
-    "Assigns a fuel type to each observation in CEMS"
+def assign_fuel_type_to_cems_unit_months(cems, year, primary_fuel_table):
+    """
+    Assigns a fuel type to each unit-month in CEMS, using (in order of preference) the
+    subplant primary fuel, the fuel of single-fuel plants and plant-months, the plant
+    primary fuel, the fuel of the generator in EIA-860, and the fuel assigned by EPA.
+    """
 
     # merge in the subplant primary fuel type
     cems = cems.merge(
@@ -1284,31 +1413,18 @@ def remove_cems_with_zero_monthly_data(cems):
     cems_with_zero_monthly_emissions = cems_with_zero_monthly_emissions[
         cems_with_zero_monthly_emissions.sum(axis=1) == 0
     ]
-    # add a flag to these observations
-    cems_with_zero_monthly_emissions["missing_data_flag"] = "remove"
-
-    # merge the missing data flag into the cems data
-    cems = cems.merge(
-        cems_with_zero_monthly_emissions.reset_index()[
-            [
-                "plant_id_eia",
-                "emissions_unit_id_epa",
-                "report_date",
-                "missing_data_flag",
-            ]
-        ],
-        how="left",
-        on=["plant_id_eia", "emissions_unit_id_epa", "report_date"],
-        validate="m:1",
+    # identify the observations in these unit-months
+    to_remove = isin_keys(
+        cems,
+        cems_with_zero_monthly_emissions.reset_index(),
+        ["plant_id_eia", "emissions_unit_id_epa", "report_date"],
     )
-    # remove any observations with the missing data flag
+    # remove these observations
     logger.info(
-        f"Removing {len(cems[cems['missing_data_flag'] == 'remove'])} observations from cems for unit-months where no data reported"
+        f"Removing {to_remove.sum()} observations from cems for unit-months where no data reported"
     )
-    validation.check_removed_data_is_empty(cems)
-    cems = cems[cems["missing_data_flag"] != "remove"]
-    # drop the missing data flag column
-    cems = cems.drop(columns="missing_data_flag")
+    validation.check_removed_data_is_empty(cems[to_remove])
+    cems = cems[~to_remove]
 
     return cems
 
@@ -1361,36 +1477,31 @@ def adjust_cems_for_chp(cems, eia923_allocated):
         "plant_fuel_ratio",
     ] = 1
 
-    # merge the fuel ratios into cems and fill missing subplant ratios with plant ratios
-    cems = cems.merge(
-        subplant_fuel_ratio[
-            ["plant_id_eia", "subplant_id", "report_date", "subplant_fuel_ratio"]
-        ],
-        how="left",
-        on=["plant_id_eia", "subplant_id", "report_date"],
-        validate="m:1",
+    # look up the fuel ratios for cems and fill missing subplant ratios with plant ratios
+    cems_subplant_fuel_ratio = pd.Series(
+        broadcast_join(
+            cems,
+            subplant_fuel_ratio,
+            ["plant_id_eia", "subplant_id", "report_date"],
+            ["subplant_fuel_ratio"],
+        )["subplant_fuel_ratio"],
+        index=cems.index,
     )
-    cems = cems.merge(
-        plant_fuel_ratio[["plant_id_eia", "report_date", "plant_fuel_ratio"]],
-        how="left",
-        on=["plant_id_eia", "report_date"],
-        validate="m:1",
-    )
-    cems["subplant_fuel_ratio"] = cems["subplant_fuel_ratio"].fillna(
-        cems["plant_fuel_ratio"]
+    cems_plant_fuel_ratio = broadcast_join(
+        cems, plant_fuel_ratio, ["plant_id_eia", "report_date"], ["plant_fuel_ratio"]
+    )["plant_fuel_ratio"]
+    cems_subplant_fuel_ratio = cems_subplant_fuel_ratio.fillna(
+        pd.Series(cems_plant_fuel_ratio, index=cems.index)
     )
 
     # if there are any missing ratios, assume that the ratio is 1
-    cems["subplant_fuel_ratio"] = cems["subplant_fuel_ratio"].fillna(1)
+    cems_subplant_fuel_ratio = cems_subplant_fuel_ratio.fillna(1)
 
     # calculate fuel_consumed_for_electricity_mmbtu
     cems["fuel_consumed_for_electricity_mmbtu"] = (
-        cems["fuel_consumed_mmbtu"] * cems["subplant_fuel_ratio"]
+        cems["fuel_consumed_mmbtu"] * cems_subplant_fuel_ratio
     )
 
-    # remove intermediate columns
-    cems = cems.drop(columns=["subplant_fuel_ratio", "plant_fuel_ratio"])
-
     # add adjusted emissions columns
     cems = emissions.adjust_fuel_and_emissions_for_CHP(cems)
 
@@ -1698,21 +1809,118 @@ def filter_unique_cems_data(cems, partial_cems):
     partial_cems_subplant_months = partial_cems[
         ["plant_id_eia", "subplant_id", "report_date"]
     ].drop_duplicates()
-    filtered_cems = cems.merge(
-        partial_cems_subplant_months,
-        how="outer",
-        on=["plant_id_eia", "subplant_id", "report_date"],
-        indicator="source",
-        validate="m:1",
-    )
-
-    filtered_cems = filtered_cems[filtered_cems["source"] == "left_only"].drop(
-        columns=["source"]
-    )
+    filtered_cems = cems[
+        ~isin_keys(
+            cems,
+            partial_cems_subplant_months,
+            ["plant_id_eia", "subplant_id", "report_date"],
+        )
+    ]
 
     return filtered_cems
 
 
+def factorize_sorted(values):
+    """Encodes values as dense integer codes that follow the sort order of the values.
+
+    Missing values are given their own code, which is sorted last.
+    Returns the codes and the unique values for each code.
+    """
+    return pd.factorize(values, sort=True, use_na_sentinel=False)
+
+
+def get_key_groups(df, keys):
+    """Identifies the unique combinations of `keys` in `df`.
+
+    Missing key values are treated as values.
+    Returns an array with the integer group id of each row of `df`, and a dataframe of
+    the unique combinations of `keys`, in order of their first appearance in `df`, where
+    group id i identifies row i of the dataframe.
+    """
+    # combine the codes for each key into a single code for each group of keys
+    key_values = {}
+    group_codes = np.zeros(len(df), dtype="int64")
+    for key in keys:
+        codes, key_values[key] = pd.factorize(df[key], use_na_sentinel=False)
+        group_codes = group_codes * len(key_values[key]) + codes
+    group_ids, group_codes = pd.factorize(group_codes)
+
+    # decode the values of each key for each group
+    groups = {}
+    for key in reversed(keys):
+        groups[key] = key_values[key].take(group_codes % len(key_values[key]))
+        group_codes = group_codes // len(key_values[key])
+    return group_ids, pd.DataFrame({key: groups[key] for key in keys})
+
+
+def sum_by_codes(key_codes, key_values, dfs, data_columns):
+    """Sums the data for each unique combination of integer-coded keys.
+
+    This is equivalent to concatenating `dfs` and running
+    `groupby(key_columns, dropna=False)[data_columns].sum().reset_index()`, but the keys
+    are combined into a single integer group code and each data column is summed with
+    `np.bincount`, which is much faster for the large hourly data and does not require
+    the data to be concatenated.
+
+    Args:
+        key_codes: dictionary of {key_column: codes}, where the codes are aligned with
+            the rows of `dfs` and follow the sort order of the key values
+        key_values: dictionary of {key_column: unique values} for each code
+        dfs: list of dataframes containing the data to sum. Missing values and data
+            columns that are missing from a dataframe are treated as zero.
+        data_columns: list of the names of the data columns to sum
+    Returns:
+        dataframe with the key columns and the summed data columns, sorted by the keys
+    """
+    # combine the codes for each key into a single code for each group of keys
+    group_codes = np.zeros(sum(len(df) for df in dfs), dtype="int64")
+    for key, codes in key_codes.items():
+        group_codes = group_codes * len(key_values[key]) + codes
+    group_ids, group_codes = pd.factorize(group_codes, sort=True)
+    number_of_groups = len(group_codes)
+
+    # sum each data column into a single array
+    sums = np.zeros((number_of_groups, len(data_columns)), order="F")
+    for i, column in enumerate(data_columns):
+        start = 0
+        for df in dfs:
+            if column in df.columns:
+                sums[:, i] += np.bincount(
+                    group_ids[start : start + len(df)],
+                    weights=df[column].to_numpy(dtype="float64", na_value=0.0),
+                    minlength=number_of_groups,
+                )
+            start += len(df)
+    result = pd.DataFrame(sums, columns=data_columns, copy=False)
+
+    # decode the values of each key for each group and add them as the first columns
+    for key in reversed(list(key_codes.keys())):
+        result.insert(0, key, key_values[key].take(group_codes % len(key_values[key])))
+        group_codes = group_codes // len(key_values[key])
+
+    return result
+
+
+def sum_by_keys(dfs, key_columns, data_columns):
+    """Sums `data_columns` for each unique combination of `key_columns` in `dfs`.
+
+    Equivalent to concatenating `dfs` and running
+    `groupby(key_columns, dropna=False)[data_columns].sum().reset_index()`, using
+    `sum_by_codes`. Returns an empty dataframe if `dfs` is empty.
+    """
+    if len(dfs) == 0:
+        return pd.DataFrame(columns=key_columns + data_columns).astype(
+            {column: "float64" for column in data_columns}
+        )
+    key_codes = {}
+    key_values = {}
+    for key in key_columns:
+        key_codes[key], key_values[key] = factorize_sorted(
+            pd.concat([df[key] for df in dfs], ignore_index=True)
+        )
+    return sum_by_codes(key_codes, key_values, dfs, data_columns)
+
+
 def aggregate_plant_data_to_ba_fuel(combined_plant_data, plant_attributes_table):
 
     # create a table that has data for the sythetic plant attributes
@@ -1730,29 +1938,41 @@ def aggregate_plant_data_to_ba_fuel(combined_plant_data, plant_attributes_table)
         ],
         axis=0,
     )
+    if combined_plant_attributes["plant_id_eia"].duplicated().any():
+        raise UserWarning(
+            "The plant attributes table contains more than one ba code or fuel_category for some plants."
+        )
 
-    ba_fuel_data = combined_plant_data.merge(
-        combined_plant_attributes, how="left", on=["plant_id_eia"], validate="m:1"
+    # look up the row of the attributes table for each plant, and use it to get the
+    # codes of the ba and fuel of each row of data instead of merging the attributes
+    attribute_row = pd.Index(combined_plant_attributes["plant_id_eia"]).get_indexer(
+        combined_plant_data["plant_id_eia"]
+    )
+    ba_codes, ba_values = factorize_sorted(combined_plant_attributes["ba_code"])
+    fuel_codes, fuel_values = factorize_sorted(
+        combined_plant_attributes["fuel_category"]
     )
     # check that there is no missing ba or fuel codes
-    if (
-        len(
-            ba_fuel_data[
-                (ba_fuel_data["ba_code"].isna())
-                | (ba_fuel_data["fuel_category"].isna())
-            ]
+    if (attribute_row == -1).any():
+        missing_attributes = True
+    else:
+        ba_codes = ba_codes[attribute_row]
+        fuel_codes = fuel_codes[attribute_row]
+        missing_attributes = (
+            ba_values.isna()[ba_codes].any() or fuel_values.isna()[fuel_codes].any()
         )
-        > 0
-    ):
+    if missing_attributes:
         raise UserWarning(
             "The plant attributes table is missing ba code or fuel_category data for some plants. This will result in incomplete power sector results."
         )
-    ba_fuel_data = (
-        ba_fuel_data.groupby(
-            ["ba_code", "fuel_category", "datetime_utc", "report_date"], dropna=False
-        )[DATA_COLUMNS]
-        .sum()
-        .reset_index()
+
+    key_codes = {"ba_code": ba_codes, "fuel_category": fuel_codes}
+    key_values = {"ba_code": ba_values, "fuel_category": fuel_values}
+    for key in ["datetime_utc", "report_date"]:
+        key_codes[key], key_values[key] = factorize_sorted(combined_plant_data[key])
+
+    ba_fuel_data = sum_by_codes(
+        key_codes, key_values, [combined_plant_data], DATA_COLUMNS
     )
     return ba_fuel_data
 
@@ -1795,58 +2015,16 @@ def combine_plant_data(
             cems, partial_cems_subplant, partial_cems_plant, eia_data
         )
 
-    # group data by plant-hour and filter columns
-    cems = (
-        cems.groupby(
-            KEY_COLUMNS,
-            dropna=False,
-        )
-        .sum(numeric_only=True)
-        .reset_index()[[col for col in cems.columns if col in ALL_COLUMNS]]
-    )
-    # don't group if there is no data in the dataframe
-    if len(partial_cems_subplant) > 0:
-        partial_cems_subplant = (
-            partial_cems_subplant.groupby(
-                KEY_COLUMNS,
-                dropna=False,
-            )
-            .sum(numeric_only=True)
-            .reset_index()[
-                [col for col in partial_cems_subplant.columns if col in ALL_COLUMNS]
-            ]
-        )
-    if len(partial_cems_plant) > 0:
-        partial_cems_plant = (
-            partial_cems_plant.groupby(
-                KEY_COLUMNS,
-                dropna=False,
-            )
-            .sum(numeric_only=True)
-            .reset_index()[
-                [col for col in partial_cems_plant.columns if col in ALL_COLUMNS]
-            ]
-        )
-    eia_data = (
-        eia_data.groupby(
-            KEY_COLUMNS,
-            dropna=False,
-        )
-        .sum(numeric_only=True)
-        .reset_index()[[col for col in eia_data.columns if col in ALL_COLUMNS]]
-    )
-
-    # concat together
-    combined_plant_data = pd.concat(
-        [cems, partial_cems_subplant, partial_cems_plant, eia_data],
-        axis=0,
-        ignore_index=True,
-        copy=False,
-    )
-
-    # groupby plant
-    combined_plant_data = (
-        combined_plant_data.groupby(KEY_COLUMNS, dropna=False).sum().reset_index()
+    # sum the data for each plant in case some plant data was split between sources
+    # sources with no data are skipped
+    combined_plant_data = sum_by_keys(
+        [
+            df
+            for df in [cems, partial_cems_subplant, partial_cems_plant, eia_data]
+            if len(df) > 0
+        ],
+        KEY_COLUMNS,
+        DATA_COLUMNS,
     )
 
     combined_plant_data[DATA_COLUMNS] = combined_plant_data[DATA_COLUMNS].round(2)
@@ -2149,7 +2327,41 @@ def add_plant_local_timezone(df, year):
     return df
 
 
+def aggregate_cems_to_unit_month(cems):
+    """
+    Aggregates the fuel consumption in unit-level CEMS data to each unit-month and
+    energy source code.
+
+    This contains all of the CEMS data used by `create_plant_attributes_table()` and
+    `identify_hourly_data_source()`, so it can be passed to them instead of the hourly
+    data. `cems` can have the compact dtypes from `apply_dtypes(cems, compact=True)`,
+    and the aggregated data has the standard dtypes.
+    """
+    cems_unit_months = (
+        cems.groupby(
+            [
+                "plant_id_eia",
+                "subplant_id",
+                "emissions_unit_id_epa",
+                "report_date",
+                "energy_source_code",
+            ],
+            dropna=False,
+            observed=True,
+        )[["fuel_consumed_mmbtu"]]
+        .sum()
+        .reset_index()
+    )
+
+    return apply_dtypes(cems_unit_months)
+
+
 def aggregate_cems_to_subplant(cems):
+    """
+    Aggregates unit-level CEMS data to each subplant-hour. `cems` can have the compact
+    dtypes from `apply_dtypes(cems, compact=True)`, and the aggregated data has the
+    standard dtypes.
+    """
 
     GROUPBY_COLUMNS = ["plant_id_eia", "subplant_id", "datetime_utc", "report_date"]
 
@@ -3,8 +3,17 @@ Entry point for creating final dataset and intermediate cleaned data products.
 
 Run from `src` as `python data_pipeline.py` after installing conda environment
 
-Optional arguments are --year (default 2021), --shape_individual_plants (default True)
-Optional arguments for development are --small, --flat, and --skip_outputs
+Optional arguments are --year (default 2021), --shape_individual_plants (default True),
+--intermediate_format (csv or parquet, default csv), --csv_writer (pandas or
+pyarrow, default pandas), --csv_compression (gzip or zstd, default None, which writes
+uncompressed csv results), --cems_plants_per_partition (default None, which cleans
+all of the CEMS data at once), --gtn_years (default 5), --results_dataset (default
+False), and --results_database (default False, requires --results_dataset)
+With --cems_plants_per_partition, the unit-level CEMS data is only loaded one partition
+at a time until it is aggregated to subplants. The later steps hold the full year of
+subplant-level CEMS data in memory.
+Optional arguments for development are --small, --flat, --skip_outputs, and
+--memory_report
 """
 import argparse
 import os
@@ -19,9 +28,10 @@ import impute_hourly_profiles
 import eia930
 import validation
 import output_data
+import column_checks
 import consumed
 from filepaths import downloads_folder, outputs_folder, results_folder
-from logging_util import get_logger, configure_root_logger
+from logging_util import get_logger, configure_root_logger, log_memory_usage
 
 
 def get_args() -> argparse.Namespace:
@@ -55,8 +65,76 @@ def get_args() -> argparse.Namespace:
         default=False,
         action=argparse.BooleanOptionalAction,
     )
+    parser.add_argument(
+        "--intermediate_format",
+        help="File format of the intermediate outputs written to data/outputs.",
+        default="csv",
+        choices=output_data.INTERMEDIATE_FORMATS,
+    )
+    parser.add_argument(
+        "--metric_results",
+        help="Export results in metric units in addition to US units. If not, metric results can be created later with `output_data.export_metric_results()`.",
+        default=True,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--csv_writer",
+        help="Library used to write the csv results. pyarrow is faster for large outputs.",
+        default="pandas",
+        choices=output_data.CSV_WRITERS,
+    )
+    parser.add_argument(
+        "--csv_compression",
+        help="Compression of the csv results. The extension of the compression (e.g. `.gz`) is appended to the name of each csv file.",
+        default=None,
+        choices=list(output_data.CSV_COMPRESSIONS),
+    )
+    parser.add_argument(
+        "--results_dataset",
+        help="Also write the results to a partitioned parquet dataset in data/results.",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--results_database",
+        help="Load the results into a SQLite database in data/results. Requires --results_dataset.",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--export_workers",
+        help="Number of processes used to export hourly plant data. Defaults to 1, which exports one region at a time. Each additional process uses more memory.",
+        default=1,
+        type=int,
+    )
+    parser.add_argument(
+        "--export_memory_limit_gb",
+        help="Memory limit (GB) for concurrent hourly plant exports. Defaults to 75%% of the available memory (MemAvailable on Linux), or no limit if it cannot be determined.",
+        default=None,
+        type=float,
+    )
+    parser.add_argument(
+        "--cems_plants_per_partition",
+        help="If set, cleans the CEMS data this many plants at a time and only loads one partition of the unit-level data at a time until it is aggregated to subplants, which reduces peak memory use.",
+        default=None,
+        type=int,
+    )
+    parser.add_argument(
+        "--gtn_years",
+        help="Number of years of data in the gross to net store used to calculate multi-year gross to net factors",
+        default=5,
+        type=int,
+    )
+    parser.add_argument(
+        "--memory_report",
+        help="If set, logs the memory used by the CEMS data before and after each major step",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
 
     args = parser.parse_args()
+    if args.results_database and not args.results_dataset:
+        parser.error("--results_database requires --results_dataset")
 
     return args
 
@@ -168,42 +246,86 @@ def main():
     # 4. Clean Hourly Data from CEMS
     ####################################################################################
     logger.info("4. Cleaning CEMS data")
-    cems = data_cleaning.clean_cems(
-        year, args.small, primary_fuel_table, subplant_emission_factors
-    )
+    if args.memory_report:
+        log_memory_usage(logger, "before cleaning CEMS")
+    if args.cems_plants_per_partition is None:
+        cems = data_cleaning.clean_cems(
+            year, args.small, primary_fuel_table, subplant_emission_factors
+        )
+        if args.memory_report:
+            log_memory_usage(logger, "after cleaning CEMS", cems=cems)
+        cems_quality = validation.summarize_cems_measurement_quality(cems)
+        # output cleaned cems data
+        output_data.output_intermediate_data(
+            cems,
+            "cems_cleaned",
+            path_prefix,
+            year,
+            args.skip_outputs,
+            args.intermediate_format,
+        )
+        # the rest of the unit-level steps do not need the precision of the standard
+        # dtypes, so use compact dtypes until the data is aggregated to subplant
+        cems = column_checks.apply_dtypes(cems, compact=True)
+        if args.memory_report:
+            log_memory_usage(
+                logger, "after converting CEMS to compact dtypes", cems=cems
+            )
+        # calculate biomass-adjusted emissions while cems data is at the unit level
+        cems = emissions.adjust_emissions_for_biomass(cems)
+        # the unit-level data used to create plant attributes and identify data sources
+        cems_units = data_cleaning.aggregate_cems_to_unit_month(cems)
+    else:
+        cems_partitions = data_cleaning.clean_cems_partitioned(
+            year,
+            args.small,
+            primary_fuel_table,
+            subplant_emission_factors,
+            outputs_folder(f"{path_prefix}cems_cleaned_partitions"),
+            args.cems_plants_per_partition,
+        )
+        # export, summarize, adjust, and aggregate the unit-level data one partition at
+        # a time, so that the full year of unit-level data is never held in memory
+        (
+            cems,
+            cems_units,
+            cems_quality,
+        ) = data_cleaning.process_cems_partitions(
+            cems_partitions,
+            path_prefix,
+            year,
+            args.skip_outputs,
+            args.intermediate_format,
+        )
+        if args.memory_report:
+            log_memory_usage(
+                logger,
+                "after cleaning CEMS and aggregating the partitions to subplant",
+                cems=cems,
+                cems_units=cems_units,
+            )
     # output data quality metrics about measured vs imputed CEMS data
     output_data.output_data_quality_metrics(
-        validation.summarize_cems_measurement_quality(cems),
+        cems_quality,
         "cems_pollutant_measurement_quality",
         path_prefix,
         args.skip_outputs,
     )
 
-    # output cleaned cems data
-    output_data.output_intermediate_data(
-        cems,
-        "cems_cleaned",
-        path_prefix,
-        year,
-        args.skip_outputs,
-    )
-
-    # calculate biomass-adjusted emissions while cems data is at the unit level
-    cems = emissions.adjust_emissions_for_biomass(cems)
-
     # 5. Assign static characteristics to CEMS and EIA data to aid in aggregation
     ####################################################################################
     logger.info("5. Loading plant static attributes")
     plant_attributes = data_cleaning.create_plant_attributes_table(
-        cems, eia923_allocated, year, primary_fuel_table
+        cems_units, eia923_allocated, year, primary_fuel_table
     )
 
     # 6. Crosswalk CEMS and EIA data
     ####################################################################################
     logger.info("6. Identifying source for hourly data")
     eia923_allocated = data_cleaning.identify_hourly_data_source(
-        eia923_allocated, cems, year
+        eia923_allocated, cems_units, year
     )
+    del cems_units
     # Export data cleaned by above for later validation, visualization, analysis
     output_data.output_intermediate_data(
         eia923_allocated.drop(columns=["plant_primary_fuel", "subplant_primary_fuel"]),
@@ -211,6 +333,7 @@ def main():
         path_prefix,
         year,
         args.skip_outputs,
+        args.intermediate_format,
     )
     # output data quality metrics about annually-reported EIA-923 data
     output_data.output_data_quality_metrics(
@@ -223,8 +346,12 @@ def main():
     # 7. Aggregating CEMS data to subplant
     ####################################################################################
     logger.info("7. Aggregating CEMS data from unit to subplant")
-    # aggregate cems data to subplant level
-    cems = data_cleaning.aggregate_cems_to_subplant(cems)
+    # aggregate cems data to subplant level. Partitioned CEMS data was already
+    # aggregated one partition at a time in step 4
+    if args.cems_plants_per_partition is None:
+        cems = data_cleaning.aggregate_cems_to_subplant(cems)
+    if args.memory_report:
+        log_memory_usage(logger, "after aggregating CEMS to subplant", cems=cems)
 
     # 8. Calculate hourly data for partial_cems plants
     ####################################################################################
@@ -244,6 +371,7 @@ def main():
         path_prefix,
         year,
         args.skip_outputs,
+        args.intermediate_format,
     )
     # shape partial CEMS subplant data
     (
@@ -262,7 +390,16 @@ def main():
         path_prefix,
         year,
         args.skip_outputs,
-    )
+        args.intermediate_format,
+    )
+    if args.memory_report:
+        log_memory_usage(
+            logger,
+            "after shaping partial CEMS data",
+            cems=cems,
+            partial_cems_plant=partial_cems_plant,
+            partial_cems_subplant=partial_cems_subplant,
+        )
 
     # 9. Convert CEMS Hourly Gross Generation to Hourly Net Generation
     ####################################################################################
@@ -284,7 +421,27 @@ def main():
         path_prefix,
         year,
         args.skip_outputs,
+        args.intermediate_format,
     )
+    if not args.skip_outputs:
+        # add the monthly data from this year to the multi-year gross to net store, and
+        # calculate multi-year factors from the data already in the store
+        gtn_store_prefix = "" if not args.small else "small/"
+        gross_to_net_generation.update_gtn_store(
+            gtn_conversions, year, gtn_store_prefix
+        )
+        output_data.output_intermediate_data(
+            gross_to_net_generation.calculate_multiyear_gtn_factors(
+                year, args.gtn_years, gtn_store_prefix
+            ),
+            "multiyear_gross_to_net_factors",
+            path_prefix,
+            year,
+            args.skip_outputs,
+            args.intermediate_format,
+        )
+    if args.memory_report:
+        log_memory_usage(logger, "after converting gross to net generation", cems=cems)
 
     # 10. Adjust CEMS emission data for CHP
     ####################################################################################
@@ -300,8 +457,15 @@ def main():
         keys=["plant_id_eia", "subplant_id"],
     )
     output_data.output_intermediate_data(
-        cems, "cems_subplant", path_prefix, year, args.skip_outputs
+        cems,
+        "cems_subplant",
+        path_prefix,
+        year,
+        args.skip_outputs,
+        args.intermediate_format,
     )
+    if args.memory_report:
+        log_memory_usage(logger, "after adjusting CEMS for CHP", cems=cems)
 
     # 11. Export monthly and annual plant-level results
     ####################################################################################
@@ -333,10 +497,26 @@ def main():
         "monthly",
     )
     output_data.output_plant_data(
-        monthly_plant_data, path_prefix, "monthly", args.skip_outputs, plant_attributes
+        monthly_plant_data,
+        path_prefix,
+        "monthly",
+        args.skip_outputs,
+        plant_attributes,
+        args.metric_results,
+        args.csv_writer,
+        args.csv_compression,
+        args.results_dataset,
     )
     output_data.output_plant_data(
-        monthly_plant_data, path_prefix, "annual", args.skip_outputs, plant_attributes
+        monthly_plant_data,
+        path_prefix,
+        "annual",
+        args.skip_outputs,
+        plant_attributes,
+        args.metric_results,
+        args.csv_writer,
+        args.csv_compression,
+        args.results_dataset,
     )
     del monthly_plant_data
 
@@ -388,7 +568,12 @@ def main():
         args.skip_outputs,
     )
     output_data.output_intermediate_data(
-        hourly_profiles, "hourly_profiles", path_prefix, year, args.skip_outputs
+        hourly_profiles,
+        "hourly_profiles",
+        path_prefix,
+        year,
+        args.skip_outputs,
+        args.intermediate_format,
     )
 
     hourly_profiles = impute_hourly_profiles.convert_profile_to_percent(
@@ -411,6 +596,11 @@ def main():
             path_prefix,
             args.skip_outputs,
             region_to_group="ba_code",
+            max_workers=args.export_workers,
+            memory_limit_gb=args.export_memory_limit_gb,
+            csv_writer=args.csv_writer,
+            csv_compression=args.csv_compression,
+            results_dataset=args.results_dataset,
         )
     else:
         logger.info(
@@ -457,7 +647,12 @@ def main():
         keys=["plant_id_eia"],
     )
     output_data.output_intermediate_data(
-        shaped_eia_data, "shaped_eia923_data", path_prefix, year, args.skip_outputs
+        shaped_eia_data,
+        "shaped_eia923_data",
+        path_prefix,
+        year,
+        args.skip_outputs,
+        args.intermediate_format,
     )
     output_data.output_intermediate_data(
         plant_attributes,
@@ -465,6 +660,7 @@ def main():
         path_prefix,
         year,
         args.skip_outputs,
+        args.intermediate_format,
     )
     if not args.skip_outputs:
         plant_attributes.to_csv(
@@ -509,6 +705,12 @@ def main():
         partial_cems_subplant,
         partial_cems_plant,
     )  # free memory back to python
+    if args.memory_report:
+        log_memory_usage(
+            logger,
+            "after combining plant data",
+            combined_plant_data=combined_plant_data,
+        )
     # export to a csv.
     validation.validate_unique_datetimes(
         df=combined_plant_data,
@@ -522,6 +724,10 @@ def main():
             "hourly",
             args.skip_outputs,
             plant_attributes,
+            args.metric_results,
+            args.csv_writer,
+            args.csv_compression,
+            args.results_dataset,
         )
 
     # 17. Aggregate CEMS data to BA-fuel and write power sector results
@@ -533,10 +739,18 @@ def main():
     del combined_plant_data
     # Output intermediate data: produced per-fuel annual averages
     output_data.write_generated_averages(
-        ba_fuel_data, year, path_prefix, args.skip_outputs
+        ba_fuel_data, year, path_prefix, args.skip_outputs, args.intermediate_format
     )
     # Output final data: per-ba hourly generation and rate
-    output_data.write_power_sector_results(ba_fuel_data, path_prefix, args.skip_outputs)
+    output_data.write_power_sector_results(
+        ba_fuel_data,
+        path_prefix,
+        args.skip_outputs,
+        args.metric_results,
+        args.csv_writer,
+        args.csv_compression,
+        args.results_dataset,
+    )
 
     # 18. Calculate consumption-based emissions and write carbon accounting results
     ####################################################################################
@@ -547,9 +761,17 @@ def main():
         year,
         small=args.small,
         skip_outputs=args.skip_outputs,
+        include_metric=args.metric_results,
+        csv_writer=args.csv_writer,
+        csv_compression=args.csv_compression,
+        results_dataset=args.results_dataset,
     )
     hourly_consumed_calc.run()
     hourly_consumed_calc.output_results()
+    if args.results_dataset:
+        output_data.write_results_dataset_manifest(path_prefix, args.skip_outputs)
+    if args.results_database:
+        output_data.write_results_database(path_prefix, args.skip_outputs)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,11 @@
+import functools
 import pandas as pd
 import numpy as np
 
 import load_data
 import validation
 from column_checks import get_dtypes
+from keyed_joins import broadcast_join, match_keys
 from filepaths import manual_folder
 from logging_util import get_logger
 
@@ -32,36 +34,78 @@ def calculate_ghg_emissions_from_fuel_consumption(
     if include_n2o is True:
         emissions_to_calc.append("n2o")
 
-    efs_to_use = [emission + "_lb_per_mmbtu" for emission in emissions_to_calc]
+    # get the emission factor for each row of df
+    emission_factors = lookup_ghg_emission_factors(
+        df, year, [emission + "_lb_per_mmbtu" for emission in emissions_to_calc]
+    )
 
-    # get emission factors
-    emission_factors = load_data.load_ghg_emission_factors()[
-        ["energy_source_code"] + efs_to_use
-    ]
+    # create a new column with the emissions mass
+    for e in emissions_to_calc:
+        df[f"{e}_mass_lb"] = (
+            df["fuel_consumed_mmbtu"] * emission_factors[f"{e}_lb_per_mmbtu"]
+        )
 
-    # add emission factor to  df
-    df = df.merge(emission_factors, how="left", on="energy_source_code", validate="m:1")
+    return df
 
-    # if there are any geothermal units, load the geothermal EFs
-    if df["energy_source_code"].str.contains("GEO").any():
-        df = add_geothermal_emission_factors(
-            df, year, include_co2=True, include_nox=False, include_so2=False
-        )
 
-    # create a new column with the emissions mass
-    for e in emissions_to_calc:
-        df[f"{e}_mass_lb"] = df["fuel_consumed_mmbtu"] * df[f"{e}_lb_per_mmbtu"]
+@functools.lru_cache(maxsize=None)
+def load_ghg_emission_factor_arrays():
+    """
+    Loads the CO2, CH4, and N2O emission factors for each energy source code.
 
-    # drop intermediate columns
-    df = df.drop(columns=efs_to_use)
+    The emission factors are cached, so they are only read once. The arrays are shared
+    between callers and should not be modified in place.
 
-    return df
+    Returns:
+        dataframe of the energy source codes, and a dictionary of {column: array} with
+        the emission factor for each energy source code, plus a missing value at the end
+        for energy source codes without an emission factor
+    """
+    emission_factors = load_data.load_ghg_emission_factors()
+    emission_factor_arrays = {
+        ef: np.append(emission_factors[ef].to_numpy(dtype=float), np.NaN)
+        for ef in ["co2_lb_per_mmbtu", "ch4_lb_per_mmbtu", "n2o_lb_per_mmbtu"]
+    }
+    return emission_factors[["energy_source_code"]], emission_factor_arrays
+
+
+def lookup_ghg_emission_factors(df, year, efs_to_use):
+    """
+    Returns a dictionary of {ef: array} with each of the `efs_to_use` for each row of `df`.
+
+    Emission factors are looked up using the `energy_source_code` of each row. Missing
+    CO2 emission factors are filled with the geothermal emission factor of the plant or
+    generator, if available.
+    """
+    energy_source_codes, emission_factor_arrays = load_ghg_emission_factor_arrays()
+    # energy source codes without an emission factor have a position of -1, which
+    # takes the missing value at the end of each array
+    positions = match_keys(df, energy_source_codes, ["energy_source_code"])
+    emission_factors = {ef: emission_factor_arrays[ef][positions] for ef in efs_to_use}
+
+    # if there are any geothermal units, fill the co2 efs with the geothermal efs
+    if (
+        "co2_lb_per_mmbtu" in efs_to_use
+        and pd.Series(df["energy_source_code"].unique(), dtype=object)
+        .str.contains("GEO", na=False)
+        .any()
+    ):
+        geothermal_co2 = lookup_geothermal_emission_factors(
+            df, year, ["co2_lb_per_mmbtu"]
+        )["co2_lb_per_mmbtu"]
+        emission_factors["co2_lb_per_mmbtu"] = np.where(
+            np.isnan(emission_factors["co2_lb_per_mmbtu"]),
+            geothermal_co2,
+            emission_factors["co2_lb_per_mmbtu"],
+        )
+
+    return emission_factors
 
 
 def add_geothermal_emission_factors(
     df, year, include_co2=True, include_nox=True, include_so2=True
 ):
-    """"""
+    """Fills missing emission factors in `df` with the geothermal emission factors."""
 
     emissions_to_calc = []
     if include_co2 is True:
@@ -73,51 +117,68 @@ def add_geothermal_emission_factors(
 
     efs_to_use = [emission + "_lb_per_mmbtu" for emission in emissions_to_calc]
 
-    geothermal_efs = calculate_geothermal_emission_factors(year).loc[
-        :, ["plant_id_eia", "generator_id", "plant_frac"] + efs_to_use
-    ]
+    geothermal_efs = lookup_geothermal_emission_factors(df, year, efs_to_use)
 
-    for e in emissions_to_calc:
-        geothermal_efs = geothermal_efs.rename(
-            columns={f"{e}_lb_per_mmbtu": f"{e}_lb_per_mmbtu_geo"}
-        )
+    # update missing efs using the geothermal efs if available
+    for ef in efs_to_use:
+        if ef not in df.columns:
+            df[ef] = np.NaN
+        df[ef] = df[ef].fillna(pd.Series(geothermal_efs[ef], index=df.index))
 
-    # if there is a merge key for generator id, merge in the geothermal EFs on generator id
-    if "generator_id" in list(df.columns):
-        # add geothermal emission factor to df
-        df = df.merge(
-            geothermal_efs.drop(columns=["plant_frac"]),
-            how="left",
-            on=["plant_id_eia", "generator_id"],
-            validate="m:1",
+    return df
+
+
+def lookup_geothermal_emission_factors(df, year, efs_to_use):
+    """
+    Returns a dictionary of {ef: array} with each of the `efs_to_use` for each row of `df`.
+
+    If `df` has a `generator_id` column, the geothermal emission factor of each
+    generator is used. Otherwise, the capacity-weighted emission factor of each plant is
+    used. Rows that are not geothermal plants or generators have missing values.
+    """
+    (
+        generator_geothermal_efs,
+        plant_geothermal_efs,
+    ) = load_geothermal_emission_factor_tables(year)
+    if "generator_id" in df.columns:
+        return broadcast_join(
+            df, generator_geothermal_efs, ["plant_id_eia", "generator_id"], efs_to_use
         )
-    # otherwise, aggregate EF to plant level and merge
     else:
-        # multiply the emission factor by the fraction
-        for e in emissions_to_calc:
-            geothermal_efs[f"{e}_lb_per_mmbtu_geo"] = (
-                geothermal_efs["plant_frac"] * geothermal_efs[f"{e}_lb_per_mmbtu_geo"]
-            )
-        # groupby plant to get the weighted emission factor
-        geothermal_efs = (
-            geothermal_efs.groupby("plant_id_eia", dropna=False).sum().reset_index()
-        ).drop(columns=["plant_frac"])
-        # add geothermal emission factor to df
-        df = df.merge(geothermal_efs, how="left", on=["plant_id_eia"], validate="m:1")
+        return broadcast_join(df, plant_geothermal_efs, ["plant_id_eia"], efs_to_use)
 
-    # update missing efs using the geothermal efs if available
-    for e in emissions_to_calc:
-        if f"{e}_lb_per_mmbtu" not in df.columns:
-            df[f"{e}_lb_per_mmbtu"] = np.NaN
-        df[f"{e}_lb_per_mmbtu"] = df[f"{e}_lb_per_mmbtu"].fillna(
-            df[f"{e}_lb_per_mmbtu_geo"]
-        )
 
-    # drop intermediate columns
-    for e in emissions_to_calc:
-        df = df.drop(columns=[f"{e}_lb_per_mmbtu_geo"])
+@functools.lru_cache(maxsize=None)
+def load_geothermal_emission_factor_tables(year):
+    """
+    Calculates the geothermal emission factors of each generator and plant in `year`.
 
-    return df
+    The tables are cached for each year, so the returned dataframes are shared between
+    callers and should not be modified in place.
+
+    Returns:
+        dataframe of emission factors for each geothermal generator, and dataframe of
+        emission factors for each geothermal plant, weighted by the fraction of the
+        plant's capacity in each generator
+    """
+    efs = ["co2_lb_per_mmbtu", "nox_lb_per_mmbtu", "so2_lb_per_mmbtu"]
+    generator_geothermal_efs = calculate_geothermal_emission_factors(year)[
+        ["plant_id_eia", "generator_id", "plant_frac"] + efs
+    ]
+
+    # multiply the emission factor by the fraction, and sum by plant to get the
+    # weighted emission factor
+    plant_geothermal_efs = generator_geothermal_efs[efs].multiply(
+        generator_geothermal_efs["plant_frac"], axis=0
+    )
+    plant_geothermal_efs["plant_id_eia"] = generator_geothermal_efs["plant_id_eia"]
+    plant_geothermal_efs = (
+        plant_geothermal_efs.groupby("plant_id_eia", dropna=False)[efs]
+        .sum()
+        .reset_index()
+    )
+
+    return generator_geothermal_efs, plant_geothermal_efs
 
 
 def calculate_geothermal_emission_factors(year):
@@ -1684,153 +1745,131 @@ def fill_cems_missing_co2(cems, year, subplant_emission_factors):
     3. For any remaining missing values, calculate emissions based on the subplant primary fuel and fuel consumption
     """
 
-    # make a copy of the cems data so that we can validate the outputs
-    cems_original = cems.copy()
+    # summarize the reported co2 data so that we can validate the outputs
+    original_co2_summary = validation.summarize_non_missing_cems_co2(cems)
     # add a new categorical option to the mass measurement code
-    cems["co2_mass_measurement_code"] = cems[
-        "co2_mass_measurement_code"
-    ].cat.add_categories("Imputed")
+    co2_mass_measurement_code = cems["co2_mass_measurement_code"].cat.add_categories(
+        "Imputed"
+    )
+    # the filled values are written to arrays aligned with the rows of cems, and added
+    # back to cems once all of the missing values have been filled
+    co2_mass_lb = cems["co2_mass_lb"].to_numpy(
+        dtype="float64", na_value=np.NaN, copy=True
+    )
+    fuel_consumed_mmbtu = cems["fuel_consumed_mmbtu"].to_numpy(
+        dtype="float64", na_value=np.NaN
+    )
+    imputed = np.zeros(len(cems), dtype=bool)
 
     # replace all "missing" CO2 values with zero
-    cems["co2_mass_lb"] = cems["co2_mass_lb"].fillna(0)
+    co2_mass_lb[np.isnan(co2_mass_lb)] = 0
 
     # replace 0 reported CO2 values with missing values, if there was reported heat input
-    cems.loc[
-        (cems["co2_mass_lb"] == 0) & (cems["fuel_consumed_mmbtu"] > 0),
-        "co2_mass_lb",
-    ] = np.NaN
+    co2_mass_lb[(co2_mass_lb == 0) & (fuel_consumed_mmbtu > 0)] = np.NaN
 
-    # create a new df with all observations with missing co2 data
-    missing_co2 = cems[cems["co2_mass_lb"].isnull()]
+    # get the positions of all observations with missing co2 data
+    missing_co2 = np.flatnonzero(np.isnan(co2_mass_lb))
 
     # First round of filling covers small gaps using non-missing emission data from the same month
     ##############################################################################################
 
-    unit_months_missing_co2 = missing_co2[
-        ["plant_id_eia", "emissions_unit_id_epa", "report_date"]
+    unit_month_keys = ["plant_id_eia", "emissions_unit_id_epa", "report_date"]
+    unit_months_missing_co2 = cems.loc[
+        np.isnan(co2_mass_lb), unit_month_keys
     ].drop_duplicates()
 
-    # get non-missing data from cems for these unit months
-    unit_months_missing_co2 = unit_months_missing_co2.merge(
-        cems[
-            [
-                "plant_id_eia",
-                "emissions_unit_id_epa",
-                "report_date",
-                "co2_mass_lb",
-                "fuel_consumed_mmbtu",
-            ]
-        ],
-        how="left",
-        on=["plant_id_eia", "emissions_unit_id_epa", "report_date"],
-        validate="1:m",
+    # get non-missing, non-zero co2 emissions and fuel consumption for these unit months
+    has_emissions = (
+        (co2_mass_lb > 0)
+        & (fuel_consumed_mmbtu > 0)
+        & (match_keys(cems, unit_months_missing_co2, unit_month_keys) >= 0)
+    )
+    unit_month_efs = cems.loc[has_emissions, unit_month_keys].assign(
+        co2_mass_lb=co2_mass_lb[has_emissions],
+        fuel_consumed_mmbtu=fuel_consumed_mmbtu[has_emissions],
     )
-    # only keep observations with non-missing, non-zero co2 emissions and fuel consumption
-    unit_months_missing_co2 = unit_months_missing_co2[
-        (unit_months_missing_co2["co2_mass_lb"] > 0)
-        & (unit_months_missing_co2["fuel_consumed_mmbtu"] > 0)
-    ]
 
     # calculate total fuel consumption and emissions by month
     unit_month_efs = (
-        unit_months_missing_co2.groupby(
-            ["plant_id_eia", "emissions_unit_id_epa", "report_date"], dropna=False
-        )
-        .sum()
-        .reset_index()
+        unit_month_efs.groupby(unit_month_keys, dropna=False).sum().reset_index()
     )
     unit_month_efs["co2_lb_per_mmbtu"] = (
         unit_month_efs["co2_mass_lb"] / unit_month_efs["fuel_consumed_mmbtu"]
     )
 
-    # merge these EFs into the missing cems data
-    missing_co2 = missing_co2.merge(
-        unit_month_efs[
-            ["plant_id_eia", "report_date", "emissions_unit_id_epa", "co2_lb_per_mmbtu"]
-        ],
-        how="left",
-        on=["plant_id_eia", "report_date", "emissions_unit_id_epa"],
-        validate="m:1",
-    ).set_index(missing_co2.index)
+    # look up these EFs for the missing cems data
+    co2_lb_per_mmbtu = broadcast_join(
+        cems.iloc[missing_co2],
+        unit_month_efs,
+        ["plant_id_eia", "report_date", "emissions_unit_id_epa"],
+        ["co2_lb_per_mmbtu"],
+    )["co2_lb_per_mmbtu"]
 
-    # only keep observations where there is a non-missing ef
-    missing_co2 = missing_co2[~missing_co2["co2_lb_per_mmbtu"].isna()]
-
-    # calculate missing co2 data
-    missing_co2["co2_mass_lb"] = (
-        missing_co2["fuel_consumed_mmbtu"] * missing_co2["co2_lb_per_mmbtu"]
-    )
-
-    # update in CEMS table
-    cems.update(missing_co2[["co2_mass_lb"]])
-
-    # update the co2 mass measurement code
-    cems.loc[missing_co2.index, "co2_mass_measurement_code"] = "Imputed"
+    # calculate missing co2 data where there is a non-missing ef
+    has_ef = ~pd.isna(co2_lb_per_mmbtu)
+    filled = missing_co2[has_ef]
+    co2_mass_lb[filled] = fuel_consumed_mmbtu[filled] * co2_lb_per_mmbtu[has_ef]
+    imputed[filled] = True
 
     # identify all observations that are still missing co2 data
-    missing_co2 = cems[cems["co2_mass_lb"].isnull()]
+    missing_co2 = missing_co2[~has_ef]
 
     # Second round of data filling using weighted average EF based on EIA-923 heat input data
     #########################################################################################
 
-    # merge the weighted ef into the missing data
-    missing_co2 = missing_co2.merge(
-        subplant_emission_factors[
-            ["plant_id_eia", "report_date", "subplant_id", "co2_lb_per_mmbtu"]
-        ],
-        how="left",
-        on=["plant_id_eia", "report_date", "subplant_id"],
-        validate="m:1",
-    ).set_index(missing_co2.index)
-
-    # only keep observations where there is a non-missing ef
-    missing_co2 = missing_co2[~missing_co2["co2_lb_per_mmbtu"].isna()]
-
-    # calculate missing co2 data
-    missing_co2["co2_mass_lb"] = (
-        missing_co2["fuel_consumed_mmbtu"] * missing_co2["co2_lb_per_mmbtu"]
-    )
+    # look up the weighted ef for the missing data
+    co2_lb_per_mmbtu = broadcast_join(
+        cems.iloc[missing_co2],
+        subplant_emission_factors,
+        ["plant_id_eia", "report_date", "subplant_id"],
+        ["co2_lb_per_mmbtu"],
+    )["co2_lb_per_mmbtu"]
 
-    # update in CEMS table
-    cems.update(missing_co2[["co2_mass_lb"]])
-
-    # update the co2 mass measurement code
-    cems.loc[missing_co2.index, "co2_mass_measurement_code"] = "Imputed"
+    # calculate missing co2 data where there is a non-missing ef
+    has_ef = ~pd.isna(co2_lb_per_mmbtu)
+    filled = missing_co2[has_ef]
+    co2_mass_lb[filled] = fuel_consumed_mmbtu[filled] * co2_lb_per_mmbtu[has_ef]
+    imputed[filled] = True
 
     # identify all observations that are still missing co2 data
-    missing_co2 = cems[cems["co2_mass_lb"].isnull()]
+    missing_co2 = missing_co2[~has_ef]
 
     # Third round of filling using subplant fuel codes
     ##################################################
 
-    # for rows that have a successful fuel code match, move to a temporary dataframe to hold the data
-    co2_to_fill = missing_co2.copy()[~missing_co2["energy_source_code"].isna()]
-    fill_index = co2_to_fill.index
+    # only fill rows that have a successful fuel code match
+    filled = missing_co2[
+        ~cems["energy_source_code"].iloc[missing_co2].isna().to_numpy()
+    ]
 
     # calculate emissions based on fuel type
-    co2_to_fill = calculate_ghg_emissions_from_fuel_consumption(
-        df=co2_to_fill,
-        year=year,
-        include_co2=True,
-        include_ch4=False,
-        include_n2o=False,
-    ).set_index(fill_index)
+    co2_to_fill = (
+        fuel_consumed_mmbtu[filled]
+        * lookup_ghg_emission_factors(
+            cems[["plant_id_eia", "energy_source_code"]].iloc[filled],
+            year,
+            ["co2_lb_per_mmbtu"],
+        )["co2_lb_per_mmbtu"]
+    )
 
-    # fill this data into the original cems data
-    cems.update(co2_to_fill[["co2_mass_lb"]])
+    # fill this data into the co2 data, keeping missing values where there is no ef
+    has_ef = ~np.isnan(co2_to_fill)
+    co2_mass_lb[filled[has_ef]] = co2_to_fill[has_ef]
+    imputed[filled] = True
 
-    # update the co2 mass measurement code
-    cems.loc[co2_to_fill.index, "co2_mass_measurement_code"] = "Imputed"
+    # add the filled data to cems and update the co2 mass measurement code
+    cems["co2_mass_lb"] = co2_mass_lb
+    cems["co2_mass_measurement_code"] = co2_mass_measurement_code.mask(
+        imputed, "Imputed"
+    )
 
     # check that there are no missing co2 values left
-    still_missing_co2 = cems[cems["co2_mass_lb"].isna()]
-    if len(still_missing_co2) > 0:
+    if np.isnan(co2_mass_lb).any():
         raise UserWarning(
             "There are still misssing CO2 values remaining after filling missing CO2 values in CEMS"
         )
 
     # check that no non-missing co2 values were modified during filling
-    validation.check_non_missing_cems_co2_values_unchanged(cems_original, cems)
-    del cems_original
+    validation.check_non_missing_cems_co2_values_unchanged(cems, original_co2_summary)
 
     return cems
@@ -1,24 +1,28 @@
 import numpy as np
 import os
 import pandas as pd
-import statsmodels.formula.api as smf
-import sqlalchemy as sa
-import warnings
-
-# import pudl packages
-import pudl.analysis.allocate_net_gen as allocate_gen_fuel
-import pudl.output.pudltabl
 
 # import other modules
 import load_data
-import data_cleaning
 import validation
+import output_data
 from column_checks import get_dtypes
+from keyed_joins import match_keys
 from filepaths import outputs_folder
 from logging_util import get_logger
 
 logger = get_logger(__name__)
 
+# methods used to convert gross to net generation, in order of preference
+GTN_METHODS = [
+    "1_annual_subplant_ratio",
+    "2_annual_plant_ratio",
+    "3_annual_subplant_shift_factor",
+    "4_annual_plant_shift_factor",
+    "5_annual_fuel_ratio",
+    "6_default_eia_ratio",
+]
+
 
 def convert_gross_to_net_generation(cems, eia923_allocated, plant_attributes, year):
     """
@@ -35,61 +39,35 @@ def convert_gross_to_net_generation(cems, eia923_allocated, plant_attributes, ye
 
     factors_to_use = filter_gtn_conversion_factors(gtn_conversions)
 
-    # merge the conversion factors we want to use into the cems data
-    cems = cems.merge(
-        factors_to_use[
-            [
-                "plant_id_eia",
-                "subplant_id",
-                "report_date",
-                "data_source",
-                "annual_subplant_shift_mw",
-                "annual_plant_shift_mw",
-                "annual_subplant_ratio",
-                "annual_plant_ratio",
-                "annual_fuel_ratio",
-                "default_gtn_ratio",
-            ]
-        ],
-        how="left",
-        on=["plant_id_eia", "subplant_id", "report_date"],
-        validate="m:1",
-    )
-
-    cems["gtn_method"] = "1_annual_subplant_ratio"
-    cems["net_generation_mwh"] = (
-        cems["gross_generation_mwh"] * cems["annual_subplant_ratio"]
-    )
-
-    cems.loc[cems["net_generation_mwh"].isna(), "gtn_method"] = "2_annual_plant_ratio"
-    cems["net_generation_mwh"] = cems["net_generation_mwh"].fillna(
-        cems["gross_generation_mwh"] * cems["annual_plant_ratio"]
-    )
-
-    cems.loc[
-        cems["net_generation_mwh"].isna(), "gtn_method"
-    ] = "3_annual_subplant_shift_factor"
-    cems["net_generation_mwh"] = cems["net_generation_mwh"].fillna(
-        cems["gross_generation_mwh"] + cems["annual_subplant_shift_mw"]
-    )
+    # identify the method used to convert each subplant-month from gross to net
+    # generation, and the multiplier and offset used by that method
+    (
+        method_codes,
+        multipliers,
+        offsets,
+        missing_default_ratio,
+    ) = resolve_gtn_method_for_subplant_months(factors_to_use)
 
-    cems.loc[
-        cems["net_generation_mwh"].isna(), "gtn_method"
-    ] = "4_annual_plant_shift_factor"
-    cems["net_generation_mwh"] = cems["net_generation_mwh"].fillna(
-        cems["gross_generation_mwh"] + cems["annual_plant_shift_mw"]
+    # look up the subplant-month of each hour of cems data. Hours without conversion
+    # factors are matched to the last element of the resolved arrays, which uses the
+    # default ratio of 0.97
+    subplant_month = match_keys(
+        cems, factors_to_use, ["plant_id_eia", "subplant_id", "report_date"]
     )
+    subplant_month[subplant_month < 0] = len(factors_to_use)
 
-    cems.loc[cems["net_generation_mwh"].isna(), "gtn_method"] = "5_annual_fuel_ratio"
-    cems["net_generation_mwh"] = cems["net_generation_mwh"].fillna(
-        cems["gross_generation_mwh"] * cems["annual_fuel_ratio"]
+    gross_generation = cems["gross_generation_mwh"].to_numpy(
+        dtype=float, na_value=np.NaN
     )
+    hourly_method_codes = method_codes[subplant_month]
+    # hours without gross generation are not converted by any method, and are
+    # identified with the last method
+    hourly_method_codes[np.isnan(gross_generation)] = len(GTN_METHODS) - 1
 
-    cems.loc[cems["net_generation_mwh"].isna(), "gtn_method"] = "6_default_eia_ratio"
     # warn if there are any missing default gtn ratios for plants that would use them.
     missing_defaults = cems.loc[
-        (cems["gtn_method"] == "6_default_eia_ratio")
-        & (cems["default_gtn_ratio"].isna())
+        (hourly_method_codes == len(GTN_METHODS) - 1)
+        & missing_default_ratio[subplant_month]
     ]
     if len(missing_defaults) > 0:
         logger.warning(
@@ -101,23 +79,12 @@ def convert_gross_to_net_generation(cems, eia923_allocated, plant_attributes, ye
             .drop_duplicates()
             .to_string()
         )
-    # if there is a missing default gtn ratio, fill with 0.97
-    cems["default_gtn_ratio"] = cems["default_gtn_ratio"].fillna(0.97)
-    cems["net_generation_mwh"] = cems["net_generation_mwh"].fillna(
-        cems["gross_generation_mwh"] * cems["default_gtn_ratio"]
-    )
 
-    # drop intermediate columns
-    cems = cems.drop(
-        columns=[
-            "data_source",
-            "annual_subplant_shift_mw",
-            "annual_plant_shift_mw",
-            "annual_subplant_ratio",
-            "annual_plant_ratio",
-            "annual_fuel_ratio",
-            "default_gtn_ratio",
-        ]
+    cems["gtn_method"] = pd.Categorical.from_codes(
+        hourly_method_codes, categories=GTN_METHODS
+    )
+    cems["net_generation_mwh"] = (
+        gross_generation * multipliers[subplant_month] + offsets[subplant_month]
     )
 
     validation.validate_gross_to_net_conversion(cems, eia923_allocated)
@@ -125,6 +92,54 @@ def convert_gross_to_net_generation(cems, eia923_allocated, plant_attributes, ye
     return cems, gtn_conversions
 
 
+def resolve_gtn_method_for_subplant_months(factors_to_use):
+    """
+    Identifies the gross to net method used for each subplant-month in `factors_to_use`.
+
+    Each method calculates net generation as gross generation * multiplier + offset. The
+    first method in `GTN_METHODS` with a valid conversion factor is used, and the default
+    ratio (filled with 0.97 if it is missing) is used if no other factor is available.
+
+    Returns:
+        arrays of the method code (position in `GTN_METHODS`), multiplier, offset, and
+        whether the default ratio is missing for each row of `factors_to_use`, plus an
+        extra last element for subplant-months without any conversion factors
+    """
+
+    def factor_values(column):
+        return np.append(
+            factors_to_use[column].to_numpy(dtype=float, na_value=np.NaN), np.NaN
+        )
+
+    zero = np.zeros(len(factors_to_use) + 1)
+    one = np.ones(len(factors_to_use) + 1)
+    # (multiplier, offset) of each method except the default ratio, in order of preference
+    method_factors = [
+        (factor_values("annual_subplant_ratio"), zero),
+        (factor_values("annual_plant_ratio"), zero),
+        (one, factor_values("annual_subplant_shift_mw")),
+        (one, factor_values("annual_plant_shift_mw")),
+        (factor_values("annual_fuel_ratio"), zero),
+    ]
+
+    # use the default ratio for any subplant-months without another factor
+    default_gtn_ratio = factor_values("default_gtn_ratio")
+    missing_default_ratio = np.isnan(default_gtn_ratio)
+    method_codes = np.full(len(factors_to_use) + 1, len(GTN_METHODS) - 1)
+    multipliers = np.where(missing_default_ratio, 0.97, default_gtn_ratio)
+    offsets = zero.copy()
+
+    resolved = np.zeros(len(factors_to_use) + 1, dtype=bool)
+    for method_code, (multiplier, offset) in enumerate(method_factors):
+        use_method = ~resolved & np.isfinite(multiplier) & np.isfinite(offset)
+        method_codes[use_method] = method_code
+        multipliers[use_method] = multiplier[use_method]
+        offsets[use_method] = offset[use_method]
+        resolved |= use_method
+
+    return method_codes, multipliers, offsets, missing_default_ratio
+
+
 def calculate_gross_to_net_conversion_factors(
     cems, eia923_allocated, plant_attributes, year
 ):
@@ -575,25 +590,9 @@ def gross_to_net_regression(combined_gen_data, agg_level):
     )
 
     # calculate the ratio for each plant and create a dataframe
-    gtn_regression = (
-        gen_data_for_regression.dropna()
-        .groupby(plant_aggregation_columns, dropna=False)
-        .apply(model_gross_to_net)
-    )
-    gtn_regression = gtn_regression.dropna()
-    try:
-        gtn_regression = pd.DataFrame(
-            gtn_regression.tolist(),
-            index=gtn_regression.index,
-            columns=["slope", "intercept", "rsquared", "rsquared_adj", "observations"],
-        ).reset_index()
-    # if the dataframe is empty
-    except AttributeError:
-        gtn_regression = pd.DataFrame(
-            [],
-            index=gtn_regression.index,
-            columns=["slope", "intercept", "rsquared", "rsquared_adj", "observations"],
-        ).reset_index()
+    gtn_regression = model_gross_to_net(
+        gen_data_for_regression.dropna(), plant_aggregation_columns
+    )
     """if not os.path.exists(outputs_folder(f"gross_to_net"):
         os.mkdir(outputs_folder(f"gross_to_net")
 
@@ -631,244 +630,290 @@ def aggregate_combined_gen_data_for_regression(combined_gen_data, agg_level):
     return gen_data_for_regression, plant_aggregation_columns
 
 
-def model_gross_to_net(df):
+def model_gross_to_net(df, group_keys, outlier_threshold=3, outlier_iterations=2):
     """
-    Performs a linear regression model of monthly gross to net generation.
+    Performs a linear regression model of monthly gross to net generation for each group.
 
     Performs recursive outlier removal up to two times if the absolute value of
-    the studentizes residual > 3
+    the studentized residual > 3. All groups are regressed at once using the closed
+    form of simple linear regression (see `batched_linear_regression()`).
 
     Args:
         df: dataframe containing all values of gross and net generation that should be regressed
+        group_keys: list of columns identifying each group that is regressed separately
     Returns:
-        various model parameters
+        dataframe with the group_keys and the slope, intercept, rsquared, rsquared_adj,
+        and number of observations of the model for each group. Groups with fewer than
+        two observations are not modeled.
     """
+    grouped = df.groupby(group_keys, dropna=False)
+    group_ids = grouped.ngroup().to_numpy()
+    gtn_regression = grouped.size().reset_index()[group_keys]
+    x = df["gross_generation_mw"].to_numpy(dtype=float)
+    y = df["net_generation_mw"].to_numpy(dtype=float)
+
+    # get a linear model for the data points
+    use_observation = np.ones(len(df), dtype=bool)
+    model = batched_linear_regression(x, y, group_ids, len(gtn_regression))
+
+    # find and remove outliers recursively up to two times
+    # the first time removes any obvious outliers
+    # the second time removes any outliers that may have been masked by the first outliers
+    for _ in range(outlier_iterations):
+        outliers = use_observation & (
+            np.abs(model["student_resid"]) > outlier_threshold
+        )
+        remaining_observations = np.bincount(
+            group_ids,
+            weights=use_observation & ~outliers,
+            minlength=len(gtn_regression),
+        )
+        # a group can only be re-modeled if at least two observations remain
+        # otherwise the previous model of the group is kept
+        outliers &= (remaining_observations >= 2)[group_ids]
+        if not outliers.any():
+            break
+        # get a linear model of the corrected data
+        use_observation &= ~outliers
+        model = batched_linear_regression(
+            x, y, group_ids, len(gtn_regression), use_observation
+        )
 
-    def model_data(df):
-        # get a linear model for the data points
-        model = smf.ols("net_generation_mw ~ gross_generation_mw", data=df).fit()
-        outliers = model.outlier_test()
-
-        return model, outliers
-
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-
-        # if a model is not able to be created with the first iteration, skip this data
-        try:
-            # get a linear model for the data points
-            model, outliers = model_data(df)
-
-            # find and remove outliers recursively up to two times
-            # the first time removes any obvious outliers
-            # the second time removes any outliers that may have been masked by the first outliers
-            if abs(outliers["student_resid"]).max() > 3:
-                # remove any outlier values
-                df = df[
-                    ~df.index.isin(outliers[abs(outliers["student_resid"]) > 3].index)
-                ]
-
-                # get a linear model of the corrected data
-                try:
-                    model, outliers = model_data(df)
-                except ValueError:
-                    pass
-
-                # perform this removal one more time in case any outliers were masked by the first outlier(s)
-                if abs(outliers["student_resid"]).max() > 3:
-                    # remove any outlier values
-                    df = df[
-                        ~df.index.isin(
-                            outliers[abs(outliers["student_resid"]) > 3].index
-                        )
-                    ]
-                    # get a linear model for the data points
-                    try:
-                        model, outliers = model_data(df)
-                    except ValueError:
-                        pass
-
-            # get outputs of final adjusted model
-            slope = model.params[1]
-            intercept = model.params[0]
-            rsquared = model.rsquared
-            rsquared_adj = model.rsquared_adj
-            number_observations = model.nobs
-
-            # if the intercept is positive, it may result in calculated net generation being larger than gross generation
-            # thus, in this case, we will re-run the regression, forcing the intercept through zero
-            """if intercept > 0:
-                # get a linear model for the data points, forcing the intercept through zero
-                model = smf.ols(
-                    "net_generation_mw ~ gross_generation_mw - 1", data=df
-                ).fit()
-                # get outputs of final adjusted model
-                slope = model.params[0]
-                intercept = 0
-                rsquared = model.rsquared
-                rsquared_adj = model.rsquared_adj
-                number_observations = model.nobs"""
-
-            return slope, intercept, rsquared, rsquared_adj, number_observations
-
-        except ValueError:
-            pass
-
-
-# Currently unused code for exploring gross to net conversions over multiple years
-########################################################################################
-
-
-def calculate_multiyear_gtn_factors(year, number_of_years):
-    """This is the coordinating function for loading and calculating subplant IDs, GTN regressions, and GTN ratios."""
-    start_year = year - (number_of_years - 1)
-    end_year = year
-
-    # load 5 years of monthly data from CEMS and EIA-923
-    cems_monthly, gen_fuel_allocated = load_monthly_gross_and_net_generation(
-        start_year, end_year
-    )
-
-    # add subplant ids to the data
-    logger.info("Creating subplant IDs")
-    cems_monthly, gen_fuel_allocated = data_cleaning.generate_subplant_ids(
-        start_year, end_year, cems_monthly, gen_fuel_allocated
-    )
-
-    logger.info("Calculating Gross to Net regressions and ratios")
-    # perform regression at subplant level
-    gross_to_net_regression(
-        gross_gen_data=cems_monthly,
-        net_gen_data=gen_fuel_allocated,
-        agg_level="subplant",
-    )
+    # get outputs of final adjusted model
+    for column in ["slope", "intercept", "rsquared", "rsquared_adj", "observations"]:
+        gtn_regression[column] = model[column]
 
-    # perform regression at plant level
-    gross_to_net_regression(
-        gross_gen_data=cems_monthly, net_gen_data=gen_fuel_allocated, agg_level="plant"
-    )
+    # if a model is not able to be created, skip this data
+    return gtn_regression[gtn_regression["observations"] >= 2].reset_index(drop=True)
 
-    # calculate monthly ratios at subplant level
-    gross_to_net_ratio(
-        gross_gen_data=cems_monthly,
-        net_gen_data=gen_fuel_allocated,
-        agg_level="subplant",
-        year=year,
-    )
 
-    # calculate monthly ratios at plant level
-    gross_to_net_ratio(
-        gross_gen_data=cems_monthly,
-        net_gen_data=gen_fuel_allocated,
-        agg_level="plant",
-        year=year,
-    )
+def batched_linear_regression(x, y, group_ids, n_groups, use_observation=None):
+    """
+    Regresses y on x (with an intercept) separately for each group of observations.
 
+    This calculates the same results as an ordinary least squares regression of each
+    group with statsmodels, using the closed form of simple linear regression.
 
-def load_monthly_gross_and_net_generation(start_year, end_year):
-    # load cems data
-    cems_monthly = load_data.load_cems_gross_generation(start_year, end_year)
+    Args:
+        x: array of the independent variable
+        y: array of the dependent variable
+        group_ids: array of the integer group (from 0 to `n_groups` - 1) of each observation
+        n_groups: the number of groups
+        use_observation: optional boolean array of which observations to use. By default,
+            all observations are used.
+    Returns:
+        dictionary of arrays with the "slope", "intercept", "rsquared", "rsquared_adj",
+        and number of "observations" of each group, and the externally studentized
+        residual ("student_resid") of each observation, which is NaN for observations
+        that are not used. Statistics that are undefined for a group (e.g. the slope
+        if x is constant) are NaN.
+    """
+    if use_observation is None:
+        use_observation = np.ones(len(x), dtype=bool)
+    weights = use_observation.astype(float)
+
+    def group_sum(values):
+        return np.bincount(group_ids, weights=weights * values, minlength=n_groups)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        observations = np.bincount(group_ids, weights=weights, minlength=n_groups)
+        x_mean = group_sum(x) / observations
+        y_mean = group_sum(y) / observations
+        x_centered = x - x_mean[group_ids]
+        y_centered = y - y_mean[group_ids]
+        x_sum_squares = group_sum(x_centered**2)
+        y_sum_squares = group_sum(y_centered**2)
+
+        slope = group_sum(x_centered * y_centered) / x_sum_squares
+        intercept = y_mean - slope * x_mean
+        resid = y - intercept[group_ids] - slope[group_ids] * x
+        sum_squared_resid = group_sum(resid**2)
+
+        rsquared = 1 - sum_squared_resid / y_sum_squares
+        df_resid = observations - 2
+        rsquared_adj = 1 - (observations - 1) / df_resid * (1 - rsquared)
+
+        # the externally studentized residual scales each residual by the residual
+        # variance of the model fit without that observation
+        leverage = (
+            1 / observations[group_ids] + x_centered**2 / x_sum_squares[group_ids]
+        )
+        # this is zero (or slightly negative due to floating point error) if the model
+        # fits all of the other observations exactly
+        resid_variance_without_observation = np.maximum(
+            sum_squared_resid[group_ids] - resid**2 / (1 - leverage), 0
+        ) / (df_resid[group_ids] - 1)
+        student_resid = resid / np.sqrt(
+            resid_variance_without_observation * (1 - leverage)
+        )
+    # the studentized residual is undefined if there are fewer than four observations,
+    # or if the model fits the data exactly (within floating point precision)
+    exact_fit = sum_squared_resid <= np.finfo(float).eps * y_sum_squares
+    student_resid[
+        ~use_observation | (df_resid[group_ids] < 2) | exact_fit[group_ids]
+    ] = np.NaN
 
-    # load and clean EIA data
-    # create pudl_out
-    pudl_db = "sqlite:///../data/downloads/pudl/pudl_data/sqlite/pudl.sqlite"
-    pudl_engine = sa.create_engine(pudl_db)
-    pudl_out = pudl.output.pudltabl.PudlTabl(
-        pudl_engine,
-        freq="MS",
-        start_date=f"{start_year}-01-01",
-        end_date=f"{end_year}-12-31",
-    )
+    return {
+        "slope": slope,
+        "intercept": intercept,
+        "rsquared": rsquared,
+        "rsquared_adj": rsquared_adj,
+        "observations": observations,
+        "student_resid": student_resid,
+    }
 
-    # allocate net generation and heat input to each generator-fuel grouping
-    logger.info("Allocating EIA-923 generation data")
-    gen_fuel_allocated = allocate_gen_fuel.allocate_gen_fuel_by_generator_energy_source(
-        pudl_out, drop_interim_cols=True
-    )
-    # aggregate the allocated data to the generator level
-    gen_fuel_allocated = allocate_gen_fuel.agg_by_generator(
-        gen_fuel_allocated, sum_cols=["net_generation_mwh"]
-    )
 
-    return cems_monthly, gen_fuel_allocated
+# Multi-year gross to net factors
+########################################################################################
 
+# tables in the gross to net store, each with one parquet file per year
+GTN_STORE_TABLES = [
+    "monthly_subplant_generation",
+    "subplant_regression",
+    "plant_regression",
+]
 
-def gross_to_net_ratio(gross_gen_data, net_gen_data, agg_level, year):
+# columns of the monthly subplant gross and net generation data kept in the store
+MONTHLY_GENERATION_COLUMNS = [
+    "plant_id_eia",
+    "subplant_id",
+    "report_date",
+    "data_source",
+    "hours_in_month",
+    "gross_generation_mwh",
+    "net_generation_mwh",
+]
 
-    if agg_level == "plant":
-        plant_aggregation_columns = ["plant_id_eia"]
-    elif agg_level == "subplant":
-        plant_aggregation_columns = ["plant_id_eia", "subplant_id"]
-    else:
-        raise ValueError("agg_level must be either 'plant' or 'subplant'")
 
-    groupby_columns = plant_aggregation_columns + ["report_date"]
+def gtn_store_path(table, year, path_prefix=""):
+    """Returns the path to the data for `year` in `table` of the gross to net store."""
+    return outputs_folder(f"{path_prefix}gross_to_net/{table}/{table}_{year}.parquet")
 
-    gen_data = gross_gen_data.merge(
-        net_gen_data,
-        how="outer",
-        on=["plant_id_eia", "subplant_id", "report_date"],
-        validate="m:m",
-    )
 
-    # identify any rows where gross or net generation are missing
-    incomplete_data = gen_data[
-        gen_data[["gross_generation_mwh", "net_generation_mwh"]].isnull().any(axis=1)
-    ]
+def update_gtn_store(gtn_conversions, year, path_prefix=""):
+    """
+    Adds the monthly gross and net generation data for `year` to the gross to net store.
 
-    # load the activation and retirement dates into the data
-    subplant_crosswalk = pd.read_csv(
-        outputs_folder(f"{year}/subplant_crosswalk_{year}.csv"),
-        dtype=get_dtypes(),
-    ).dropna(subset="emissions_unit_id_epa")
-    incomplete_data = incomplete_data.merge(
-        subplant_crosswalk,
-        how="left",
-        on=(["plant_id_eia", "subplant_id", "emissions_unit_id_epa", "generator_id"]),
-        validate="m:1",
-    ).drop(columns="plant_id_epa")
+    The store keeps the monthly subplant gross and net generation from each year, and the
+    results of the subplant and plant regressions for that year, so that multi-year
+    factors can be calculated without reloading the hourly CEMS data from past years.
+    Any data already in the store for `year` is replaced.
+    Inputs:
+        gtn_conversions: the conversion factors returned by `convert_gross_to_net_generation()`
+    """
+    logger.info(f"Adding {year} gross and net generation to the gross to net store")
+    # in gtn_conversions, the monthly hours are suffixed to distinguish them from the
+    # annual plant hours
+    monthly_generation = gtn_conversions.rename(
+        columns={"hours_in_month_subplant": "hours_in_month"}
+    )[MONTHLY_GENERATION_COLUMNS]
+
+    tables = {
+        "monthly_subplant_generation": monthly_generation,
+        "subplant_regression": gross_to_net_regression(monthly_generation, "subplant"),
+        "plant_regression": gross_to_net_regression(monthly_generation, "plant"),
+    }
+    for table, df in tables.items():
+        path = gtn_store_path(table, year, path_prefix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        output_data.write_intermediate_parquet(df, path)
+
+
+def load_gtn_store(table, start_year, end_year, path_prefix=""):
+    """
+    Loads the data in `table` of the gross to net store from `start_year` to `end_year`.
 
-    # drop any of these rows where the retirement date is before the report date (only applies if net generation missing)
-    incomplete_data = incomplete_data[
-        ~(incomplete_data["retirement_date"] < incomplete_data["report_date"])
+    Years that have not been added to the store are skipped with a warning.
+    Returns:
+        dataframe with a `report_year` column identifying the year of each row
+    """
+    if table not in GTN_STORE_TABLES:
+        raise UserWarning(f"table must be one of {GTN_STORE_TABLES}, not {table}")
+    years = [
+        year
+        for year in range(start_year, end_year + 1)
+        if os.path.exists(gtn_store_path(table, year, path_prefix))
     ]
-
-    # drop any of these rows where the report date is before the planned operating date
-    incomplete_data = incomplete_data[
-        ~(
-            incomplete_data["report_date"]
-            < incomplete_data["current_planned_operating_date"]
+    missing_years = sorted(set(range(start_year, end_year + 1)) - set(years))
+    if len(missing_years) > 0:
+        logger.warning(
+            f"The gross to net store does not contain {table} data for {missing_years}. Run the pipeline for these years to add them."
+        )
+    if len(years) == 0:
+        raise UserWarning(
+            f"The gross to net store does not contain any {table} data from {start_year} to {end_year}"
         )
-    ]
 
-    # get a list of unique subplant ids and report dates - this identifies where we have missing data we shouldn't calculate a ratio for
-    incomplete_data = incomplete_data.drop_duplicates(subset=groupby_columns)[
-        groupby_columns
-    ]
+    data_by_year = []
+    for year in years:
+        df = load_data.load_partitioned_data(gtn_store_path(table, year, path_prefix))
+        df["report_year"] = year
+        data_by_year.append(df)
+    return pd.concat(data_by_year, ignore_index=True)
 
-    # only keep gen data that is not incomplete
-    gtn_ratio = gen_data.merge(
-        incomplete_data,
-        how="outer",
-        on=groupby_columns,
-        indicator="source",
-        validate="1:1",
-    )
-    gtn_ratio = gtn_ratio[gtn_ratio["source"] == "left_only"].drop(columns="source")
 
-    # group data by aggregation columns
-    gtn_ratio = gtn_ratio.groupby(groupby_columns, dropna=False).sum().reset_index()
-
-    # calculate gross to net ratios for the remaining data
-    gtn_ratio["gtn_ratio"] = (
-        gtn_ratio["net_generation_mwh"] / gtn_ratio["gross_generation_mwh"]
-    )
+def calculate_multiyear_gtn_factors(year, number_of_years, path_prefix=""):
+    """
+    Calculates gross to net ratios, shift factors, and regressions for each subplant and
+    plant using the monthly data from the `number_of_years` years ending in `year`.
 
-    gtn_ratio = gtn_ratio[groupby_columns + ["gtn_ratio"]]
+    The monthly data is read from the gross to net store, so each year must have been
+    added to the store with `update_gtn_store()`. Subplant IDs are assigned separately
+    for each year, so multi-year subplant factors assume that the subplants of a plant
+    are the same in each year.
+    Returns:
+        dataframe with one row per subplant, containing the subplant and plant factors
+    """
+    start_year = year - (number_of_years - 1)
+    monthly_generation = load_gtn_store(
+        "monthly_subplant_generation", start_year, year, path_prefix
+    ).dropna(subset=["gross_generation_mwh", "net_generation_mwh"])
+
+    multiyear_factors = []
+    for agg_level, aggregation_columns in {
+        "subplant": ["plant_id_eia", "subplant_id"],
+        "plant": ["plant_id_eia"],
+    }.items():
+        # calculate the ratio and shift factor using the total generation in all years
+        factors = (
+            monthly_generation.groupby(aggregation_columns, dropna=False)[
+                ["gross_generation_mwh", "net_generation_mwh", "hours_in_month"]
+            ]
+            .sum()
+            .reset_index()
+        )
+        # fill missing values (due to divide by zero) with zero
+        # replace infinite values with missing
+        factors[f"multiyear_{agg_level}_ratio"] = (
+            (factors["net_generation_mwh"] / factors["gross_generation_mwh"])
+            .fillna(0)
+            .replace([np.inf, -np.inf], np.nan)
+        )
+        factors[f"multiyear_{agg_level}_shift_mw"] = (
+            factors["net_generation_mwh"] - factors["gross_generation_mwh"]
+        ) / factors["hours_in_month"]
+        factors = factors.drop(
+            columns=["gross_generation_mwh", "net_generation_mwh", "hours_in_month"]
+        )
 
-    os.makedirs(outputs_folder("gross_to_net"), exist_ok=True)
+        # regress the monthly data from all years
+        gtn_regression = gross_to_net_regression(monthly_generation, agg_level).rename(
+            columns={
+                "slope": f"{agg_level}_regression_ratio",
+                "intercept": f"{agg_level}_regression_shift_mw",
+                "rsquared_adj": f"{agg_level}_regression_rsq_adj",
+                "observations": f"{agg_level}_regression_observations",
+            }
+        )
+        factors = factors.merge(
+            gtn_regression.drop(columns=["rsquared"]),
+            how="left",
+            on=aggregation_columns,
+            validate="1:1",
+        )
+        multiyear_factors.append(factors)
 
-    gtn_ratio.to_csv(
-        outputs_folder(f"gross_to_net/{agg_level}_gross_to_net_ratio.csv"),
-        index=False,
+    subplant_factors, plant_factors = multiyear_factors
+    return subplant_factors.merge(
+        plant_factors, how="left", on="plant_id_eia", validate="m:1"
     )
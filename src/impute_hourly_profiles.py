@@ -1,10 +1,19 @@
+import functools
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
 
 # import open-grid-emissions modules
 from column_checks import apply_dtypes
 import load_data
-from filepaths import manual_folder
+from keyed_joins import isin_keys, match_keys
+from filepaths import manual_folder, outputs_folder
 import validation
 import output_data
 from logging_util import get_logger
@@ -58,6 +67,102 @@ DATA_COLUMNS = [
     "so2_mass_lb_for_electricity_adjusted",
 ]
 
+# columns included in the hourly plant-level output files
+PLANT_EXPORT_KEY_COLUMNS = ["plant_id_eia", "datetime_utc"]
+PLANT_EXPORT_DATA_COLUMNS = [
+    "net_generation_mwh",
+    "fuel_consumed_mmbtu",
+    "fuel_consumed_for_electricity_mmbtu",
+    "co2_mass_lb",
+    "ch4_mass_lb",
+    "n2o_mass_lb",
+    "nox_mass_lb",
+    "so2_mass_lb",
+    "co2_mass_lb_for_electricity",
+    "ch4_mass_lb_for_electricity",
+    "n2o_mass_lb_for_electricity",
+    "nox_mass_lb_for_electricity",
+    "so2_mass_lb_for_electricity",
+    "co2_mass_lb_for_electricity_adjusted",
+]
+
+# missing wind and solar profiles are imputed using profiles from other BAs
+WIND_SOLAR_FUELS = ["wind", "solar"]
+
+# missing profiles for all other fuels are assigned a flat profile:
+# - certain fuels we assume would be operated as baseload (geothermal, biomass, waste, nuclear)
+# - For now assume hydro is dispatched with a flat profile
+#   TODO improve this assumption see: https://github.com/singularity-energy/open-grid-emissions/issues/37
+# - for any other fossil resources, use a flat profile
+#   TODO: we need to improve this method
+#   see: https://github.com/singularity-energy/open-grid-emissions/issues/96
+FLAT_PROFILE_FUELS = [
+    "geothermal",
+    "biomass",
+    "waste",
+    "nuclear",
+    "hydro",
+    "natural_gas",
+    "coal",
+    "petroleum",
+    "other",
+]
+
+# keys identifying a single monthly BA-fuel profile
+MONTHLY_PROFILE_KEYS = ["ba_code", "fuel_category", "report_date"]
+
+
+def monthly_profile_group_ids(df, group_keys=MONTHLY_PROFILE_KEYS):
+    """Returns an integer array identifying the BA-fuel-month group of each row.
+
+    Missing keys are treated as their own group, matching `groupby(dropna=False)`.
+    """
+    return df.groupby(group_keys, dropna=False, sort=False).ngroup().to_numpy()
+
+
+def broadcast_group_reduction(values, group_ids, how):
+    """Reduces `values` within each group and broadcasts the result back to every row.
+
+    This is used in place of a groupby followed by a merge back onto the hourly data.
+    Rows are sorted by group once so that each group is a contiguous segment that can
+    be reduced with `ufunc.reduceat`.
+
+    Args:
+        values: array-like of values to reduce, aligned with `group_ids`
+        group_ids: integer array of group ids, such as from `monthly_profile_group_ids`
+        how: one of "min" (ignoring NaN), "sum" (treating NaN as zero), or "any"
+    Returns:
+        numpy array with the same length as `values` containing the group result
+    """
+    values = np.asarray(values)
+    group_ids = np.asarray(group_ids)
+    if len(values) == 0:
+        return values.copy()
+    if how == "min":
+        ufunc = np.fmin
+        values = values.astype(float)
+    elif how == "sum":
+        ufunc = np.add
+        values = np.nan_to_num(values.astype(float), nan=0.0)
+    elif how == "any":
+        ufunc = np.logical_or
+        values = values.astype(bool)
+    else:
+        raise ValueError(f"Reduction {how} not recognized.")
+
+    # sort the values so that each group is a contiguous segment
+    order = np.argsort(group_ids, kind="stable")
+    sorted_ids = group_ids[order]
+    segment_starts = np.flatnonzero(
+        np.concatenate([[True], sorted_ids[1:] != sorted_ids[:-1]])
+    )
+    reduced = ufunc.reduceat(values[order], segment_starts)
+
+    # map the result for each group back to each row
+    group_result = np.empty(sorted_ids[-1] + 1, dtype=reduced.dtype)
+    group_result[sorted_ids[segment_starts]] = reduced
+    return group_result[group_ids]
+
 
 def calculate_hourly_profiles(
     cems,
@@ -88,22 +193,17 @@ def calculate_hourly_profiles(
     )
     hourly_profiles = add_missing_cems_profiles(hourly_profiles, cems, plant_attributes)
 
+    # identify the ba-fuel-month of each hour once, so that monthly filters can be
+    # broadcast to the hourly data without merging
+    group_ids = monthly_profile_group_ids(hourly_profiles)
+
     # if there are any months that have incomplete cems data, replace the cems profile with na
-    incomplete_cems = hourly_profiles.loc[
-        hourly_profiles["cems_profile"].isna(),
-        ["ba_code", "fuel_category", "report_date"],
-    ].drop_duplicates()
-    hourly_profiles = hourly_profiles.merge(
-        incomplete_cems,
-        how="outer",
-        on=["ba_code", "fuel_category", "report_date"],
-        indicator="source",
-        validate="m:1",
+    incomplete_cems = broadcast_group_reduction(
+        hourly_profiles["cems_profile"].isna().to_numpy(), group_ids, how="any"
     )
-    hourly_profiles.loc[(hourly_profiles["source"] == "both"), "cems_profile"] = np.NaN
-    hourly_profiles = hourly_profiles.drop(columns="source")
+    hourly_profiles.loc[incomplete_cems, "cems_profile"] = np.NaN
 
-    hourly_profiles = select_best_available_profile(hourly_profiles)
+    hourly_profiles = select_best_available_profile(hourly_profiles, group_ids)
 
     # round the data to the nearest tenth
     hourly_profiles["profile"] = hourly_profiles["profile"].round(1)
@@ -153,7 +253,7 @@ def calculate_hourly_profiles(
     return hourly_profiles
 
 
-def select_best_available_profile(hourly_profiles):
+def select_best_available_profile(hourly_profiles, group_ids=None):
     """
     Selects the best available hourly profile from the options available.
     The order of preference is:
@@ -164,57 +264,33 @@ def select_best_available_profile(hourly_profiles):
 
     We could create two different profiles - one for positive and one for negative values
 
+    `group_ids` identifies the ba-fuel-month of each row (see `monthly_profile_group_ids`)
+    and will be calculated if not provided.
     """
+    if group_ids is None:
+        group_ids = monthly_profile_group_ids(hourly_profiles)
 
     # create a filtered version of the residual profile, removing months where the residual contains negative values
-    residual_filter = (
-        hourly_profiles.groupby(["ba_code", "fuel_category", "report_date"])[
-            "residual_profile"
-        ]
-        .min()
-        .reset_index()
+    negative_filter = (
+        broadcast_group_reduction(
+            hourly_profiles["residual_profile"].to_numpy(), group_ids, how="min"
+        )
+        < 0
     )
-    residual_filter = residual_filter[residual_filter["residual_profile"] < 0]
-
-    hourly_profiles = hourly_profiles.merge(
-        residual_filter[["ba_code", "fuel_category", "report_date"]],
-        how="outer",
-        on=["ba_code", "fuel_category", "report_date"],
-        indicator="negative_filter",
-        validate="m:1",
-    )
-    hourly_profiles["residual_profile_filtered"] = hourly_profiles["residual_profile"]
-    hourly_profiles.loc[
-        hourly_profiles["negative_filter"] == "both", "residual_profile_filtered"
-    ] = np.NaN
-    hourly_profiles = hourly_profiles.drop(columns=["negative_filter"])
+    hourly_profiles["residual_profile_filtered"] = hourly_profiles[
+        "residual_profile"
+    ].mask(negative_filter)
 
     # implement a filter on the shifted residual profile so that we don't use it if greater than the eia930 data
-    shifted_filter = (
-        hourly_profiles.groupby(["ba_code", "fuel_category", "report_date"])
-        .sum(numeric_only=True)
-        .reset_index()
-    )
-    shifted_filter = shifted_filter.loc[
-        shifted_filter["shifted_residual_profile"] > shifted_filter["eia930_profile"],
-        ["ba_code", "fuel_category", "report_date"],
-    ]
-
-    hourly_profiles = hourly_profiles.merge(
-        shifted_filter,
-        how="outer",
-        on=["ba_code", "fuel_category", "report_date"],
-        indicator="shifted_filter",
-        validate="m:1",
+    shifted_filter = broadcast_group_reduction(
+        hourly_profiles["shifted_residual_profile"].to_numpy(), group_ids, how="sum"
+    ) > broadcast_group_reduction(
+        hourly_profiles["eia930_profile"].to_numpy(), group_ids, how="sum"
     )
     # create a new filtered column, replacing filtered values with nan
     hourly_profiles["shifted_residual_profile_filtered"] = hourly_profiles[
         "shifted_residual_profile"
-    ]
-    hourly_profiles.loc[
-        hourly_profiles["shifted_filter"] == "both", "shifted_residual_profile_filtered"
-    ] = np.NaN
-    hourly_profiles = hourly_profiles.drop(columns=["shifted_filter"])
+    ].mask(shifted_filter)
 
     # pick the profile
 
@@ -430,8 +506,12 @@ def calculate_residual(
         0
     )
 
-    combined_data = calculate_scaled_residual(combined_data)
-    combined_data = calculate_shifted_residual(combined_data)
+    # identify each ba-fuel-month once so that both sets of factors can be broadcast
+    # without merging
+    group_ids = monthly_profile_group_ids(combined_data)
+
+    combined_data = calculate_scaled_residual(combined_data, group_ids)
+    combined_data = calculate_shifted_residual(combined_data, group_ids)
 
     # calculate the residual
     combined_data["residual_profile"] = (
@@ -454,39 +534,32 @@ def calculate_residual(
     ]
 
 
-def calculate_scaled_residual(combined_data):
+def calculate_scaled_residual(combined_data, group_ids=None):
+    """Scales the cems profile so that it is always <= the eia930 profile for each ba-fuel-month.
+
+    `group_ids` identifies the ba-fuel-month of each row (see `monthly_profile_group_ids`)
+    and will be calculated if not provided.
+    """
+    if group_ids is None:
+        group_ids = monthly_profile_group_ids(combined_data)
+
     # Find scaling factor
-    # only keep data where the cems data is greater than zero
-    scaling_factors = combined_data.copy()[combined_data["cems_profile"] > 0]
+    # only use data where the cems data is greater than zero
     # calculate the ratio of 930 net generation to cems net generation
     # if correct, ratio should be >=1
-    scaling_factors["scaling_factor"] = (
-        scaling_factors["eia930_profile"] / scaling_factors["cems_profile"]
-    )
-    # find the minimum ratio for each ba-fuel
-    scaling_factors = (
-        scaling_factors.groupby(
-            ["ba_code", "fuel_category", "report_date"], dropna=False
-        )["scaling_factor"]
-        .min()
-        .reset_index()
+    scaling_factor = (
+        combined_data["eia930_profile"] / combined_data["cems_profile"]
+    ).where(combined_data["cems_profile"] > 0)
+    # find the minimum ratio for each ba-fuel-month
+    scaling_factor = broadcast_group_reduction(
+        scaling_factor.to_numpy(), group_ids, how="min"
     )
 
     # only keep scaling factors < 1, which means the data needs to be scaled
-    scaling_factors = scaling_factors[
-        (scaling_factors["scaling_factor"] < 1)
-        & (scaling_factors["scaling_factor"] > 0)
-    ]
-
-    # merge the scaling factor into the combined data
     # for any BA-fuels without a scaling factor, fill with 1 (scale to 100% of the origina data)
-    combined_data = combined_data.merge(
-        scaling_factors,
-        how="left",
-        on=["ba_code", "fuel_category", "report_date"],
-        validate="m:1",
+    combined_data["scaling_factor"] = np.where(
+        (scaling_factor < 1) & (scaling_factor > 0), scaling_factor, 1.0
     )
-    combined_data["scaling_factor"] = combined_data["scaling_factor"].fillna(1)
 
     # calculate the scaled cems data
     combined_data["cems_profile_scaled"] = (
@@ -501,38 +574,32 @@ def calculate_scaled_residual(combined_data):
     return combined_data
 
 
-def calculate_shifted_residual(combined_data):
-    # Find scaling factor
-    # only keep data where the cems data is greater than zero
-    scaling_factors = combined_data.copy()[combined_data["cems_profile"] != 0]
-    # calculate the ratio of 930 net generation to cems net generation
-    # if correct, ratio should be >=1
-    scaling_factors["shift_factor"] = (
-        scaling_factors["eia930_profile"] - scaling_factors["cems_profile"]
-    )
-    # find the minimum factor for each ba-fuel
-    scaling_factors = (
-        scaling_factors.groupby(
-            ["ba_code", "fuel_category", "report_date"], dropna=False
-        )["shift_factor"]
-        .min()
-        .reset_index()
-    )
-
-    # only keep scaling factors < 0, which means the data needs to be scaled
-    scaling_factors = scaling_factors[scaling_factors["shift_factor"] < 0]
+def calculate_shifted_residual(combined_data, group_ids=None):
+    """Shifts the cems profile so that it is always <= the eia930 profile for each ba-fuel-month.
 
-    # merge the scaling factor into the combined data
-    # for any BA-fuels without a scaling factor, fill with 1 (scale to 100% of the origina data)
-    combined_data = combined_data.merge(
-        scaling_factors,
-        how="left",
-        on=["ba_code", "fuel_category", "report_date"],
-        validate="m:1",
+    `group_ids` identifies the ba-fuel-month of each row (see `monthly_profile_group_ids`)
+    and will be calculated if not provided.
+    """
+    if group_ids is None:
+        group_ids = monthly_profile_group_ids(combined_data)
+
+    # Find shift factor
+    # only use data where the cems data is not zero
+    # calculate the difference between 930 net generation and cems net generation
+    # if correct, difference should be >=0
+    shift_factor = (
+        combined_data["eia930_profile"] - combined_data["cems_profile"]
+    ).where(combined_data["cems_profile"] != 0)
+    # find the minimum factor for each ba-fuel-month
+    shift_factor = broadcast_group_reduction(
+        shift_factor.to_numpy(), group_ids, how="min"
     )
-    combined_data["shift_factor"] = combined_data["shift_factor"].fillna(0)
 
-    # calculate the scaled cems data
+    # only keep shift factors < 0, which means the data needs to be shifted
+    # for any BA-fuels without a shift factor, fill with 0 (no shift)
+    combined_data["shift_factor"] = np.where(shift_factor < 0, shift_factor, 0.0)
+
+    # calculate the shifted cems data
     combined_data["cems_profile_shifted"] = (
         combined_data["cems_profile"] + combined_data["shift_factor"]
     )
@@ -545,43 +612,101 @@ def calculate_shifted_residual(combined_data):
     return combined_data
 
 
-def create_flat_profile(report_date, ba, fuel):
-    year = report_date.year
-
-    df_temporary = pd.DataFrame(
-        index=pd.date_range(
-            start=f"{year-1}-12-31 00:00:00",
-            end=f"{year+1}-01-01 23:00:00",
-            freq="H",
-            tz="UTC",
-            name="datetime_utc",
-        ),
-        columns=["ba_code", "fuel_category"],
-    ).reset_index()
+@functools.lru_cache(maxsize=None)
+def create_local_calendar(year: int, local_tz: str):
+    """Creates an hourly calendar for all hours of `year` in the local timezone.
+
+    The calendar is cached for each year and timezone, so the returned dataframe is
+    shared between callers and should not be modified in place.
 
-    df_temporary["imputed_profile"] = 1.0
-    df_temporary["datetime_local"] = ""
-    df_temporary["datetime_local"] = (
-        df_temporary["datetime_utc"]
-        .dt.tz_convert(load_data.ba_timezone(ba=ba, type="local"))
-        .astype(str)
+    Returns:
+        dataframe with columns `datetime_utc`, `datetime_local`, and `report_date`
+    """
+    calendar = pd.DataFrame(
+        {
+            "datetime_utc": pd.date_range(
+                start=f"{year-1}-12-31 00:00:00",
+                end=f"{year+1}-01-01 23:00:00",
+                freq="H",
+                tz="UTC",
+            )
+        }
+    )
+    calendar["datetime_local"] = (
+        calendar["datetime_utc"].dt.tz_convert(local_tz).astype(str)
     )
     # only keep data for which the local datetime is in the current year
-    df_temporary = df_temporary[
-        df_temporary["datetime_local"].str[:4].astype(int) == year
-    ]
+    calendar = calendar[calendar["datetime_local"].str[:4].astype(int) == year]
 
     # create a report date column
-    df_temporary["report_date"] = df_temporary["datetime_local"].str[:7]
-    df_temporary["report_date"] = pd.to_datetime(df_temporary["report_date"])
+    calendar["report_date"] = pd.to_datetime(calendar["datetime_local"].str[:7])
 
-    # only keep the report dates that match
-    df_temporary = df_temporary[df_temporary["report_date"] == report_date]
+    return calendar.reset_index(drop=True)
 
-    df_temporary["ba_code"] = ba
-    df_temporary["fuel_category"] = fuel
 
-    return df_temporary
+def add_local_timezone(profiles_to_impute):
+    """Adds the local timezone of each BA to a dataframe containing a `ba_code` column."""
+    ba_timezones = load_data.load_ba_reference()[["ba_code", "timezone_local"]]
+    profiles_to_impute = profiles_to_impute.merge(
+        ba_timezones, how="left", on="ba_code", validate="m:1"
+    )
+    missing_timezones = profiles_to_impute.loc[
+        profiles_to_impute["timezone_local"].isna(), "ba_code"
+    ].unique()
+    if len(missing_timezones) > 0:
+        raise UserWarning(
+            f"The BAs {list(missing_timezones)} do not have a timezone specified in data/manual/ba_reference.csv. Please add."
+        )
+    return profiles_to_impute
+
+
+def create_flat_profiles(profiles_to_impute, year):
+    """Creates a flat hourly profile for each BA-fuel-month in `profiles_to_impute`.
+
+    Args:
+        profiles_to_impute: dataframe with one row per `ba_code`, `fuel_category`, and
+            `report_date` that needs a profile
+        year: the year of data being processed
+    """
+    output_columns = [
+        "datetime_utc",
+        "ba_code",
+        "fuel_category",
+        "imputed_profile",
+        "datetime_local",
+        "report_date",
+    ]
+    if len(profiles_to_impute) == 0:
+        return pd.DataFrame(columns=output_columns)
+
+    profiles_to_impute = add_local_timezone(
+        profiles_to_impute[["ba_code", "fuel_category", "report_date"]]
+    )
+    calendars = pd.concat(
+        [
+            create_local_calendar(year, tz).assign(timezone_local=tz)
+            for tz in profiles_to_impute["timezone_local"].unique()
+        ],
+        axis=0,
+        ignore_index=True,
+    )
+    # only keep the calendar hours in the report date of each profile
+    flat_profiles = profiles_to_impute.merge(
+        calendars, how="inner", on=["timezone_local", "report_date"], validate="m:m"
+    ).drop(columns="timezone_local")
+    flat_profiles["imputed_profile"] = 1.0
+
+    return flat_profiles[output_columns]
+
+
+def create_flat_profile(report_date, ba, fuel):
+    """Creates a flat hourly profile for a single BA-fuel-month."""
+    return create_flat_profiles(
+        pd.DataFrame(
+            {"ba_code": [ba], "fuel_category": [fuel], "report_date": [report_date]}
+        ),
+        report_date.year,
+    )
 
 
 def impute_missing_hourly_profiles(
@@ -596,65 +721,71 @@ def impute_missing_hourly_profiles(
         monthly_eia_data_to_shape, residual_profiles, plant_attributes
     )
 
+    unknown_fuels = set(missing_profiles["fuel_category"]) - set(
+        WIND_SOLAR_FUELS + FLAT_PROFILE_FUELS
+    )
+    if len(unknown_fuels) > 0:
+        raise UserWarning(f"Fuel categories {unknown_fuels} not recognized.")
+
     # load information about directly interconnected balancing authorities (DIBAs)
     # this will help us fill profiles using data from nearby BAs
     dibas = load_data.load_diba_data(year)
+    # only use dibas located in the same region and located in the same time zone
+    dibas = dibas.loc[
+        (dibas.ba_region == dibas.diba_region)
+        & (dibas.timezone_local == dibas.timezone_local_diba),
+        ["ba_code", "diba_code"],
+    ].drop_duplicates()
+
+    # map each ba to its list of dibas
+    ba_dibas = dibas.groupby("ba_code")["diba_code"].apply(list).to_dict()
 
     # create an hourly datetime series in local time for each ba/fuel type
     hourly_profiles_to_add = []
 
-    for index, row in missing_profiles.iterrows():
-        ba = row["ba_code"]
-        fuel = row["fuel_category"]
-        report_date = row["report_date"]
-
-        # for wind and solar, average the wind and solar generation profiles from
-        # nearby interconnected BAs
-        if fuel in ["wind", "solar"]:
-            # get a list of diba located in the same region and located in the same time zone
-            ba_dibas = list(
-                dibas.loc[
-                    (dibas.ba_code == ba)
-                    & (dibas.ba_region == dibas.diba_region)
-                    & (dibas.timezone_local == dibas.timezone_local_diba),
-                    "diba_code",
-                ].unique()
+    # for wind and solar, average the wind and solar generation profiles from
+    # nearby interconnected BAs
+    wind_solar_profiles = missing_profiles.loc[
+        missing_profiles["fuel_category"].isin(WIND_SOLAR_FUELS),
+        ["ba_code", "fuel_category", "report_date"],
+    ]
+    diba_profiles = impute_diba_wind_solar_profiles(
+        build_profile_index(residual_profiles), wind_solar_profiles, ba_dibas
+    )
+    hourly_profiles_to_add.append(diba_profiles)
+
+    # if there are no neighboring DIBAs, or no data in the DIBAs, calculate a national average profile
+    national_profiles_to_impute = wind_solar_profiles[
+        ~isin_keys(
+            wind_solar_profiles,
+            diba_profiles,
+            ["ba_code", "fuel_category", "report_date"],
+        )
+    ]
+    for ba, fuel in national_profiles_to_impute[
+        ["ba_code", "fuel_category"]
+    ].itertuples(index=False):
+        if ba in ba_dibas:
+            # if this error is raised, we might have to implement an approach that uses average values for the wider region
+            logger.warning(
+                f"There is no {fuel} data in the DIBAs for {ba}: {ba_dibas[ba]}"
             )
-            if len(ba_dibas) > 0:
-                df_temporary = average_diba_wind_solar_profiles(
-                    residual_profiles, ba, fuel, report_date, ba_dibas
-                )
-            # if there are no neighboring DIBAs, calculate a national average profile
-            else:
-                df_temporary = average_national_wind_solar_profiles(
-                    residual_profiles, ba, fuel, report_date
-                )
 
-        # certain fuels we assume would be operated as baseload
-        elif fuel in ["geothermal", "biomass", "waste", "nuclear"]:
-            # assign a flat profile
-            df_temporary = create_flat_profile(report_date, ba, fuel)
-            df_temporary["imputation_method"] = "assumed_flat"
-
-        # For now assume hydro is dispatched with a flat profile
-        # TODO improve this assumption see: https://github.com/singularity-energy/open-grid-emissions/issues/37
-        elif fuel in ["hydro"]:
-            df_temporary = create_flat_profile(report_date, ba, fuel)
-            df_temporary["imputation_method"] = "assumed_flat"
-        # for any other fossil resources, use a flat profile
-        # TODO: we need to improve this method
-        # see: https://github.com/singularity-energy/open-grid-emissions/issues/96
-        elif fuel in ["natural_gas", "coal", "petroleum"]:
-            df_temporary = create_flat_profile(report_date, ba, fuel)
-            df_temporary["imputation_method"] = "assumed_flat"
-        elif fuel in ["other"]:
-            # assign a flat profile
-            df_temporary = create_flat_profile(report_date, ba, fuel)
-            df_temporary["imputation_method"] = "assumed_flat"
-        else:
-            raise UserWarning(f"Fuel category {fuel} not recognized.")
+    if len(national_profiles_to_impute) > 0:
+        hourly_profiles_to_add.append(
+            impute_national_wind_solar_profiles(
+                calculate_national_wind_solar_averages(residual_profiles),
+                national_profiles_to_impute,
+            )
+        )
 
-        hourly_profiles_to_add.append(df_temporary)
+    # all other fuels are assigned a flat profile
+    flat_profiles = create_flat_profiles(
+        missing_profiles[missing_profiles["fuel_category"].isin(FLAT_PROFILE_FUELS)],
+        year,
+    )
+    flat_profiles["imputation_method"] = "assumed_flat"
+    hourly_profiles_to_add.append(flat_profiles)
 
     hourly_profiles_to_add = pd.concat(
         hourly_profiles_to_add, axis=0, ignore_index=True
@@ -694,88 +825,278 @@ def identify_missing_profiles(
     ba_fuel_to_distribute = monthly_eia_data_to_shape[
         MONTHLY_GROUP_COLUMNS
     ].drop_duplicates()
-    missing_profiles = ba_fuel_to_distribute.merge(
-        available_profiles,
-        how="outer",
-        on=MONTHLY_GROUP_COLUMNS,
-        indicator="source",
-        validate="1:1",
-    )
     # identify ba fuel months where there is no data in the available residual profiles
-    missing_profiles = missing_profiles[missing_profiles.source == "left_only"]
-    missing_profiles = missing_profiles.drop(columns="source")
+    missing_profiles = ba_fuel_to_distribute[
+        ~isin_keys(ba_fuel_to_distribute, available_profiles, MONTHLY_GROUP_COLUMNS)
+    ]
     missing_profiles = missing_profiles.sort_values(by=MONTHLY_GROUP_COLUMNS)
 
     return missing_profiles
 
 
+def build_profile_index(residual_profiles, fuels=WIND_SOLAR_FUELS):
+    """Indexes the hourly eia930 profile of each BA by fuel and month.
+
+    Each entry of the index holds the profiles of every BA reporting that fuel in that
+    month as rows of an array, so that averages across BAs can be calculated without
+    searching the full hourly data.
+
+    Returns:
+        dictionary keyed by (fuel_category, report_date), where each value is a
+        dictionary containing:
+            "datetime_utc": DatetimeIndex of all hours reported in the month
+            "ba_rows": dictionary mapping each ba_code to its row in the arrays
+            "profiles": array (ba x hour) of eia930 profiles, NaN where missing
+            "has_data": array (ba x hour) identifying hours that the BA reported
+            "datetime_local": array (ba x hour) of local datetime strings
+    """
+    profiles = residual_profiles.loc[
+        residual_profiles["fuel_category"].isin(fuels),
+        [
+            "ba_code",
+            "fuel_category",
+            "datetime_utc",
+            "datetime_local",
+            "report_date",
+            "eia930_profile",
+        ],
+    ]
+    profile_index = {}
+    for (fuel, report_date), fuel_month_data in profiles.groupby(
+        ["fuel_category", "report_date"]
+    ):
+        ba_codes, ba_rows = np.unique(
+            fuel_month_data["ba_code"].to_numpy(), return_inverse=True
+        )
+        hour_columns, hours = pd.factorize(fuel_month_data["datetime_utc"], sort=True)
+        shape = (len(ba_codes), len(hours))
+
+        eia930_profiles = np.full(shape, np.NaN)
+        eia930_profiles[ba_rows, hour_columns] = fuel_month_data["eia930_profile"]
+        has_data = np.zeros(shape, dtype=bool)
+        has_data[ba_rows, hour_columns] = True
+        datetime_local = np.empty(shape, dtype=object)
+        datetime_local[ba_rows, hour_columns] = fuel_month_data["datetime_local"]
+
+        profile_index[(fuel, report_date)] = {
+            "datetime_utc": hours,
+            "ba_rows": {ba: row for row, ba in enumerate(ba_codes)},
+            "profiles": eia930_profiles,
+            "has_data": has_data,
+            "datetime_local": datetime_local,
+        }
+
+    return profile_index
+
+
+def calculate_diba_averages(fuel_month_index, target_bas, ba_dibas):
+    """Averages the DIBA profiles of each BA in `target_bas` for a single fuel-month.
+
+    Args:
+        fuel_month_index: a single entry of the index created by `build_profile_index`
+        target_bas: list of BAs for which to calculate a DIBA average
+        ba_dibas: dictionary mapping each ba_code to a list of its DIBAs
+    Returns:
+        averages: array (target ba x hour) of average DIBA profiles
+        has_data: array (target ba x hour) identifying hours reported by any DIBA
+        weights: array (target ba x indexed ba) identifying the DIBAs of each target ba
+    """
+    ba_rows = fuel_month_index["ba_rows"]
+    weights = np.zeros((len(target_bas), len(ba_rows)))
+    for target, ba in enumerate(target_bas):
+        for diba in ba_dibas.get(ba, []):
+            if diba in ba_rows:
+                weights[target, ba_rows[diba]] = 1
+
+    profiles = fuel_month_index["profiles"]
+    has_value = ~np.isnan(profiles)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = (weights @ np.where(has_value, profiles, 0)) / (weights @ has_value)
+    has_data = (weights @ fuel_month_index["has_data"]) > 0
+
+    return averages, has_data, weights
+
+
+def impute_diba_wind_solar_profiles(profile_index, profiles_to_impute, ba_dibas):
+    """Imputes profiles by averaging the profiles of directly interconnected BAs (DIBAs).
+
+    Args:
+        profile_index: index of wind and solar profiles created by `build_profile_index`
+        profiles_to_impute: dataframe with one row per `ba_code`, `fuel_category`, and
+            `report_date` that needs a profile
+        ba_dibas: dictionary mapping each ba_code to a list of its DIBAs, which
+            should be located in the same timezone as the ba
+    Returns:
+        dataframe of imputed hourly profiles. BA-fuel-months without any DIBA data are
+        not included.
+    """
+    imputed_profiles = []
+    for (fuel, report_date), target_bas in profiles_to_impute.groupby(
+        ["fuel_category", "report_date"]
+    )["ba_code"]:
+        if (fuel, report_date) not in profile_index:
+            continue
+        fuel_month_index = profile_index[(fuel, report_date)]
+        target_bas = list(target_bas.unique())
+        averages, has_data, weights = calculate_diba_averages(
+            fuel_month_index, target_bas, ba_dibas
+        )
+        target_rows, hour_columns = np.nonzero(has_data)
+        # use the local datetime reported by the first DIBA reporting each hour
+        diba_rows = np.argmax(
+            weights[:, :, np.newaxis] * fuel_month_index["has_data"][np.newaxis, :, :],
+            axis=1,
+        )[target_rows, hour_columns]
+        imputed_profiles.append(
+            pd.DataFrame(
+                {
+                    "fuel_category": fuel,
+                    "datetime_utc": fuel_month_index["datetime_utc"][hour_columns],
+                    "datetime_local": fuel_month_index["datetime_local"][
+                        diba_rows, hour_columns
+                    ],
+                    "report_date": report_date,
+                    "imputed_profile": averages[target_rows, hour_columns],
+                    "ba_code": np.array(target_bas, dtype=object)[target_rows],
+                }
+            )
+        )
+
+    if len(imputed_profiles) == 0:
+        imputed_profiles = pd.DataFrame(
+            columns=[
+                "fuel_category",
+                "datetime_utc",
+                "datetime_local",
+                "report_date",
+                "imputed_profile",
+                "ba_code",
+            ]
+        )
+    else:
+        imputed_profiles = pd.concat(imputed_profiles, axis=0, ignore_index=True)
+    imputed_profiles["imputation_method"] = "DIBA_average"
+
+    return imputed_profiles
+
+
 def average_diba_wind_solar_profiles(
     residual_profiles, ba, fuel, report_date, ba_dibas, validation_run=False
 ):
-
-    # calculate the average generation profile for the fuel in all neighboring DIBAs
-    df_temporary = residual_profiles.copy()[
-        (residual_profiles["ba_code"].isin(ba_dibas))
-        & (residual_profiles["fuel_category"] == fuel)
-        & (residual_profiles["report_date"] == report_date)
-    ]
+    """Calculates the average DIBA profile for a single BA-fuel-month."""
+    df_temporary = impute_diba_wind_solar_profiles(
+        build_profile_index(
+            residual_profiles[
+                (residual_profiles["ba_code"].isin(ba_dibas))
+                & (residual_profiles["report_date"] == report_date)
+            ],
+            fuels=[fuel],
+        ),
+        pd.DataFrame(
+            {"ba_code": [ba], "fuel_category": [fuel], "report_date": [report_date]}
+        ),
+        {ba: ba_dibas},
+    )
     if len(df_temporary) == 0 and not validation_run:
         # if this error is raised, we might have to implement an approach that uses average values for the wider region
         logger.warning(f"There is no {fuel} data in the DIBAs for {ba}: {ba_dibas}")
         df_temporary = average_national_wind_solar_profiles(
             residual_profiles, ba, fuel, report_date
         )
-    else:
-        df_temporary = (
-            df_temporary.groupby(
-                ["fuel_category", "datetime_utc", "datetime_local", "report_date"],
-                dropna=False,
-            )["eia930_profile"]
-            .mean()
-            .reset_index()
-        )
-        df_temporary["ba_code"] = ba
-        df_temporary["imputation_method"] = "DIBA_average"
-        df_temporary = df_temporary.rename(
-            columns={"eia930_profile": "imputed_profile"}
-        )
 
     return df_temporary
 
 
-def average_national_wind_solar_profiles(residual_profiles, ba, fuel, report_date):
-    df_temporary = residual_profiles.copy()[
-        (residual_profiles["fuel_category"] == fuel)
-        & (residual_profiles["report_date"] == report_date)
+def calculate_national_wind_solar_averages(residual_profiles):
+    """Calculates the national average wind and solar profile for each local hour of each month.
+
+    The average is calculated once for each fuel and month so that it can be re-used
+    for every BA that needs a national average profile (see
+    `impute_national_wind_solar_profiles`).
+    """
+    national_averages = residual_profiles.loc[
+        residual_profiles["fuel_category"].isin(WIND_SOLAR_FUELS),
+        ["fuel_category", "datetime_local", "report_date", "eia930_profile"],
     ]
     # strip the time zone information so we can group by local time
-    df_temporary["datetime_local"] = df_temporary["datetime_local"].str[:-6]
-    df_temporary = (
-        df_temporary.groupby(
+    national_averages["datetime_local"] = national_averages["datetime_local"].str[:-6]
+    national_averages = (
+        national_averages.groupby(
             ["fuel_category", "datetime_local", "report_date"],
             dropna=False,
         )["eia930_profile"]
         .mean()
         .reset_index()
+        .rename(columns={"eia930_profile": "imputed_profile"})
     )
-    df_temporary["ba_code"] = ba
-    df_temporary["imputation_method"] = "national_average"
-    df_temporary = df_temporary.rename(columns={"eia930_profile": "imputed_profile"})
+    national_averages["datetime_local"] = pd.to_datetime(
+        national_averages["datetime_local"]
+    )
+
+    return national_averages
+
 
-    # re-localize the datetime_local
-    local_tz = load_data.ba_timezone(ba, "local")
-    df_temporary["datetime_local"] = pd.to_datetime(df_temporary["datetime_local"])
-    df_temporary["datetime_local"] = (
-        df_temporary["datetime_local"]
-        .dt.tz_localize(local_tz, nonexistent="NaT", ambiguous="NaT")
-        .fillna(method="ffill")
+def impute_national_wind_solar_profiles(national_averages, profiles_to_impute):
+    """Assigns the national average profile to each BA-fuel-month in `profiles_to_impute`.
+
+    The local national average profile is localized once for each timezone, and then
+    assigned to each BA in that timezone.
+
+    Args:
+        national_averages: output of `calculate_national_wind_solar_averages`
+        profiles_to_impute: dataframe with one row per `ba_code`, `fuel_category`, and
+            `report_date` that needs a profile
+    """
+    profiles_to_impute = add_local_timezone(
+        profiles_to_impute[["ba_code", "fuel_category", "report_date"]]
     )
-    df_temporary["datetime_utc"] = df_temporary["datetime_local"].dt.tz_convert("UTC")
 
-    # drop duplicate datetimes around DST
-    df_temporary = df_temporary.drop_duplicates(subset=["datetime_utc"], keep="first")
+    localized_averages = []
+    for local_tz in profiles_to_impute["timezone_local"].unique():
+        df_temporary = national_averages.copy()
+        # re-localize the datetime_local
+        df_temporary["datetime_local"] = df_temporary["datetime_local"].dt.tz_localize(
+            local_tz, nonexistent="NaT", ambiguous="NaT"
+        )
+        df_temporary["datetime_local"] = df_temporary.groupby(
+            ["fuel_category", "report_date"], dropna=False
+        )["datetime_local"].ffill()
+        df_temporary["datetime_utc"] = df_temporary["datetime_local"].dt.tz_convert(
+            "UTC"
+        )
+        # drop duplicate datetimes around DST
+        df_temporary = df_temporary.drop_duplicates(
+            subset=["fuel_category", "report_date", "datetime_utc"], keep="first"
+        )
+        df_temporary["datetime_local"] = df_temporary["datetime_local"].astype(str)
+        df_temporary["timezone_local"] = local_tz
+        localized_averages.append(df_temporary)
+    localized_averages = pd.concat(localized_averages, axis=0, ignore_index=True)
+
+    national_profiles = profiles_to_impute.merge(
+        localized_averages,
+        how="inner",
+        on=["timezone_local", "fuel_category", "report_date"],
+        validate="m:m",
+    ).drop(columns="timezone_local")
+    national_profiles["imputation_method"] = "national_average"
+
+    return national_profiles
 
-    return df_temporary
+
+def average_national_wind_solar_profiles(residual_profiles, ba, fuel, report_date):
+    """Calculates a national average profile for a single BA-fuel-month."""
+    return impute_national_wind_solar_profiles(
+        calculate_national_wind_solar_averages(
+            residual_profiles[
+                (residual_profiles["fuel_category"] == fuel)
+                & (residual_profiles["report_date"] == report_date)
+            ]
+        ),
+        pd.DataFrame(
+            {"ba_code": [ba], "fuel_category": [fuel], "report_date": [report_date]}
+        ),
+    )
 
 
 def add_missing_cems_profiles(hourly_profiles, cems, plant_attributes):
@@ -807,14 +1128,13 @@ def add_missing_cems_profiles(hourly_profiles, cems, plant_attributes):
     )
 
     # Remove data where too few plants
-    cems_ba_fuel = cems_ba_fuel.merge(
-        cems_count,
-        how="left",
-        on=["ba_code", "fuel_category", "report_date"],
-        validate="m:1",
-    )
-    cems_ba_fuel = cems_ba_fuel[cems_ba_fuel["n_unique_plants"] > 3]
-    cems_ba_fuel = cems_ba_fuel.drop(columns=["n_unique_plants"])
+    cems_ba_fuel = cems_ba_fuel[
+        isin_keys(
+            cems_ba_fuel,
+            cems_count[cems_count["n_unique_plants"] > 3],
+            ["ba_code", "fuel_category", "report_date"],
+        )
+    ]
 
     # remove months where there is zero generation reported
     months_with_zero_data = (
@@ -828,15 +1148,14 @@ def add_missing_cems_profiles(hourly_profiles, cems, plant_attributes):
         months_with_zero_data["net_generation_mwh"] == 0,
         ["ba_code", "fuel_category", "report_date"],
     ]
-    cems_ba_fuel = cems_ba_fuel.merge(
-        months_with_zero_data,
-        how="outer",
-        on=["ba_code", "fuel_category", "report_date"],
-        indicator="zero_filter",
-        validate="m:1",
-    )
-    cems_ba_fuel = cems_ba_fuel[cems_ba_fuel["zero_filter"] != "both"]
-    cems_ba_fuel = cems_ba_fuel.drop(columns=["zero_filter", "report_date"])
+    cems_ba_fuel = cems_ba_fuel[
+        ~isin_keys(
+            cems_ba_fuel,
+            months_with_zero_data,
+            ["ba_code", "fuel_category", "report_date"],
+        )
+    ]
+    cems_ba_fuel = cems_ba_fuel.drop(columns=["report_date"])
 
     # remove duplicate datetime values
     cems_ba_fuel = (
@@ -901,6 +1220,11 @@ def combine_and_export_hourly_plant_data(
     path_prefix,
     skip_outputs,
     region_to_group,
+    max_workers=1,
+    memory_limit_gb=None,
+    csv_writer="pandas",
+    csv_compression=None,
+    results_dataset=False,
 ):
     """
     Exports files with hourly data for each individual plant, split up by region.
@@ -912,31 +1236,16 @@ def combine_and_export_hourly_plant_data(
 
     All of the inputs are dataframes containing data from the data pipeline except for `region_to_group`
     `region_to_group` identifying whether "ba_code" or "state" should be used to group the data. "ba_code" is the default.
+
+    If `max_workers` is greater than 1, regions are processed concurrently in a process
+    pool (see `export_hourly_plant_data_in_parallel`), and `memory_limit_gb` limits the
+    estimated memory used by all regions being processed at once. If `max_workers` is
+    None, one worker is used for each CPU. `csv_writer`, `csv_compression`, and
+    `results_dataset` are passed to `output_data.output_to_results()`.
     """
 
-    # specify the names of the columns that we want to use to group the data
-    key_columns = [
-        "plant_id_eia",
-        "datetime_utc",
-    ]
-    # specify the data columns that should be included in the output files
-    data_columns_for_plant_export = [
-        "net_generation_mwh",
-        "fuel_consumed_mmbtu",
-        "fuel_consumed_for_electricity_mmbtu",
-        "co2_mass_lb",
-        "ch4_mass_lb",
-        "n2o_mass_lb",
-        "nox_mass_lb",
-        "so2_mass_lb",
-        "co2_mass_lb_for_electricity",
-        "ch4_mass_lb_for_electricity",
-        "n2o_mass_lb_for_electricity",
-        "nox_mass_lb_for_electricity",
-        "so2_mass_lb_for_electricity",
-        "co2_mass_lb_for_electricity_adjusted",
-    ]
-    all_columns = key_columns + data_columns_for_plant_export
+    key_columns = PLANT_EXPORT_KEY_COLUMNS
+    all_columns = key_columns + PLANT_EXPORT_DATA_COLUMNS
 
     validation.ensure_non_overlapping_data_from_all_sources(
         cems, partial_cems_subplant, partial_cems_plant, monthly_eia_data_to_shape
@@ -1020,77 +1329,389 @@ def combine_and_export_hourly_plant_data(
         validate="m:1",
     )
 
-    # for each region, shape the EIA-only data, combine with CEMS data, and export
-    for region in list(plant_attributes[region_to_group].unique()):
-
-        # filter each of the data sources to the region
-        eia_region = monthly_eia_data_to_shape_agg[
-            monthly_eia_data_to_shape_agg[region_to_group] == region
-        ].copy()
-        cems_region = cems_agg[cems_agg[region_to_group] == region].copy()
-        partial_cems_plant_region = partial_cems_plant_agg[
-            partial_cems_plant_agg[region_to_group] == region
-        ].copy()
-        partial_cems_subplant_region = partial_cems_subplant_agg[
-            partial_cems_subplant_agg[region_to_group] == region
-        ].copy()
-
-        # shape the eia data
-        shaped_eia_region_data = shape_monthly_eia_data_as_hourly(
-            eia_region, hourly_profiles
+    # calculate the decimals to round the results to from the data for all regions, so
+    # that every region is rounded the same way regardless of which process exports it
+    rounding_plans = plan_hourly_plant_data_rounding(
+        [cems_agg, partial_cems_subplant_agg, partial_cems_plant_agg],
+        monthly_eia_data_to_shape_agg,
+        path_prefix,
+    )
+
+    regions = list(plant_attributes[region_to_group].unique())
+    if max_workers is None:
+        max_workers = os.cpu_count()
+    if max_workers > 1:
+        export_hourly_plant_data_in_parallel(
+            regions,
+            region_to_group,
+            {
+                "eia": monthly_eia_data_to_shape_agg,
+                "cems": cems_agg,
+                "partial_cems_subplant": partial_cems_subplant_agg,
+                "partial_cems_plant": partial_cems_plant_agg,
+            },
+            hourly_profiles,
+            path_prefix,
+            skip_outputs,
+            max_workers,
+            memory_limit_gb,
+            csv_writer,
+            rounding_plans,
+            csv_compression,
+            results_dataset,
         )
+        return
 
-        # validate that the shaped data contains no duplicate datetimes
-        validation.validate_unique_datetimes(
-            df=shaped_eia_region_data,
-            df_name="shaped_eia_data",
-            keys=["plant_id_eia"],
-        )
+    # index the hourly profiles once so that they can be used to shape each region
+    profile_index = index_hourly_profiles(hourly_profiles)
 
-        # concat all of the data together
-        combined_plant_data = pd.concat(
-            [
-                cems_region,
-                partial_cems_subplant_region,
-                partial_cems_plant_region,
-                shaped_eia_region_data,
-            ],
-            axis=0,
-            ignore_index=True,
-            copy=False,
+    # split each of the data sources by region
+    eia_partitions = output_data.partition_dataframe(
+        monthly_eia_data_to_shape_agg, region_to_group
+    )
+    cems_partitions = output_data.partition_dataframe(cems_agg, region_to_group)
+    partial_cems_plant_partitions = output_data.partition_dataframe(
+        partial_cems_plant_agg, region_to_group
+    )
+    partial_cems_subplant_partitions = output_data.partition_dataframe(
+        partial_cems_subplant_agg, region_to_group
+    )
+
+    # for each region, shape the EIA-only data, combine with CEMS data, and export
+    for region in regions:
+
+        # get the data for the region from each of the data sources
+        eia_region = eia_partitions.get(
+            region, monthly_eia_data_to_shape_agg.iloc[:0]
+        ).copy()
+        cems_region = cems_partitions.get(region, cems_agg.iloc[:0]).copy()
+        partial_cems_plant_region = partial_cems_plant_partitions.get(
+            region, partial_cems_plant_agg.iloc[:0]
+        ).copy()
+        partial_cems_subplant_region = partial_cems_subplant_partitions.get(
+            region, partial_cems_subplant_agg.iloc[:0]
+        ).copy()
+
+        export_hourly_plant_data_for_region(
+            region,
+            eia_region,
+            [cems_region, partial_cems_subplant_region, partial_cems_plant_region],
+            hourly_profiles,
+            profile_index,
+            path_prefix,
+            skip_outputs,
+            csv_writer,
+            rounding_plans,
+            csv_compression,
+            results_dataset,
         )
 
-        del (
-            cems_region,
-            partial_cems_subplant_region,
-            partial_cems_plant_region,
-            shaped_eia_region_data,
+
+def plan_hourly_plant_data_rounding(hourly_data, monthly_eia_data, path_prefix):
+    """
+    Calculates the rounding plan for the hourly plant data of every region from a sample
+    of the data for all regions (see `output_data.plan_rounding()`).
+
+    The EIA-only data has not been shaped yet, so the monthly data is spread evenly over
+    the hours of each month to estimate the magnitude of its hourly values.
+
+    Args:
+        hourly_data: list of aggregated hourly dataframes (cems, partial cems subplant,
+            and partial cems plant data) for all regions
+        monthly_eia_data: aggregated monthly EIA-only data for all regions
+    Returns:
+        dictionary of {unit: {column: decimals}}
+    """
+    hours_in_month = monthly_eia_data["report_date"].dt.days_in_month * 24
+    hourly_eia_data = monthly_eia_data.reindex(
+        columns=PLANT_EXPORT_DATA_COLUMNS
+    ).divide(hours_in_month, axis=0)
+    sample = pd.concat(
+        [
+            output_data.sample_rows(df.reindex(columns=PLANT_EXPORT_DATA_COLUMNS))
+            for df in hourly_data + [hourly_eia_data]
+        ],
+        ignore_index=True,
+    ).astype("float64")
+    # the data is rounded to two decimal places before it is exported
+    return output_data.plan_rounding(
+        sample.round(2), path_prefix, "plant_data/hourly/", include_metric=False
+    )
+
+
+def export_hourly_plant_data_for_region(
+    region,
+    eia_region,
+    hourly_region_data,
+    hourly_profiles,
+    profile_index,
+    path_prefix,
+    skip_outputs,
+    csv_writer="pandas",
+    rounding_plans=None,
+    csv_compression=None,
+    results_dataset=False,
+):
+    """Shapes the EIA-only data for a region, combines it with hourly data, and exports it.
+
+    Args:
+        region: name of the region, used as the output file name
+        eia_region: aggregated monthly EIA-only data for the region
+        hourly_region_data: list of aggregated hourly dataframes (cems, partial cems
+            subplant, and partial cems plant data) for the region
+        hourly_profiles: dataframe of hourly profiles used to shape the EIA data
+        profile_index: output of `index_hourly_profiles(hourly_profiles)`
+        rounding_plans: the rounding plans for the hourly plant data of all regions,
+            from `plan_hourly_plant_data_rounding()`
+        csv_compression: passed to `output_data.output_to_results()`
+        results_dataset: passed to `output_data.output_to_results()`
+    """
+    # shape the eia data
+    shaped_eia_region_data = shape_monthly_eia_data_as_hourly(
+        eia_region, hourly_profiles, profile_index
+    )
+
+    # validate that the shaped data contains no duplicate datetimes
+    validation.validate_unique_datetimes(
+        df=shaped_eia_region_data,
+        df_name="shaped_eia_data",
+        keys=["plant_id_eia"],
+    )
+
+    # concat all of the data together
+    combined_plant_data = pd.concat(
+        hourly_region_data + [shaped_eia_region_data],
+        axis=0,
+        ignore_index=True,
+        copy=False,
+    )
+
+    del (hourly_region_data, shaped_eia_region_data)
+
+    # groupby plant in case some plant data was split between multiple dfs
+    combined_plant_data = (
+        combined_plant_data.groupby(PLANT_EXPORT_KEY_COLUMNS, dropna=False)
+        .sum(numeric_only=True)
+        .reset_index()
+    )
+
+    # round the data columns to two decimal places
+    combined_plant_data[PLANT_EXPORT_DATA_COLUMNS] = combined_plant_data[
+        PLANT_EXPORT_DATA_COLUMNS
+    ].round(2)
+
+    # re-order columns
+    combined_plant_data = combined_plant_data[
+        PLANT_EXPORT_KEY_COLUMNS + PLANT_EXPORT_DATA_COLUMNS
+    ]
+
+    # write data
+    output_data.output_to_results(
+        combined_plant_data,
+        region,
+        "plant_data/hourly/",
+        path_prefix,
+        skip_outputs,
+        include_metric=False,
+        csv_writer=csv_writer,
+        rounding_plans=rounding_plans,
+        csv_compression=csv_compression,
+        results_dataset=results_dataset,
+    )
+
+
+def export_hourly_plant_data_in_parallel(
+    regions,
+    region_to_group,
+    aggregated_data,
+    hourly_profiles,
+    path_prefix,
+    skip_outputs,
+    max_workers,
+    memory_limit_gb=None,
+    csv_writer="pandas",
+    rounding_plans=None,
+    csv_compression=None,
+    results_dataset=False,
+):
+    """Shapes and exports the hourly plant data for each region in a process pool.
+
+    The hourly profiles and the aggregated data for each region are written to
+    uncompressed Arrow files, which each worker memory-maps rather than receiving a
+    pickled copy of the data. Regions are submitted largest first, and a region is only
+    started if the estimated memory of all running regions stays below the memory limit,
+    so the number of concurrent regions adapts to the memory available.
+
+    Args:
+        regions: list of regions to export
+        region_to_group: name of the column identifying the region of each plant
+        aggregated_data: dictionary of aggregated dataframes with keys "eia", "cems",
+            "partial_cems_subplant", and "partial_cems_plant"
+        hourly_profiles: dataframe of hourly profiles used to shape the EIA data
+        max_workers: the maximum number of regions to process at once
+        memory_limit_gb: the maximum estimated memory of all running regions. Defaults
+            to 75% of the memory available when the export starts.
+        csv_writer: passed to `output_data.write_csv()`
+        rounding_plans: passed to `export_hourly_plant_data_for_region()`
+        csv_compression: passed to `output_data.output_to_results()`
+        results_dataset: passed to `output_data.output_to_results()`
+    """
+    if memory_limit_gb is None:
+        available_memory = get_available_memory()
+        memory_limit = np.inf if available_memory is None else 0.75 * available_memory
+    else:
+        memory_limit = memory_limit_gb * 1e9
+
+    with tempfile.TemporaryDirectory(dir=outputs_folder(path_prefix)) as shared_folder:
+        profiles_file = os.path.join(shared_folder, "hourly_profiles.arrow")
+        feather.write_feather(
+            hourly_profiles[
+                MONTHLY_PROFILE_KEYS
+                + ["datetime_utc", "profile", "flat_profile", "profile_method"]
+            ].reset_index(drop=True),
+            profiles_file,
+            compression="uncompressed",
         )
 
-        # groupby plant in case some plant data was split between multiple dfs
-        combined_plant_data = (
-            combined_plant_data.groupby(key_columns, dropna=False)
-            .sum(numeric_only=True)
-            .reset_index()
+        # write the data for each region to its own set of files
+        partitions = {
+            name: output_data.partition_dataframe(df, region_to_group)
+            for name, df in aggregated_data.items()
+        }
+        tasks = []
+        for region_number, region in enumerate(regions):
+            region_files = {}
+            estimated_rows = 0
+            for name, df in aggregated_data.items():
+                region_df = (
+                    partitions[name].get(region, df.iloc[:0]).reset_index(drop=True)
+                )
+                region_files[name] = os.path.join(
+                    shared_folder, f"region_{region_number}_{name}.arrow"
+                )
+                feather.write_feather(
+                    region_df, region_files[name], compression="uncompressed"
+                )
+                # each monthly EIA record is shaped into up to 744 hourly records
+                estimated_rows += len(region_df) * (744 if name == "eia" else 1)
+            tasks.append((region, region_files, estimate_export_memory(estimated_rows)))
+        tasks = sorted(tasks, key=lambda task: task[2], reverse=True)
+
+        logger.info(
+            f"Exporting {len(tasks)} regions using up to {max_workers} processes"
         )
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+            while len(tasks) > 0 or len(running) > 0:
+                # start each region that fits within the memory limit. If no regions
+                # are running, start the next region even if it exceeds the limit.
+                for task in list(tasks):
+                    if len(running) >= max_workers:
+                        break
+                    running_memory = sum(running.values())
+                    if (len(running) == 0) or (
+                        running_memory + task[2] <= memory_limit
+                    ):
+                        future = executor.submit(
+                            export_hourly_plant_data_from_files,
+                            task[0],
+                            task[1],
+                            profiles_file,
+                            path_prefix,
+                            skip_outputs,
+                            csv_writer,
+                            rounding_plans,
+                            csv_compression,
+                            results_dataset,
+                        )
+                        running[future] = task[2]
+                        tasks.remove(task)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # raise any errors from the worker
+                    future.result()
+                    del running[future]
+
+
+def export_hourly_plant_data_from_files(
+    region,
+    region_files,
+    profiles_file,
+    path_prefix,
+    skip_outputs,
+    csv_writer="pandas",
+    rounding_plans=None,
+    csv_compression=None,
+    results_dataset=False,
+):
+    """Worker used by `export_hourly_plant_data_in_parallel` to export a single region."""
+    region_data = {
+        name: feather.read_table(path, memory_map=True).to_pandas()
+        for name, path in region_files.items()
+    }
+    eia_region = region_data["eia"]
+
+    # only load the profiles needed to shape the data for this region
+    hourly_profiles = feather.read_table(profiles_file, memory_map=True)
+    if "ba_code" in eia_region.columns:
+        hourly_profiles = hourly_profiles.filter(
+            pc.is_in(
+                hourly_profiles["ba_code"],
+                value_set=pa.array(
+                    eia_region["ba_code"].unique().tolist(),
+                    type=hourly_profiles.schema.field("ba_code").type,
+                    from_pandas=True,
+                ),
+            )
+        )
+    hourly_profiles = hourly_profiles.to_pandas()
 
-        # round the data columns to two decimal places
-        combined_plant_data[data_columns_for_plant_export] = combined_plant_data[
-            data_columns_for_plant_export
-        ].round(2)
+    export_hourly_plant_data_for_region(
+        region,
+        eia_region,
+        [
+            region_data["cems"],
+            region_data["partial_cems_subplant"],
+            region_data["partial_cems_plant"],
+        ],
+        hourly_profiles,
+        index_hourly_profiles(hourly_profiles),
+        path_prefix,
+        skip_outputs,
+        csv_writer,
+        rounding_plans,
+        csv_compression,
+        results_dataset,
+    )
 
-        # re-order columns
-        combined_plant_data = combined_plant_data[all_columns]
 
-        # write data
-        output_data.output_to_results(
-            combined_plant_data,
-            region,
-            "plant_data/hourly/",
-            path_prefix,
-            skip_outputs,
-            include_metric=False,
-        )
+def estimate_export_memory(n_rows):
+    """Estimates the peak memory in bytes used to export `n_rows` of hourly plant data.
+
+    Each row contains the key and data columns of the plant export, and the data is
+    copied about three times while it is combined, grouped, and rounded.
+    """
+    bytes_per_row = 8 * (
+        len(PLANT_EXPORT_KEY_COLUMNS) + len(PLANT_EXPORT_DATA_COLUMNS) + 2
+    )
+    return 3 * n_rows * bytes_per_row
+
+
+def get_available_memory():
+    """Returns the available physical memory in bytes, or None if it cannot be determined.
+
+    This is `MemAvailable` from /proc/meminfo, which unlike the free memory includes
+    the page cache and other memory that can be reclaimed. It is only available on Linux.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    # the value is reported in kB
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
 
 
 def get_shaped_plant_id_from_ba_fuel(df):
@@ -1173,49 +1794,118 @@ def aggregate_eia_data_to_ba_fuel(
     return eia_agg, plant_attributes
 
 
-def shape_monthly_eia_data_as_hourly(monthly_eia_data_to_shape, hourly_profiles):
+def index_hourly_profiles(hourly_profiles):
+    """Indexes hourly profiles so that monthly data can be shaped without merging.
+
+    The profiles are stored as a (profile key x hour) table, where the hours of each
+    ba-fuel-month profile key are a contiguous block of rows in the profile arrays.
+
+    Returns:
+        dictionary containing:
+            "keys": dataframe with one row per `ba_code`, `fuel_category`, and
+                `report_date`, with the `start` row and `n_hours` of its profile
+            "datetime_utc", "profile", "flat_profile", "profile_method": arrays of
+                hourly values, sorted by profile key
+    """
+    group_ids = monthly_profile_group_ids(hourly_profiles)
+    # sort the hours by profile key, keeping the existing order of hours within each key
+    order = np.argsort(group_ids, kind="stable")
+    sorted_ids = group_ids[order]
+
+    keys = hourly_profiles[MONTHLY_PROFILE_KEYS].take(order).reset_index(drop=True)
+    if len(sorted_ids) == 0:
+        starts = np.array([], dtype=int)
+    else:
+        starts = np.flatnonzero(
+            np.concatenate([[True], sorted_ids[1:] != sorted_ids[:-1]])
+        )
+    keys = keys.take(starts).reset_index(drop=True)
+    keys["start"] = starts
+    keys["n_hours"] = np.diff(np.append(starts, len(sorted_ids)))
+
+    return {
+        "keys": keys,
+        "datetime_utc": hourly_profiles["datetime_utc"].array.take(order),
+        "profile": hourly_profiles["profile"].to_numpy(dtype=float)[order],
+        "flat_profile": hourly_profiles["flat_profile"].to_numpy(dtype=float)[order],
+        "profile_method": hourly_profiles["profile_method"].to_numpy()[order],
+    }
+
+
+def shape_monthly_eia_data_as_hourly(
+    monthly_eia_data_to_shape, hourly_profiles, profile_index=None
+):
     """
     Uses monthly-level EIA data and assigns an hourly profile
     Intended for calling after `monthly_eia_data_to_ba`
     Inputs:
         shaped_monthly_data: a dataframe that contains monthly total net generation,
             fuel consumption, and co2 data, along with columns for report_date and ba_code
+        hourly_profiles: dataframe of hourly profiles for each ba-fuel
+        profile_index: optional output of `index_hourly_profiles(hourly_profiles)`.
+            When shaping data for many regions, index the profiles once and pass it here.
+
+    Each plant-month is matched to its ba-fuel-month profile once, and the hourly data is
+    created by gathering the hours of that profile and multiplying by the monthly values,
+    rather than merging all profile columns into each plant-month.
     """
+    if profile_index is None:
+        profile_index = index_hourly_profiles(hourly_profiles)
 
-    # merge the hourly profiles into each plant-month
-    shaped_monthly_data = monthly_eia_data_to_shape.merge(
-        hourly_profiles[
-            [
-                "ba_code",
-                "fuel_category",
-                "datetime_utc",
-                "report_date",
-                "profile",
-                "flat_profile",
-                "profile_method",
-            ]
-        ],
+    # identify the profile for each plant-month
+    monthly_eia_data_to_shape = monthly_eia_data_to_shape.reset_index(drop=True)
+    profile_keys = monthly_eia_data_to_shape[MONTHLY_PROFILE_KEYS].merge(
+        profile_index["keys"],
         how="left",
-        on=["report_date", "fuel_category", "ba_code"],
-        validate="m:m",
+        on=MONTHLY_PROFILE_KEYS,
+        validate="m:1",
     )
+    # plant-months without a matching profile are kept as a single row with missing data
+    n_hours = profile_keys["n_hours"].fillna(1).to_numpy(dtype=int)
+    starts = profile_keys["start"].fillna(-1).to_numpy(dtype=int)
+
+    # for each hour, identify the plant-month and the row of the profile arrays
+    plant_rows = np.repeat(np.arange(len(monthly_eia_data_to_shape)), n_hours)
+    hour_offsets = np.arange(len(plant_rows)) - np.repeat(
+        np.cumsum(n_hours) - n_hours, n_hours
+    )
+    profile_rows = np.where(
+        np.repeat(starts, n_hours) >= 0, np.repeat(starts, n_hours) + hour_offsets, -1
+    )
+
+    def gather_profile(column):
+        return pd.api.extensions.take(
+            profile_index[column], profile_rows, allow_fill=True
+        )
+
+    shaped_monthly_data = monthly_eia_data_to_shape[
+        [
+            col
+            for col in ["plant_id_eia", "ba_code", "fuel_category", "report_date"]
+            if col in monthly_eia_data_to_shape.columns
+        ]
+    ].take(plant_rows)
+    shaped_monthly_data = shaped_monthly_data.reset_index(drop=True)
+    shaped_monthly_data["datetime_utc"] = gather_profile("datetime_utc")
+    profile = gather_profile("profile")
+    profile_method = gather_profile("profile_method")
 
     # plant-months where there is negative net generation, assign a flat profile
-    shaped_monthly_data.loc[
-        shaped_monthly_data["net_generation_mwh"] < 0, "profile"
-    ] = shaped_monthly_data.loc[
-        shaped_monthly_data["net_generation_mwh"] < 0, "flat_profile"
-    ]
+    negative_generation = (
+        monthly_eia_data_to_shape["net_generation_mwh"].to_numpy(dtype=float) < 0
+    )[plant_rows]
+    profile = np.where(negative_generation, gather_profile("flat_profile"), profile)
     # update the method column
-    shaped_monthly_data.loc[
-        shaped_monthly_data["net_generation_mwh"] < 0, "profile_method"
-    ] = "flat_negative_generation"
+    shaped_monthly_data["profile_method"] = np.where(
+        negative_generation, "flat_negative_generation", profile_method
+    )
 
     # shape the data
     for column in DATA_COLUMNS:
-        if column in shaped_monthly_data.columns:
+        if column in monthly_eia_data_to_shape.columns:
             shaped_monthly_data[column] = (
-                shaped_monthly_data[column] * shaped_monthly_data["profile"]
+                monthly_eia_data_to_shape[column].to_numpy(dtype=float)[plant_rows]
+                * profile
             )
         else:
             pass
@@ -1410,21 +2100,16 @@ def shape_partial_cems_subplants(cems, eia923_allocated):
         )
 
         # split the cems data into partial cems and cems
-        cems = cems.merge(
-            eia_data_to_shape[SUBPLANT_KEYS],
-            how="outer",
-            on=SUBPLANT_KEYS,
-            indicator="data_source",
-            validate="m:1",
-        )
-        if len(cems[cems["data_source"] == "right_only"]) > 0:
+        subplant_months = match_keys(cems, eia_data_to_shape, SUBPLANT_KEYS)
+        if np.isin(
+            np.arange(len(eia_data_to_shape)), subplant_months, invert=True
+        ).any():
             raise UserWarning(
                 " At least one subplant-month identified as partial_cems does not exist in the cems data."
             )
-        partial_cems_data = (
-            cems[cems["data_source"] == "both"].copy().drop(columns=["data_source"])
-        )
-        cems = cems[cems["data_source"] == "left_only"].drop(columns=["data_source"])
+        is_partial_cems = subplant_months >= 0
+        partial_cems_data = cems[is_partial_cems].copy()
+        cems = cems[~is_partial_cems]
 
         # merge cems gross generation and fuel consumption totals into the EIA totals
         # these will be used to scale the EIA data
@@ -1445,114 +2130,48 @@ def shape_partial_cems_subplants(cems, eia923_allocated):
 
         partial_cems_shaped = partial_cems_data.copy()
 
+        # identify the subplant-month of each hour of partial cems data
+        # hours with missing keys do not belong to any subplant-month
+        hourly_subplant_month = subplant_months[is_partial_cems]
+        hourly_subplant_month[
+            partial_cems_data[SUBPLANT_KEYS].isna().any(axis=1).to_numpy()
+        ] = -1
+        has_subplant_month = hourly_subplant_month >= 0
+        # count the number of hours in each subplant-month
+        number_of_hours = np.bincount(
+            hourly_subplant_month[has_subplant_month], minlength=len(eia_data_to_shape)
+        )
+
+        scaling_methods = identify_partial_cems_scaling_methods(
+            eia_data_to_shape, number_of_hours
+        )
+
         # shape the cems data
-        for index, row in eia_data_to_shape.iterrows():
-            plant_id = row.plant_id_eia
-            subplant_id = row.subplant_id
-            report_date = row.report_date
-
-            for eia_column in DATA_COLUMNS:
-                # we will shape net generation data based on the cems gross gen profile
-                if eia_column == "net_generation_mwh":
-                    cems_total_column = "gross_generation_mwh"
-                    cems_column = "gross_generation_mwh"
-                # all other fuel and emissions data will be shaped using the fuel profile
-                else:
-                    cems_total_column = "fuel_consumed_mmbtu_cems"
-                    cems_column = "fuel_consumed_mmbtu"
-
-                # if both values are zero, do nothing since the profile is already zero
-                if (row[eia_column] == 0) & (row[cems_total_column] == 0):
-                    partial_cems_shaped = set_value_to_zero(
-                        partial_cems_shaped,
-                        partial_cems_data,
-                        report_date,
-                        plant_id,
-                        subplant_id,
-                        eia_column,
-                    )
-                # if the eia data is positive, but the cems data is zero, use the fuel data to shape it
-                elif (
-                    (row[eia_column] > 0)
-                    & (row[cems_total_column] == 0)
-                    & (row["fuel_consumed_mmbtu_cems"] != 0)
-                ):
-                    cems_column = "fuel_consumed_mmbtu"
-                    scaling_factor = row[eia_column] / row["fuel_consumed_mmbtu_cems"]
-                    partial_cems_shaped = scale_data(
-                        partial_cems_shaped,
-                        partial_cems_data,
-                        report_date,
-                        plant_id,
-                        subplant_id,
-                        eia_column,
-                        cems_column,
-                        scaling_factor,
-                    )
-                # if the eia data is positive but all cems data is zero, assign a flat profile
-                elif (
-                    (row[eia_column] > 0)
-                    & (row[cems_total_column] == 0)
-                    & (row["fuel_consumed_mmbtu_cems"] == 0)
-                ):
-                    shift_factor = row[eia_column] - row[cems_total_column]
-                    partial_cems_shaped = shift_data(
-                        partial_cems_shaped,
-                        partial_cems_data,
-                        report_date,
-                        plant_id,
-                        subplant_id,
-                        eia_column,
-                        cems_column,
-                        shift_factor,
-                    )
-                # if the eia value is negative (should only be for net generation), shift data
-                elif row[eia_column] < 0:
-                    shift_factor = row[eia_column] - row[cems_total_column]
-                    partial_cems_shaped = shift_data(
-                        partial_cems_shaped,
-                        partial_cems_data,
-                        report_date,
-                        plant_id,
-                        subplant_id,
-                        eia_column,
-                        cems_column,
-                        shift_factor,
-                    )
-                # if the eia net generation is zero and cems gross generation is positive, shift the data
-                elif (
-                    (eia_column == "net_generation_mwh")
-                    & (row[eia_column] == 0)
-                    & (row[cems_total_column] > 0)
-                ):
-                    shift_factor = row[eia_column] - row[cems_total_column]
-                    partial_cems_shaped = shift_data(
-                        partial_cems_shaped,
-                        partial_cems_data,
-                        report_date,
-                        plant_id,
-                        subplant_id,
-                        eia_column,
-                        cems_column,
-                        shift_factor,
-                    )
-                # if both values are positive, scale the data
-                elif (row[eia_column] >= 0) & (row[cems_total_column] > 0):
-                    scaling_factor = row[eia_column] / row[cems_total_column]
-                    partial_cems_shaped = scale_data(
-                        partial_cems_shaped,
-                        partial_cems_data,
-                        report_date,
-                        plant_id,
-                        subplant_id,
-                        eia_column,
-                        cems_column,
-                        scaling_factor,
-                    )
-                else:
-                    raise UserWarning(
-                        f"Uncategorized combination of {eia_column} data for plant {plant_id} subplant {subplant_id} in {report_date}:\n   EIA data is {row[eia_column]} and CEMS data is {row[cems_total_column]}"
-                    )
+        for eia_column in DATA_COLUMNS:
+            method, factor, use_fuel_profile = (
+                scaling_methods[eia_column][col][hourly_subplant_month]
+                for col in ["method", "factor", "use_fuel_profile"]
+            )
+            # we will shape net generation data based on the cems gross gen profile
+            # all other fuel and emissions data will be shaped using the fuel profile
+            cems_values = np.where(
+                use_fuel_profile,
+                partial_cems_data["fuel_consumed_mmbtu"].to_numpy(dtype=float),
+                partial_cems_data["gross_generation_mwh"].to_numpy(dtype=float),
+            )
+            if eia_column in partial_cems_shaped.columns:
+                unshaped_values = partial_cems_shaped[eia_column].to_numpy(dtype=float)
+            else:
+                unshaped_values = np.NaN
+            partial_cems_shaped[eia_column] = np.select(
+                [
+                    has_subplant_month & (method == "zero"),
+                    has_subplant_month & (method == "scale"),
+                    has_subplant_month & (method == "shift"),
+                ],
+                [0, cems_values * factor, cems_values + factor],
+                default=unshaped_values,
+            )
 
         # validate that the scaled totals match
         validation.validate_shaped_totals(
@@ -1577,90 +2196,89 @@ def shape_partial_cems_subplants(cems, eia923_allocated):
     return cems, partial_cems_shaped
 
 
-def set_value_to_zero(
-    partial_cems_shaped,
-    partial_cems_data,
-    report_date,
-    plant_id,
-    subplant_id,
-    eia_column,
-):
-    """Used by `scale_partial_cems_data` to set a shaped value to all zeros."""
-    partial_cems_shaped.loc[
-        (partial_cems_shaped.report_date == report_date)
-        & (partial_cems_shaped.plant_id_eia == plant_id)
-        & (partial_cems_shaped.subplant_id == subplant_id),
-        eia_column,
-    ] = 0
-
-    return partial_cems_shaped
-
-
-def scale_data(
-    partial_cems_shaped,
-    partial_cems_data,
-    report_date,
-    plant_id,
-    subplant_id,
-    eia_column,
-    cems_column,
-    scaling_factor,
-):
-    """Used by `scale_partial_cems_data` to shape data using a scaling factor."""
-    partial_cems_shaped.loc[
-        (partial_cems_shaped.report_date == report_date)
-        & (partial_cems_shaped.plant_id_eia == plant_id)
-        & (partial_cems_shaped.subplant_id == subplant_id),
-        eia_column,
-    ] = (
-        partial_cems_data.loc[
-            (partial_cems_data.report_date == report_date)
-            & (partial_cems_data.plant_id_eia == plant_id)
-            & (partial_cems_data.subplant_id == subplant_id),
-            cems_column,
-        ]
-        * scaling_factor
-    )
-
-    return partial_cems_shaped
+def identify_partial_cems_scaling_methods(eia_data_to_shape, number_of_hours):
+    """Identifies how each column of each partial cems subplant-month should be shaped.
 
+    Used by `shape_partial_cems_subplants`. For each subplant-month, the EIA total for
+    each data column is compared to the CEMS gross generation (for net generation) or
+    fuel consumption total (for all other columns) to decide whether the hourly CEMS
+    data should be set to zero, scaled by a factor, or shifted by an hourly amount.
 
-def shift_data(
-    partial_cems_shaped,
-    partial_cems_data,
-    report_date,
-    plant_id,
-    subplant_id,
-    eia_column,
-    cems_column,
-    shift_factor,
-):
-    """Used by `scale_partial_cems_data` to shape data using a shift factor."""
-    # get a count of the number of hours
-    number_of_hours = len(
-        partial_cems_data.loc[
-            (partial_cems_data.report_date == report_date)
-            & (partial_cems_data.plant_id_eia == plant_id)
-            & (partial_cems_data.subplant_id == subplant_id),
-            cems_column,
-        ]
-    )
-    # divide the scaling factor by the number of hours to get the hourly shift
-    hourly_shift = shift_factor / number_of_hours
-    # add the shift factor to the hourly profile
-    partial_cems_shaped.loc[
-        (partial_cems_shaped.report_date == report_date)
-        & (partial_cems_shaped.plant_id_eia == plant_id)
-        & (partial_cems_shaped.subplant_id == subplant_id),
-        eia_column,
-    ] = (
-        partial_cems_data.loc[
-            (partial_cems_data.report_date == report_date)
-            & (partial_cems_data.plant_id_eia == plant_id)
-            & (partial_cems_data.subplant_id == subplant_id),
-            cems_column,
+    Args:
+        eia_data_to_shape: dataframe with one row per subplant-month, containing the EIA
+            totals for each data column and the `gross_generation_mwh` and
+            `fuel_consumed_mmbtu_cems` totals from CEMS
+        number_of_hours: array with the number of CEMS hours in each subplant-month
+    Returns:
+        dictionary mapping each data column to a dictionary of subplant-month arrays:
+            "method": one of "zero", "scale", or "shift"
+            "factor": the scaling factor, or the shift to add to each hour
+            "use_fuel_profile": whether to shape using the cems fuel profile rather
+                than the cems gross generation profile
+            "cems_total": the cems total that the eia data was compared to
+    """
+    fuel_total = eia_data_to_shape["fuel_consumed_mmbtu_cems"].to_numpy(dtype=float)
+    scaling_methods = {}
+    for eia_column in DATA_COLUMNS:
+        eia_value = eia_data_to_shape[eia_column].to_numpy(dtype=float)
+        if eia_column == "net_generation_mwh":
+            cems_total = eia_data_to_shape["gross_generation_mwh"].to_numpy(dtype=float)
+        else:
+            cems_total = fuel_total
+
+        conditions = [
+            # if both values are zero, do nothing since the profile is already zero
+            (eia_value == 0) & (cems_total == 0),
+            # if the eia data is positive, but the cems data is zero, use the fuel data to shape it
+            (eia_value > 0) & (cems_total == 0) & (fuel_total != 0),
+            # if the eia data is positive but all cems data is zero, assign a flat profile
+            (eia_value > 0) & (cems_total == 0) & (fuel_total == 0),
+            # if the eia value is negative (should only be for net generation), shift data
+            eia_value < 0,
+            # if the eia net generation is zero and cems gross generation is positive, shift the data
+            (eia_column == "net_generation_mwh") & (eia_value == 0) & (cems_total > 0),
+            # if both values are positive, scale the data
+            (eia_value >= 0) & (cems_total > 0),
         ]
-        + hourly_shift
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # divide the shift factor by the number of hours to get the hourly shift
+            hourly_shift = (eia_value - cems_total) / number_of_hours
+            method = np.select(
+                conditions,
+                ["zero", "scale", "shift", "shift", "shift", "scale"],
+                default="uncategorized",
+            )
+            factor = np.select(
+                conditions,
+                [
+                    0,
+                    eia_value / fuel_total,
+                    hourly_shift,
+                    hourly_shift,
+                    hourly_shift,
+                    eia_value / cems_total,
+                ],
+                default=np.NaN,
+            )
+        use_fuel_profile = (eia_column != "net_generation_mwh") | conditions[1]
+
+        scaling_methods[eia_column] = {
+            "method": method,
+            "factor": factor,
+            "use_fuel_profile": use_fuel_profile,
+            "cems_total": cems_total,
+        }
+
+    # report the first uncategorized subplant-month
+    uncategorized = np.column_stack(
+        [scaling_methods[col]["method"] == "uncategorized" for col in DATA_COLUMNS]
     )
+    if uncategorized.any():
+        row_number, column_number = np.argwhere(uncategorized)[0]
+        row = eia_data_to_shape.iloc[row_number]
+        eia_column = DATA_COLUMNS[column_number]
+        raise UserWarning(
+            f"Uncategorized combination of {eia_column} data for plant {row.plant_id_eia} subplant {row.subplant_id} in {row.report_date}:\n   EIA data is {row[eia_column]} and CEMS data is {scaling_methods[eia_column]['cems_total'][row_number]}"
+        )
 
-    return partial_cems_shaped
+    return scaling_methods
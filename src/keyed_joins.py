@@ -0,0 +1,102 @@
+"""Convenience functions for joining small lookup tables onto large (e.g. hourly) data.
+
+`DataFrame.merge` copies every column of both dataframes into a new dataframe, which is
+slow and memory intensive when a monthly lookup table with a few columns is merged onto
+the hourly CEMS data. These functions instead match each row of the large dataframe to
+a row of the lookup table once, using integer codes for the keys, and return arrays
+aligned with the large dataframe that can be added as columns or used directly.
+
+Similarly, `isin_keys()` can be used to filter the large dataframe to the keys in a
+lookup table, instead of merging with `indicator=True` and filtering the merged data.
+"""
+import numpy as np
+import pandas as pd
+
+
+def match_keys(df, lookup, keys):
+    """Finds the row of `lookup` that matches the `keys` of each row of `df`.
+
+    Keys are matched the same way as `df.merge(lookup, how="left", on=keys)`, including
+    matching missing key values to missing key values. Each combination of keys must be
+    unique in `lookup` (i.e. `validate="m:1"`).
+
+    Args:
+        df: dataframe containing `keys`
+        lookup: dataframe with one row for each combination of `keys`
+        keys: list of column names to match on
+    Returns:
+        array of the position in `lookup` of the row matching each row of `df`, or -1
+        if there is no matching row
+    """
+    if len(lookup) == 0:
+        return np.full(len(df), -1, dtype="int64")
+    lookup_codes = np.zeros(len(lookup), dtype="int64")
+    df_codes = np.zeros(len(df), dtype="int64")
+    for key in keys:
+        key_lookup_codes, lookup_values = pd.factorize(
+            lookup[key], use_na_sentinel=False
+        )
+        key_df_codes, df_values = pd.factorize(df[key], use_na_sentinel=False)
+        # find the lookup code of each unique value in df
+        value_codes = lookup_values.get_indexer(df_values)
+        if lookup_values.hasnans:
+            value_codes[df_values.isna()] = np.flatnonzero(lookup_values.isna())[0]
+        key_df_codes = value_codes[key_df_codes]
+
+        # combine the codes of each key, re-encoding the combined codes so that they
+        # stay smaller than the number of rows in the lookup table
+        lookup_codes, unique_codes = pd.factorize(
+            lookup_codes * len(lookup_values) + key_lookup_codes
+        )
+        df_codes = np.where(
+            (df_codes >= 0) & (key_df_codes >= 0),
+            df_codes * len(lookup_values) + key_df_codes,
+            -1,
+        )
+        df_codes = pd.Index(unique_codes).get_indexer(df_codes)
+
+    if len(unique_codes) < len(lookup):
+        raise UserWarning(f"The lookup table contains duplicate values of {keys}")
+    lookup_rows = np.empty(len(lookup), dtype="int64")
+    lookup_rows[lookup_codes] = np.arange(len(lookup))
+    return np.where(df_codes >= 0, lookup_rows[df_codes], -1)
+
+
+def take_lookup_columns(lookup, positions, columns):
+    """Returns a dictionary of {column: array} with the values of each of `columns` in
+    `lookup` at `positions` (the output of `match_keys()`).
+
+    Positions of -1 get a missing value, and integer columns are converted to float if
+    there are any missing values, as they would be by a left merge.
+    """
+    columns_data = {}
+    for column in columns:
+        values = lookup[column].array
+        if isinstance(values, pd.arrays.PandasArray):
+            values = values.to_numpy()
+        columns_data[column] = pd.api.extensions.take(
+            values, positions, allow_fill=True
+        )
+    return columns_data
+
+
+def isin_keys(df, lookup, keys):
+    """Returns a boolean array of whether the `keys` of each row of `df` appear in `lookup`.
+
+    This is equivalent to checking whether `_merge == "both"` in
+    `df.merge(lookup[keys].drop_duplicates(), how="left", on=keys, indicator=True)`,
+    but does not create a merged copy of `df`. Missing key values match missing key
+    values, and `lookup` may contain duplicate keys.
+    """
+    return match_keys(df, lookup[keys].drop_duplicates(), keys) >= 0
+
+
+def broadcast_join(df, lookup, keys, columns):
+    """Returns the values of `columns` in `lookup` for each row of `df`, matched on `keys`.
+
+    This is equivalent to
+    `df.merge(lookup[keys + columns], how="left", on=keys, validate="m:1")[columns]`,
+    but returns a dictionary of {column: array} aligned with the rows of `df`, which can
+    be added to `df` as columns without copying the rest of `df`.
+    """
+    return take_lookup_columns(lookup, match_keys(df, lookup, keys), columns)
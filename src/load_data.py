@@ -1,6 +1,10 @@
+import functools
 import pandas as pd
 import numpy as np
 import os
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import sqlalchemy as sa
 import warnings
 from pathlib import Path
@@ -26,11 +30,12 @@ def correct_epa_eia_plant_id_mapping(df):
     return df
 
 
-def load_cems_data(year):
+def load_cems_data(year, plant_ids=None):
     """
     Loads CEMS data for the specified year from the PUDL database
     Inputs:
         year: the year for which data should be retrieved (YYYY)
+        plant_ids: optional list of plant_id_eia to load. If None, all plants are loaded.
     Returns:
         cems: pandas dataframe with hourly CEMS data
     """
@@ -55,9 +60,18 @@ def load_cems_data(year):
         "heat_content_mmbtu",
     ]
 
+    # only load row groups containing the requested plants
+    filters = None
+    if plant_ids is not None:
+        plant_ids = {int(plant_id) for plant_id in plant_ids}
+        # plant_id_eia 55248 is changed to 2847 by correct_epa_eia_plant_id_mapping
+        if 2847 in plant_ids:
+            plant_ids.add(55248)
+        filters = [("plant_id_eia", "in", sorted(plant_ids))]
+
     # load the CEMS data
     cems = pd.concat(
-        pd.read_parquet((cems_path + filename), columns=cems_columns)
+        pd.read_parquet((cems_path + filename), columns=cems_columns, filters=filters)
         for filename in os.listdir(cems_path)
         if str(year) in filename
     )
@@ -118,6 +132,86 @@ def load_cems_data(year):
     return cems
 
 
+def load_intermediate_data(file_name, path_prefix, year, columns=None, filters=None):
+    """
+    Loads intermediate data exported by `output_data.output_intermediate_data()`.
+    The data is read from either the csv or parquet file, whichever was written most
+    recently.
+    Inputs:
+        file_name: name of the intermediate file, without the year or extension
+        path_prefix: folder in data/outputs containing the file
+        year: the year of the data
+        columns: optional list of columns to load
+        filters: optional list of (column, operator, value) filters used to select rows,
+            in the format of `pyarrow.parquet.read_table`, e.g. [("plant_id_eia", "==", 3)].
+            When reading parquet files, row groups that do not match are not loaded.
+    Returns:
+        pandas dataframe with the dtypes from `column_checks.get_dtypes()`
+    """
+    csv_path = outputs_folder(f"{path_prefix}{file_name}_{year}.csv")
+    parquet_path = outputs_folder(f"{path_prefix}{file_name}_{year}.parquet")
+    if os.path.exists(parquet_path) and (
+        not os.path.exists(csv_path)
+        or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+    ):
+        df = pq.read_table(parquet_path, columns=columns, filters=filters).to_pandas()
+        df = convert_string_columns_to_object(df)
+    else:
+        file_columns = pd.read_csv(csv_path, nrows=0).columns
+        df = pd.read_csv(
+            csv_path,
+            usecols=columns,
+            dtype=get_dtypes(),
+            parse_dates=[
+                col
+                for col in ["datetime_utc", "report_date"]
+                if (col in file_columns) and (columns is None or col in columns)
+            ],
+        )
+        if filters is not None:
+            df = (
+                pa.Table.from_pandas(df, preserve_index=False)
+                .filter(pq.filters_to_expression(filters))
+                .to_pandas()
+            )
+        if columns is not None:
+            df = df[columns]
+    return df
+
+
+def load_partitioned_data(dataset, columns=None, filters=None):
+    """
+    Loads data written as a folder of parquet partitions, such as the cleaned CEMS data
+    written by `data_cleaning.clean_cems_partitioned()`.
+    Inputs:
+        dataset: a `pyarrow.dataset.Dataset` or the path to the folder of partitions
+        columns: optional list of columns to load
+        filters: optional list of (column, operator, value) filters used to select rows,
+            in the same format as `load_intermediate_data()`
+    Returns:
+        pandas dataframe with the dtypes the columns were written with. Note that
+        float16 columns are written to parquet as float32.
+    """
+    if not isinstance(dataset, ds.Dataset):
+        dataset = ds.dataset(dataset, format="parquet")
+    df = dataset.to_table(
+        columns=columns,
+        filter=pq.filters_to_expression(filters) if filters is not None else None,
+    ).to_pandas()
+    return convert_string_columns_to_object(df)
+
+
+def convert_string_columns_to_object(df):
+    """
+    String columns are stored in parquet files with the string dtype, but are loaded as
+    objects (with missing values as NaN) to match the data loaded from csv files.
+    """
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.StringDtype):
+            df[col] = df[col].astype(object).where(df[col].notna(), np.NaN)
+    return df
+
+
 def load_cems_ids(start_year, end_year):
     """Loads CEMS ids for multiple years."""
     cems_all = []
@@ -679,9 +773,11 @@ def load_diba_data(year):
     return dibas
 
 
+@functools.lru_cache(maxsize=None)
 def ba_timezone(ba, type):
     """
     Retrieves the timezone for a single balancing area.
+    Results are cached so that the reference table is only read once per BA.
     Args:
         ba: string containing the ba_code
         type: either 'reporting_eia930' or 'local'. Reporting will return the TZ used by the BA when reporting to EIA-930, local will return the actual local tz
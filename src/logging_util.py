@@ -1,7 +1,13 @@
 """Configure logging for the OGE codebase."""
 import logging
+import os
 import coloredlogs
 
+try:
+    import resource
+except ImportError:  # resource is not available on Windows
+    resource = None
+
 from filepaths import make_containing_folder
 
 
@@ -49,3 +55,30 @@ def configure_root_logger(logfile: str | None = None, level: str = "INFO"):
 
         if file_logger not in root_logger.handlers:
             root_logger.addHandler(file_logger)
+
+
+def log_memory_usage(logger: logging.Logger, description: str, **dataframes):
+    """Log the memory used by the process and by each of the keyword `dataframes`.
+
+    The current memory usage of the process is only available on Linux, and the peak
+    memory usage on Linux and macOS. For example:
+    ```
+    log_memory_usage(logger, "after cleaning CEMS", cems=cems)
+    ```
+    """
+    messages = []
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        rss_bytes = resident_pages * os.sysconf("SC_PAGE_SIZE")
+        messages.append(f"rss={rss_bytes / 1e9:.2f}GB")
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_bytes = peak if os.uname().sysname == "Darwin" else peak * 1024
+        messages.append(f"peak_rss={peak_bytes / 1e9:.2f}GB")
+    for name, df in dataframes.items():
+        if df is not None:
+            df_bytes = df.memory_usage(deep=True, index=True).sum()
+            messages.append(f"{name}={df_bytes / 1e9:.2f}GB ({len(df):,} rows)")
+    logger.info(f"Memory usage {description}: {', '.join(messages)}")
@@ -1,8 +1,20 @@
+import functools
+import hashlib
+import json
 import math
 import pandas as pd
 import numpy as np
 import shutil
+import sqlite3
 import os
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import load_data
 import column_checks
 import validation
@@ -11,6 +23,14 @@ from logging_util import get_logger
 
 logger = get_logger(__name__)
 
+# formats that intermediate outputs can be written in
+INTERMEDIATE_FORMATS = ["csv", "parquet"]
+
+# number of rows in each row group of intermediate parquet files. Since the data is
+# sorted by plant and month, this allows readers to skip row groups using filters on
+# plant_id_eia and report_date
+INTERMEDIATE_ROW_GROUP_SIZE = 2**17
+
 
 GENERATED_EMISSION_RATE_COLS = [
     "generated_co2_rate_lb_per_mwh_for_electricity",
@@ -46,24 +66,56 @@ UNIT_CONVERSIONS = {"lb": ("kg", 0.453592), "mmbtu": ("GJ", 1.055056)}
 
 TIME_RESOLUTIONS = {"hourly": "H", "monthly": "M", "annual": "A"}
 
+# folder in the results for each year that contains the partitioned parquet dataset
+RESULTS_DATASET_FOLDER = "results_dataset"
+RESULTS_DATASET_PARTITIONS = ["year", "data_type", "resolution", "ba_code"]
+
+# the column identifying each row of the tables in the results database, which is
+# indexed along with the datetime_utc column in hourly tables
+RESULTS_DATABASE_KEYS = {
+    "power_sector_data": "ba_code",
+    "carbon_accounting": "ba_code",
+    "plant_data": "plant_id_eia",
+}
+
+# formats of the archives of the results and data prepared for upload. See
+# `write_archive()`
+ARCHIVE_FORMATS = ["zip", "tar.zst"]
+
+# libraries that can be used to write the csv results. See `write_csv()`
+CSV_WRITERS = ["pandas", "pyarrow"]
+
+# compressions that the csv results can be written with, and the extension appended to
+# the name of each compressed csv file. See `write_csv()`
+CSV_COMPRESSIONS = {"gzip": ".gz", "zstd": ".zst"}
 
-def prepare_files_for_upload(years):
+# the number of decimals that each numeric column of each type of results is rounded
+# to, keyed by (path_prefix, subfolder, unit). See `get_rounding_plan()`
+ROUNDING_PLANS = {}
+
+# maximum number of rows of a sample used to calculate the decimals of a rounding plan
+ROUNDING_SAMPLE_SIZE = 100000
+
+
+def prepare_files_for_upload(years, archive_format="zip", max_workers=None):
     """
     Zips files in preparation for upload to cloud storage and Zenodo.
 
     This should only be run when releasing a new minor or major version of the repo.
+    See `write_archives()` for `archive_format` and `max_workers`.
     """
 
     for year in years:
-        zip_results_for_s3(year)
-        zip_data_for_zenodo(year)
+        zip_results_for_s3(year, archive_format, max_workers)
+        zip_data_for_zenodo(year, archive_format, max_workers)
 
 
-def zip_results_for_s3(year):
+def zip_results_for_s3(year, archive_format="zip", max_workers=None):
     """
     Zips results directories that contain more than a single file for hosting on an Amazon S3 bucket.
     """
     os.makedirs(data_folder("s3_upload"), exist_ok=True)
+    archives = []
     for data_type in ["power_sector_data", "carbon_accounting", "plant_data"]:
         for aggregation in ["hourly", "monthly", "annual"]:
             for unit in ["metric_units", "us_units"]:
@@ -75,17 +127,14 @@ def zip_results_for_s3(year):
                     # skip the metric hourly plant data since we do not create those outputs
                     pass
                 else:
-                    logger.info(
-                        f"zipping {year}_{data_type}_{aggregation}_{unit} for s3"
-                    )
                     folder = (
                         f"{results_folder()}/{year}/{data_type}/{aggregation}/{unit}"
                     )
-                    shutil.make_archive(
-                        f"{data_folder()}/s3_upload/{year}_{data_type}_{aggregation}_{unit}",
-                        "zip",
-                        root_dir=folder,
-                        # base_dir="",
+                    archives.append(
+                        (
+                            f"{data_folder()}/s3_upload/{year}_{data_type}_{aggregation}_{unit}",
+                            folder,
+                        )
                     )
     # move and rename the plant attributes files
     shutil.copy(
@@ -93,47 +142,276 @@ def zip_results_for_s3(year):
         f"{data_folder()}/s3_upload/plant_static_attributes_{year}.csv",
     )
     # archive the data quality metrics
-    shutil.make_archive(
-        f"{data_folder()}/s3_upload/{year}_data_quality_metrics",
-        "zip",
-        root_dir=f"{results_folder()}/{year}/data_quality_metrics",
-        # base_dir="",
+    archives.append(
+        (
+            f"{data_folder()}/s3_upload/{year}_data_quality_metrics",
+            f"{results_folder()}/{year}/data_quality_metrics",
+        )
     )
+    write_archives(archives, archive_format, max_workers)
 
 
-def zip_data_for_zenodo(year):
+def zip_data_for_zenodo(year, archive_format="zip", max_workers=None):
     """
     Zips each of the four data directories for archiving on Zenodo.
     """
     os.makedirs(data_folder("zenodo"), exist_ok=True)
-    for directory in ["outputs", "results"]:
-        logger.info(f"zipping {directory}_{year} for zenodo")
-        shutil.make_archive(
-            data_folder(f"zenodo/{directory}_{year}"),
-            "zip",
-            root_dir=data_folder(f"{directory}/{year}"),
-            # base_dir="",
+    archives = [
+        (data_folder(f"zenodo/{directory}_{year}"), data_folder(f"{directory}/{year}"))
+        for directory in ["outputs", "results"]
+    ]
+    write_archives(archives, archive_format, max_workers)
+
+
+def write_archives(archives, archive_format="zip", max_workers=None):
+    """
+    Writes each of `archives`, a list of (base_name, root_dir) tuples, using
+    `write_archive()`.
+
+    Archives are independent, so they are compressed concurrently in a process pool
+    with up to `max_workers` processes (by default one per CPU).
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count()
+    for base_name, _ in archives:
+        logger.info(f"archiving {os.path.basename(base_name)} as {archive_format}")
+    if max_workers <= 1:
+        for base_name, root_dir in archives:
+            write_archive(base_name, root_dir, archive_format)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(write_archive, base_name, root_dir, archive_format)
+            for base_name, root_dir in archives
+        ]
+        for future in futures:
+            # raise any errors from the worker
+            future.result()
+
+
+def write_archive(base_name, root_dir, archive_format="zip"):
+    """
+    Archives all of the files in `root_dir` to `base_name` plus the archive extension,
+    and writes a checksum manifest for the archive. Returns the path of the archive.
+
+    Files are streamed into the archive one at a time. `archive_format` is one of
+    `ARCHIVE_FORMATS`: "zip" (deflate) is used for public releases, while "tar.zst" is
+    much faster to compress and decompress, e.g. for internal mirrors.
+
+    The manifest is written to "{archive}.manifest.json" and contains the sha256
+    checksum of the archive and the path, size, and sha256 checksum of each file in it.
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise UserWarning(
+            f"archive_format must be one of {ARCHIVE_FORMATS}, not {archive_format}"
         )
+    archive_path = f"{base_name}.{archive_format}"
+    # list the files in a consistent order so that archives are reproducible
+    file_names = []
+    for directory, subdirectories, files in os.walk(root_dir):
+        subdirectories.sort()
+        for file in sorted(files):
+            file_names.append(
+                os.path.relpath(os.path.join(directory, file), root_dir).replace(
+                    os.sep, "/"
+                )
+            )
 
+    if archive_format == "zip":
+        with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for file_name in file_names:
+                archive.write(os.path.join(root_dir, file_name), file_name)
+    elif archive_format == "tar.zst":
+        with pa.CompressedOutputStream(archive_path, "zstd") as stream:
+            with tarfile.open(fileobj=stream, mode="w|") as archive:
+                for file_name in file_names:
+                    archive.add(
+                        os.path.join(root_dir, file_name), file_name, recursive=False
+                    )
+
+    manifest = {
+        "archive": os.path.basename(archive_path),
+        "sha256": get_sha256(archive_path),
+        "files": [
+            {
+                "path": file_name,
+                "size": os.path.getsize(os.path.join(root_dir, file_name)),
+                "sha256": get_sha256(os.path.join(root_dir, file_name)),
+            }
+            for file_name in file_names
+        ],
+    }
+    with open(f"{archive_path}.manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return archive_path
+
+
+def get_sha256(path):
+    """Returns the hex sha256 checksum of the file at `path`, read in 1 MiB chunks."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def output_intermediate_data(
+    df, file_name, path_prefix, year, skip_outputs, file_format="csv"
+):
+    """Exports intermediate data to data/outputs as either a csv or parquet file.
 
-def output_intermediate_data(df, file_name, path_prefix, year, skip_outputs):
+    Intermediate files can be read in either format using
+    `load_data.load_intermediate_data()`.
+    """
     column_checks.check_columns(df, file_name)
     if not skip_outputs:
         logger.info(f"Exporting {file_name} to data/outputs")
-        df.to_csv(outputs_folder(f"{path_prefix}{file_name}_{year}.csv"), index=False)
+        if file_format == "csv":
+            df.to_csv(
+                outputs_folder(f"{path_prefix}{file_name}_{year}.csv"), index=False
+            )
+        elif file_format == "parquet":
+            write_intermediate_parquet(
+                df, outputs_folder(f"{path_prefix}{file_name}_{year}.parquet")
+            )
+        else:
+            raise UserWarning(
+                f"file_format for intermediate data must be one of {INTERMEDIATE_FORMATS}, not {file_format}"
+            )
+
+
+def output_intermediate_data_partitioned(
+    partitions, file_name, path_prefix, year, skip_outputs, file_format="csv"
+):
+    """Exports intermediate data that is split into `partitions`, one at a time.
+
+    `partitions` is an iterable of dataframes with the same columns, e.g. the cleaned
+    CEMS data for each group of plants. Each partition is appended to the same file as
+    `output_intermediate_data()` would write, and is then yielded so that it can be
+    processed further without holding all of the partitions in memory.
+    """
+    path = outputs_folder(f"{path_prefix}{file_name}_{year}.{file_format}")
+    if file_format not in INTERMEDIATE_FORMATS:
+        raise UserWarning(
+            f"file_format for intermediate data must be one of {INTERMEDIATE_FORMATS}, not {file_format}"
+        )
+    if not skip_outputs:
+        logger.info(f"Exporting {file_name} to data/outputs")
+    parquet_writer = None
+    try:
+        for partition_number, df in enumerate(partitions):
+            column_checks.check_columns(df, file_name)
+            if skip_outputs:
+                pass
+            elif file_format == "csv":
+                df.to_csv(
+                    path,
+                    index=False,
+                    mode="w" if partition_number == 0 else "a",
+                    header=partition_number == 0,
+                )
+            else:
+                table = convert_to_intermediate_table(df)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(
+                        path, table.schema, compression="zstd"
+                    )
+                # categorical columns may have different categories in each partition
+                parquet_writer.write_table(
+                    table.cast(parquet_writer.schema),
+                    row_group_size=INTERMEDIATE_ROW_GROUP_SIZE,
+                )
+            yield df
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+
+def write_intermediate_parquet(df, path):
+    """Writes intermediate data to a zstd-compressed parquet file.
+
+    The data is converted with `convert_to_intermediate_table()` and split into row
+    groups of `INTERMEDIATE_ROW_GROUP_SIZE` rows.
+    """
+    pq.write_table(
+        convert_to_intermediate_table(df),
+        path,
+        compression="zstd",
+        row_group_size=INTERMEDIATE_ROW_GROUP_SIZE,
+    )
+
+
+def convert_to_intermediate_table(df):
+    """Converts intermediate data to a pyarrow table to be written to parquet.
+
+    The dtypes in `column_checks.get_dtypes()` are applied before writing so that the
+    schema of each file is consistent. The data is sorted by plant and month.
+    """
+    dtypes = column_checks.get_dtypes()
+    schema_dtypes = {}
+    for col in df.columns:
+        if col not in dtypes:
+            continue
+        if dtypes[col] == "str":
+            # use the string dtype so that missing values are not converted to "nan"
+            schema_dtypes[col] = "string"
+        elif dtypes[col] == "float16":
+            # parquet does not support half precision floats
+            schema_dtypes[col] = "float32"
+        else:
+            schema_dtypes[col] = dtypes[col]
+    df = df.astype(schema_dtypes)
+
+    sort_columns = [col for col in ["plant_id_eia", "report_date"] if col in df.columns]
+    if len(sort_columns) > 0:
+        df = df.sort_values(sort_columns, kind="stable")
+
+    return pa.Table.from_pandas(df, preserve_index=False)
 
 
 def output_to_results(
-    df, file_name, subfolder, path_prefix, skip_outputs, include_metric=True
+    df,
+    file_name,
+    subfolder,
+    path_prefix,
+    skip_outputs,
+    include_metric=True,
+    csv_writer="pandas",
+    rounding_plans=None,
+    csv_compression=None,
+    results_dataset=False,
 ):
+    """
+    Rounds `df` and exports it to `subfolder` of the results in US units and (if
+    `include_metric`) metric units.
+
+    The csv files are compressed with `csv_compression` (see `write_csv()`), and the
+    extension of the compression is appended to their names. If `results_dataset`, the
+    results are also written to the results dataset (see `write_to_results_dataset()`).
+
+    `rounding_plans` is an optional dictionary of {unit: {column: decimals}} (see
+    `plan_rounding()`) used instead of the plans for `subfolder` in `ROUNDING_PLANS`,
+    which are not shared with worker processes.
+    """
     # Always check columns that should not be negative.
     small = "small" in path_prefix
     logger.info(f"Exporting {file_name} to data/results/{path_prefix}{subfolder}")
 
+    # round every table exported to the same subfolder with the same decimals
+    if rounding_plans is None:
+        rounding_plans = {}
     if include_metric:
         metric = convert_results(df)
-        metric = round_table(metric)
-    df = round_table(df)
+        metric_plan = rounding_plans.get("metric_units")
+        if metric_plan is None:
+            metric_plan = get_rounding_plan(
+                metric, path_prefix, subfolder, "metric_units"
+            )
+        metric = round_table(metric, metric_plan, inplace=True)
+    us_plan = rounding_plans.get("us_units")
+    if us_plan is None:
+        us_plan = get_rounding_plan(df, path_prefix, subfolder, "us_units")
+    df = round_table(df, us_plan)
 
     # Check for negatives after rounding
     validation.test_for_negative_values(df, small)
@@ -142,15 +420,396 @@ def output_to_results(
 
     if not skip_outputs:
 
-        df.to_csv(
-            results_folder(f"{path_prefix}{subfolder}us_units/{file_name}.csv"),
-            index=False,
+        csv_file = csv_file_name(file_name, csv_compression)
+        write_csv(
+            df,
+            results_folder(f"{path_prefix}{subfolder}us_units/{csv_file}"),
+            csv_writer,
+            csv_compression,
         )
+        if results_dataset:
+            write_to_results_dataset(df, file_name, subfolder, path_prefix, "us_units")
         if include_metric:
-            metric.to_csv(
-                results_folder(f"{path_prefix}{subfolder}metric_units/{file_name}.csv"),
-                index=False,
+            write_csv(
+                metric,
+                results_folder(f"{path_prefix}{subfolder}metric_units/{csv_file}"),
+                csv_writer,
+                csv_compression,
+            )
+            if results_dataset:
+                write_to_results_dataset(
+                    metric, file_name, subfolder, path_prefix, "metric_units"
+                )
+
+
+def write_csv(df, path, csv_writer="pandas", compression=None):
+    """
+    Writes `df` to a csv file at `path` without the index, using `csv_writer`.
+
+    "pandas" uses `DataFrame.to_csv`. "pyarrow" uses the pyarrow csv writer, which is
+    much faster for large tables such as the hourly results. It writes the same header
+    and columns as `to_csv` and formats datetimes and booleans the same way, but floats
+    are written in their shortest representation (e.g. `100` instead of `100.0`), and
+    if any string needs to be quoted, all strings are quoted.
+
+    `compression` can be None or one of `CSV_COMPRESSIONS`. Compressed files are
+    written through a pyarrow stream, so zstd does not require the zstandard package.
+    """
+    if compression is not None and compression not in CSV_COMPRESSIONS:
+        raise UserWarning(
+            f"compression must be None or one of {list(CSV_COMPRESSIONS)}, not {compression}"
+        )
+    if csv_writer == "pandas":
+        if compression is None:
+            df.to_csv(path, index=False)
+        else:
+            with pa.output_stream(path, compression=compression) as sink:
+                df.to_csv(sink, index=False)
+    elif csv_writer == "pyarrow":
+        table = pa.table(
+            {
+                column: format_column_for_csv(df.iloc[:, i])
+                for i, column in enumerate(df.columns)
+            }
+        )
+        if compression is None:
+            sink = pa.OSFile(path, "wb")
+        else:
+            sink = pa.CompressedOutputStream(path, compression)
+        # pyarrow quotes every string, so only quote strings if some need to be quoted
+        needs_quotes = any(
+            pc.any(pc.match_substring_regex(table[column], '[,"\r\n]')).as_py()
+            for column in table.column_names
+            if pa.types.is_string(table.schema.field(column).type)
+        )
+        with sink:
+            # write the header with pandas so that it is identical to `to_csv`
+            sink.write(df.iloc[:0].to_csv(index=False).encode())
+            pa_csv.write_csv(
+                table,
+                sink,
+                pa_csv.WriteOptions(
+                    include_header=False,
+                    quoting_style="needed" if needs_quotes else "none",
+                ),
+            )
+    else:
+        raise UserWarning(f"csv_writer must be one of {CSV_WRITERS}, not {csv_writer}")
+
+
+def csv_file_name(file_name, compression=None):
+    """Returns the name of the csv file of `file_name` written with `compression`."""
+    if compression is None:
+        return f"{file_name}.csv"
+    return f"{file_name}.csv{CSV_COMPRESSIONS[compression]}"
+
+
+def parse_csv_file_name(file):
+    """
+    Returns the (file_name, compression) of a csv file named by `csv_file_name()`, or
+    None if `file` is not a csv file.
+    """
+    if file.endswith(".csv"):
+        return file[: -len(".csv")], None
+    for compression, extension in CSV_COMPRESSIONS.items():
+        if file.endswith(f".csv{extension}"):
+            return file[: -len(f".csv{extension}")], compression
+    return None
+
+
+def read_csv(path, **kwargs):
+    """
+    Reads a csv file written by `write_csv()`, decompressing it based on the extension
+    of `path`. `kwargs` are passed to `pd.read_csv`.
+    """
+    with pa.input_stream(path) as source:
+        return pd.read_csv(source, **kwargs)
+
+
+def format_column_for_csv(series):
+    """
+    Returns a pyarrow array of `series` for the pyarrow csv writer, with datetimes and
+    booleans formatted as strings in the same format as `DataFrame.to_csv`.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return format_datetimes_for_csv(series)
+    if pd.api.types.is_bool_dtype(series):
+        return pc.if_else(pa.array(series, from_pandas=True), "True", "False")
+    return pa.array(series, from_pandas=True)
+
+
+def format_datetimes_for_csv(series):
+    """
+    Formats a datetime series as a pyarrow array of strings in the same format as
+    `DataFrame.to_csv`: "%Y-%m-%d %H:%M:%S" followed by the UTC offset (e.g. "+00:00")
+    for timezone-aware datetimes, or "%Y-%m-%d" if all of the datetimes are dates.
+    """
+    local = series.dt.tz_localize(None) if series.dt.tz is not None else series
+    local_values = local.to_numpy(dtype="datetime64[ns]")
+    if (local_values.astype("datetime64[s]") != local_values).any():
+        # fall back to pandas for datetimes with fractional seconds
+        return pa.array(
+            series.astype(str).where(series.notna()), type=pa.string(), from_pandas=True
+        )
+    if series.dt.tz is None and ((local == local.dt.normalize()) | local.isna()).all():
+        datetime_format = "%Y-%m-%d"
+    else:
+        datetime_format = "%Y-%m-%d %H:%M:%S"
+    formatted = pc.strftime(
+        pa.array(local_values, type=pa.timestamp("s"), from_pandas=True),
+        format=datetime_format,
+    )
+    if series.dt.tz is None:
+        return formatted
+    # format each distinct UTC offset once
+    offsets = (local - series.dt.tz_convert(None)).dt.total_seconds()
+    codes, unique_offsets = pd.factorize(offsets)
+    offset_strings = [
+        f"{'-' if offset < 0 else '+'}{int(abs(offset)) // 3600:02}:{int(abs(offset)) % 3600 // 60:02}"
+        for offset in unique_offsets
+    ]
+    offset_array = pa.DictionaryArray.from_arrays(
+        pa.array(codes, mask=codes < 0), pa.array(offset_strings, type=pa.string())
+    ).cast(pa.string())
+    return pc.binary_join_element_wise(formatted, offset_array, "")
+
+
+def write_to_results_dataset(df, file_name, subfolder, path_prefix, unit):
+    """
+    Writes a results file to the partitioned parquet dataset of results.
+
+    The dataset contains the same data as the csv results, with a separate dataset for
+    each unit system in data/results/{path_prefix}results_dataset/{unit}/. Each file is
+    partitioned by year/data_type/resolution/ba_code, so that queries can skip the
+    partitions and columns they do not need. Files that are not split by BA (e.g. the
+    plant_data files) use their file name as the ba_code.
+    """
+    data_type, resolution = subfolder.strip("/").split("/")
+    year = path_prefix.strip("/").split("/")[-1]
+    partition_folder = results_folder(
+        f"{path_prefix}{RESULTS_DATASET_FOLDER}/{unit}/year={year}/data_type={data_type}/resolution={resolution}/ba_code={file_name}"
+    )
+    os.makedirs(partition_folder, exist_ok=True)
+    pq.write_table(
+        pa.Table.from_pandas(
+            convert_to_results_dataset_schema(df), preserve_index=False
+        ),
+        os.path.join(partition_folder, "part-0.parquet"),
+        compression="zstd",
+    )
+
+
+def convert_to_results_dataset_schema(df):
+    """
+    Converts the columns of a results table to consistent types, so that every partition
+    of the results dataset has the same schema.
+
+    Local datetimes are stored as strings in the same format as the csv files, since
+    each BA has a different timezone. Numeric columns use the dtypes in
+    `column_checks.get_dtypes()`, or otherwise nullable 64-bit integers or float64.
+    """
+    dtypes = column_checks.get_dtypes()
+    df = df.copy()
+    for col in df.columns:
+        if col == "datetime_local":
+            df[col] = df[col].astype(str).where(df[col].notna()).astype("string")
+        elif pd.api.types.is_datetime64_any_dtype(
+            df[col]
+        ) or pd.api.types.is_bool_dtype(df[col]):
+            continue
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            if col in dtypes and dtypes[col] not in ["str", "category", "float16"]:
+                df[col] = df[col].astype(dtypes[col])
+            elif pd.api.types.is_integer_dtype(df[col]):
+                df[col] = df[col].astype("Int64")
+            else:
+                df[col] = df[col].astype("float64")
+        else:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def write_results_dataset_manifest(path_prefix, skip_outputs):
+    """
+    Writes a manifest of the partitioned parquet dataset of results.
+
+    The manifest lists the partitioning, the schema of each unit/data_type/resolution,
+    and the path and number of rows of each file in the dataset. A warning is logged if
+    files of the same unit/data_type/resolution have different schemas.
+    """
+    if skip_outputs:
+        return
+    dataset_folder = results_folder(f"{path_prefix}{RESULTS_DATASET_FOLDER}")
+    manifest = {
+        "partitioning": RESULTS_DATASET_PARTITIONS,
+        "schemas": {},
+        "files": [],
+    }
+    schemas = {}
+    for root, _, files in sorted(os.walk(dataset_folder)):
+        for file in sorted(files):
+            if not file.endswith(".parquet"):
+                continue
+            path = os.path.join(root, file)
+            relative_path = os.path.relpath(path, dataset_folder)
+            unit = relative_path.split(os.sep)[0]
+            partitions = dict(
+                folder.split("=", 1) for folder in relative_path.split(os.sep)[1:-1]
             )
+            metadata = pq.read_metadata(path)
+            schema = metadata.schema.to_arrow_schema().remove_metadata()
+            table_name = f"{unit}/{partitions['data_type']}/{partitions['resolution']}"
+            if table_name not in schemas:
+                schemas[table_name] = schema
+                manifest["schemas"][table_name] = {
+                    field.name: str(field.type) for field in schema
+                }
+            elif not schema.equals(schemas[table_name]):
+                logger.warning(
+                    f"{relative_path} does not have the same schema as the rest of {table_name} in the results dataset"
+                )
+            manifest["files"].append(
+                {
+                    "path": relative_path,
+                    "unit": unit,
+                    **partitions,
+                    "num_rows": metadata.num_rows,
+                }
+            )
+    with open(os.path.join(dataset_folder, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def write_results_database(path_prefix, skip_outputs):
+    """
+    Loads the power sector, carbon accounting, and plant results into a SQLite database.
+
+    The database is written to data/results/{path_prefix}results_{year}.sqlite from the
+    US-unit results dataset, with a table for each data type and resolution (e.g.
+    `power_sector_data_hourly`) and a `plant_static_attributes` table. Hourly tables are
+    indexed on (ba_code, datetime_utc) or (plant_id_eia, datetime_utc), other tables on
+    ba_code or plant_id_eia. Datetimes are stored as UTC text, so they can be compared
+    as strings. The `plant_data_monthly_by_ba` and `plant_data_annual_by_ba` views add
+    the ba_code and fuel_category of each plant to the monthly and annual plant data,
+    and a `{table}_metric` view converts each table to metric units.
+    """
+    if skip_outputs:
+        return
+    year = path_prefix.strip("/").split("/")[-1]
+    database_path = results_folder(f"{path_prefix}results_{year}.sqlite")
+    logger.info(f"Writing results database to {database_path}")
+    if os.path.exists(database_path):
+        os.remove(database_path)
+    dataset_folder = results_folder(
+        f"{path_prefix}{RESULTS_DATASET_FOLDER}/us_units/year={year}"
+    )
+
+    connection = sqlite3.connect(database_path)
+    try:
+        # the database is rebuilt from scratch if anything fails, so skip journaling
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        for data_type, key in RESULTS_DATABASE_KEYS.items():
+            for resolution in TIME_RESOLUTIONS:
+                folder = (
+                    f"{dataset_folder}/data_type={data_type}/resolution={resolution}"
+                )
+                if not os.path.exists(folder):
+                    continue
+                table_name = f"{data_type}_{resolution}"
+                dataset = ds.dataset(folder, format="parquet", partitioning="hive")
+                columns = list(dataset.schema.names)
+                if key != "ba_code":
+                    # plant files are not always split by BA, so the ba_code partition
+                    # is not loaded. Use the plant attributes to get the BA of a plant
+                    columns.remove("ba_code")
+                for batch in dataset.to_batches(columns=columns):
+                    df = batch.to_pandas()
+                    sql_types = get_results_database_types(df)
+                    convert_to_results_database_types(df).to_sql(
+                        table_name,
+                        connection,
+                        if_exists="append",
+                        index=False,
+                        dtype=sql_types,
+                    )
+                index_columns = [key]
+                if "datetime_utc" in columns:
+                    index_columns.append("datetime_utc")
+                connection.execute(
+                    f"CREATE INDEX {table_name}_index ON {table_name} ({', '.join(index_columns)})"
+                )
+                # create a view of the table in metric units
+                conversions = get_metric_conversions(tuple(columns))
+                metric_columns = [
+                    f"{col} * {conversions[col][1]} AS {conversions[col][0]}"
+                    if col in conversions
+                    else col
+                    for col in columns
+                ]
+                connection.execute(
+                    f"CREATE VIEW {table_name}_metric AS SELECT {', '.join(metric_columns)} FROM {table_name}"
+                )
+
+        plant_attributes = pd.read_csv(
+            results_folder(f"{path_prefix}plant_data/plant_static_attributes.csv"),
+            dtype=column_checks.get_dtypes(),
+        )
+        sql_types = get_results_database_types(plant_attributes)
+        convert_to_results_database_types(plant_attributes).to_sql(
+            "plant_static_attributes", connection, index=False, dtype=sql_types
+        )
+        connection.execute(
+            "CREATE INDEX plant_static_attributes_index ON plant_static_attributes (plant_id_eia)"
+        )
+        # shaped fleet plants are identified by their shaped_plant_id
+        connection.execute(
+            """CREATE VIEW plant_ba_fuel AS
+            SELECT plant_id_eia, ba_code, fuel_category FROM plant_static_attributes
+            UNION
+            SELECT DISTINCT CAST(shaped_plant_id AS INTEGER), ba_code, fuel_category
+            FROM plant_static_attributes WHERE shaped_plant_id IS NOT NULL"""
+        )
+        for resolution in ["monthly", "annual"]:
+            connection.execute(
+                f"""CREATE VIEW plant_data_{resolution}_by_ba AS
+                SELECT plant_ba_fuel.ba_code, plant_ba_fuel.fuel_category, plant_data.*
+                FROM plant_data_{resolution} AS plant_data
+                LEFT JOIN plant_ba_fuel USING (plant_id_eia)"""
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def convert_to_results_database_types(df):
+    """Converts datetime columns to UTC text and nullable columns to objects for SQLite."""
+    for col in df.columns:
+        if pd.api.types.is_datetime64tz_dtype(df[col]):
+            df[col] = df[col].dt.tz_convert("UTC").dt.strftime("%Y-%m-%d %H:%M:%S")
+        elif pd.api.types.is_datetime64_dtype(df[col]):
+            df[col] = df[col].dt.strftime("%Y-%m-%d")
+        elif pd.api.types.is_extension_array_dtype(df[col]):
+            # sqlite3 cannot store pd.NA, so store missing values as NULL
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df
+
+
+def get_results_database_types(df):
+    """Returns the SQLite type of each column of `df`."""
+    types = {}
+    for col in df.columns:
+        if col in ["datetime_utc", "report_date"]:
+            types[col] = "TIMESTAMP"
+        elif pd.api.types.is_bool_dtype(df[col]) or pd.api.types.is_integer_dtype(
+            df[col]
+        ):
+            types[col] = "INTEGER"
+        elif pd.api.types.is_float_dtype(df[col]):
+            types[col] = "REAL"
+        else:
+            types[col] = "TEXT"
+    return types
 
 
 def output_data_quality_metrics(df, file_name, path_prefix, skip_outputs):
@@ -167,13 +826,26 @@ def output_data_quality_metrics(df, file_name, path_prefix, skip_outputs):
         )
 
 
-def output_plant_data(df, path_prefix, resolution, skip_outputs, plant_attributes):
+def output_plant_data(
+    df,
+    path_prefix,
+    resolution,
+    skip_outputs,
+    plant_attributes,
+    include_metric=True,
+    csv_writer="pandas",
+    csv_compression=None,
+    results_dataset=False,
+):
     """
     Helper function for plant-level output.
     Output for each time granularity, and output separately for real and shaped plants
     `df` contains all plant-level data, both CEMS and synthetic.
 
     Note: plant-level does not include rates, so all aggregation is summation.
+    If `include_metric` is False, results are only exported in US units.
+    `csv_writer`, `csv_compression`, and `results_dataset` are passed to
+    `output_to_results()`.
     """
     if not skip_outputs:
         if resolution == "hourly":
@@ -188,6 +860,10 @@ def output_plant_data(df, path_prefix, resolution, skip_outputs, plant_attribute
                 "plant_data/hourly/",
                 path_prefix,
                 skip_outputs,
+                include_metric=include_metric,
+                csv_writer=csv_writer,
+                csv_compression=csv_compression,
+                results_dataset=results_dataset,
             )
             output_to_results(
                 df[df.plant_id_eia < 900000],
@@ -195,6 +871,10 @@ def output_plant_data(df, path_prefix, resolution, skip_outputs, plant_attribute
                 "plant_data/hourly/",
                 path_prefix,
                 skip_outputs,
+                include_metric=include_metric,
+                csv_writer=csv_writer,
+                csv_compression=csv_compression,
+                results_dataset=results_dataset,
             )
 
         elif resolution == "monthly":
@@ -205,6 +885,10 @@ def output_plant_data(df, path_prefix, resolution, skip_outputs, plant_attribute
                 "plant_data/monthly/",
                 path_prefix,
                 skip_outputs,
+                include_metric=include_metric,
+                csv_writer=csv_writer,
+                csv_compression=csv_compression,
+                results_dataset=results_dataset,
             )
         elif resolution == "annual":
             # output annual data
@@ -224,6 +908,10 @@ def output_plant_data(df, path_prefix, resolution, skip_outputs, plant_attribute
                 "plant_data/annual/",
                 path_prefix,
                 skip_outputs,
+                include_metric=include_metric,
+                csv_writer=csv_writer,
+                csv_compression=csv_compression,
+                results_dataset=results_dataset,
             )
 
 
@@ -239,23 +927,107 @@ def convert_results(df):
             `fuel_consumed_mmbtu` (mass)
           meaning that unit to convert is ALWAYS in numerator
     """
-    converted = df.copy(deep=True)
-    for column in converted.columns:
-        unit = ""
-        for u in UNIT_CONVERSIONS.keys():  # What to convert?
-            if u in column.split("_"):
-                unit = u
+    conversions = get_metric_conversions(tuple(df.columns))
+    converted = {}
+    for column in df.columns:
+        if column in conversions:
+            new_col, factor = conversions[column]
+            converted[new_col] = df[column].to_numpy(dtype=float) * factor
+        else:
+            converted[column] = df[column]
+    return pd.DataFrame(converted, index=df.index)
+
+
+@functools.lru_cache(maxsize=None)
+def get_metric_conversions(columns):
+    """
+    Returns a dictionary of {column: (new_column, factor)} for each of `columns` (a
+    tuple of column names) that is in US units, using `UNIT_CONVERSIONS`.
+
+    This is cached since the results for each data type and resolution share the same
+    columns.
+    """
+    conversions = {}
+    for column in columns:
+        for unit, (new_unit, factor) in UNIT_CONVERSIONS.items():
+            if unit in column.split("_"):
+                conversions[column] = (column.replace(unit, new_unit), factor)
                 break
-        if unit == "":
-            continue  # nothing to convert, next column
-        new_unit, factor = UNIT_CONVERSIONS[unit]
-        new_col = column.replace(unit, new_unit)
-        converted.rename(columns={column: new_col}, inplace=True)
-        converted.loc[:, new_col] = converted.loc[:, new_col] * factor
-    return converted
+    return conversions
+
+
+def export_metric_results(
+    path_prefix,
+    subfolders=None,
+    csv_writer="pandas",
+    skip_outputs=False,
+    results_dataset=False,
+):
+    """
+    Exports the metric-unit version of results that were exported in US units only.
+
+    This can be used to create the metric results on demand when the pipeline is run
+    with `--no-metric_results`. Each csv in the us_units folder of each of `subfolders`
+    (by default all power_sector_data, carbon_accounting, and monthly and annual
+    plant_data folders) is converted and written to the metric_units folder. If
+    `results_dataset`, the metric results are also added to the results dataset, and
+    the manifest of the results dataset is updated.
+
+    Note that the metric results are converted from the rounded US-unit results, so
+    they may differ in the last decimal place from the results exported by the pipeline.
+    If `skip_outputs`, the metric results are converted and rounded but not written.
+    """
+    if subfolders is None:
+        subfolders = [
+            f"{data_type}/{resolution}/"
+            for data_type in ["power_sector_data", "carbon_accounting", "plant_data"]
+            for resolution in TIME_RESOLUTIONS
+            if not (data_type == "plant_data" and resolution == "hourly")
+        ]
+    for subfolder in subfolders:
+        us_folder = results_folder(f"{path_prefix}{subfolder}us_units")
+        if not os.path.exists(us_folder):
+            continue
+        os.makedirs(
+            results_folder(f"{path_prefix}{subfolder}metric_units"), exist_ok=True
+        )
+        for file in sorted(os.listdir(us_folder)):
+            parsed = parse_csv_file_name(file)
+            if parsed is None:
+                continue
+            file_name, compression = parsed
+            logger.info(
+                f"Exporting {file_name} to data/results/{path_prefix}{subfolder}metric_units"
+            )
+            df = read_csv(os.path.join(us_folder, file))
+            for col in ["datetime_utc", "report_date"]:
+                if col in df.columns:
+                    df[col] = pd.to_datetime(df[col])
+            metric = convert_results(df)
+            metric = round_table(
+                metric,
+                get_rounding_plan(metric, path_prefix, subfolder, "metric_units"),
+                inplace=True,
+            )
+            if not skip_outputs:
+                write_csv(
+                    metric,
+                    results_folder(f"{path_prefix}{subfolder}metric_units/{file}"),
+                    csv_writer,
+                    compression,
+                )
+                if results_dataset:
+                    write_to_results_dataset(
+                        metric, file_name, subfolder, path_prefix, "metric_units"
+                    )
+    if results_dataset:
+        # update the manifest once all of the metric results have been added
+        write_results_dataset_manifest(path_prefix, skip_outputs)
 
 
-def write_generated_averages(ba_fuel_data, year, path_prefix, skip_outputs):
+def write_generated_averages(
+    ba_fuel_data, year, path_prefix, skip_outputs, file_format="csv"
+):
     if not skip_outputs:
         avg_fuel_type_production = (
             ba_fuel_data.groupby(["fuel_category"]).sum(numeric_only=True).reset_index()
@@ -285,6 +1057,7 @@ def write_generated_averages(ba_fuel_data, year, path_prefix, skip_outputs):
             path_prefix,
             year,
             skip_outputs,
+            file_format,
         )
 
 
@@ -397,10 +1170,37 @@ def write_plant_metadata(
         shaped_eia_data = shaped_eia_data.drop(columns=METADATA_COLUMNS)
 
 
-def round_table(table):
+def round_table(table, decimals=None, inplace=False):
     """
     Round each numeric column.
     All values in a column have the same rounding.
+    `decimals` is a dictionary of {column: decimals}, by default calculated from `table`
+    using `calculate_rounding_decimals()`. If `inplace` is True, `table` is rounded in
+    place instead of returning a rounded copy.
+    """
+    if decimals is None:
+        decimals = calculate_rounding_decimals(table)
+    if not inplace:
+        table = table.copy()
+    for c, d in decimals.items():
+        if c not in table.columns:
+            continue
+        values = table[c].to_numpy()
+        # round float columns directly in the underlying array where possible
+        if (
+            values.dtype.kind == "f"
+            and values.flags.writeable
+            and not pd.api.types.is_extension_array_dtype(table[c])
+        ):
+            np.round(values, d, out=values)
+        else:
+            table[c] = table[c].round(d)
+    return table
+
+
+def calculate_rounding_decimals(table):
+    """
+    Returns a dictionary of {column: decimals} to round each numeric column of `table` to.
     Rounding for each col is based on the median non-zero value: if < 1, sigfigs = 3, else 2 decimal places
     """
     decimals = {}
@@ -420,12 +1220,109 @@ def round_table(table):
             except ValueError:
                 logger.error(val)
                 raise Exception
-    return table.round(decimals)
+    return decimals
+
+
+def get_rounding_plan(table, path_prefix, subfolder, unit):
+    """
+    Returns the dictionary of {column: decimals} used to round `table` before it is
+    exported to `subfolder` of the results in `unit`.
+
+    The decimals for each column of each type of results are only calculated once, from
+    the sample passed to `plan_rounding()` or otherwise from the first table exported,
+    and are reused for every other table (e.g. every BA) exported to the same subfolder,
+    so that all of these tables are rounded consistently.
+    """
+    plan = ROUNDING_PLANS.setdefault((path_prefix, subfolder, unit), {})
+    numeric_columns = table.select_dtypes(include=np.number).columns
+    missing_columns = [c for c in numeric_columns if c not in plan]
+    if len(missing_columns) > 0:
+        plan.update(calculate_rounding_decimals(sample_rows(table[missing_columns])))
+    return {c: plan[c] for c in numeric_columns}
 
 
-def write_power_sector_results(ba_fuel_data, path_prefix, skip_outputs):
+def plan_rounding(sample, path_prefix, subfolder, include_metric=True):
+    """
+    Calculates the decimals that each column of the results exported to `subfolder` is
+    rounded to from `sample`, which should be representative of all of these results
+    (e.g. the data for every BA), in US units and (if `include_metric`) metric units.
+
+    Returns:
+        dictionary of {unit: {column: decimals}} of the plan for each unit
+    """
+    sample = sample_rows(sample)
+    rounding_plans = {}
+    for unit in ["us_units", "metric_units"] if include_metric else ["us_units"]:
+        if unit == "metric_units":
+            sample = convert_results(sample)
+        rounding_plans[unit] = calculate_rounding_decimals(sample)
+        ROUNDING_PLANS[(path_prefix, subfolder, unit)] = rounding_plans[unit]
+    return rounding_plans
+
+
+def sample_rows(df, n=ROUNDING_SAMPLE_SIZE):
+    """Returns a reproducible random sample of at most `n` rows of `df`."""
+    if len(df) <= n:
+        return df
+    return df.sample(n, random_state=0)
+
+
+def partition_dataframe(df, column, dropna=True):
+    """Splits `df` into a dictionary of {value: rows} for each unique value of `column`.
+
+    The data is sorted by `column` once (keeping the original order of rows within each
+    value) and each partition is a slice of the sorted data, instead of filtering the
+    entire dataframe once for each value. Values are ordered by their first appearance
+    in `df`. Partitions are views of the sorted data, so copy them before modifying.
+    """
+    codes, values = pd.factorize(df[column], use_na_sentinel=dropna)
+    order = np.argsort(codes, kind="stable")
+    sorted_df = df.take(order)
+    starts = np.searchsorted(codes[order], np.arange(len(values) + 1))
+    return {
+        value: sorted_df.iloc[starts[i] : starts[i + 1]]
+        for i, value in enumerate(values)
+    }
+
+
+def add_generated_emission_rate_columns(df):
+    """Adds the generated emission rate columns to `df`, which contains total emissions
+    and net generation."""
+    for emission_type in ["_for_electricity", "_for_electricity_adjusted"]:
+        for emission in ["co2", "ch4", "n2o", "co2e", "nox", "so2"]:
+            col_name = f"generated_{emission}_rate_lb_per_mwh{emission_type}"
+            df[col_name] = (
+                (df[f"{emission}_mass_lb{emission_type}"] / df["net_generation_mwh"])
+                .replace(np.inf, np.NaN)
+                .replace(-np.inf, np.NaN)
+            )
+            # where the rate is missing because of a divide by zero (i.e.
+            # net_generation_mwh is zero), replace the emission rate with
+            # zero. We want to keep all other NAs so that they get flagged
+            # by our validation checks since this indicates an unexpected
+            # issue
+            df.loc[df["net_generation_mwh"] == 0, col_name] = df.loc[
+                df["net_generation_mwh"] == 0, col_name
+            ].fillna(0)
+            # Set negative rates to zero, following eGRID methodology
+            df.loc[df[col_name] < 0, col_name] = 0
+    return df
+
+
+def write_power_sector_results(
+    ba_fuel_data,
+    path_prefix,
+    skip_outputs,
+    include_metric=True,
+    csv_writer="pandas",
+    csv_compression=None,
+    results_dataset=False,
+):
     """
     Helper function to write combined data by BA
+    If `include_metric` is False, results are only exported in US units.
+    `csv_writer`, `csv_compression`, and `results_dataset` are passed to
+    `output_to_results()`.
     """
 
     data_columns = [
@@ -459,17 +1356,35 @@ def write_power_sector_results(ba_fuel_data, path_prefix, skip_outputs):
     ]
 
     if not skip_outputs:
-        for ba in list(ba_fuel_data.ba_code.unique()):
+        # calculate the decimals to round the results to from the data for all BAs, so
+        # that each type of result is rounded the same way for every BA
+        for resolution, keys in {
+            "hourly": ["ba_code", "fuel_category", "datetime_utc", "report_date"],
+            "monthly": ["ba_code", "fuel_category", "report_date"],
+            "annual": ["ba_code", "fuel_category"],
+        }.items():
+            sample = sample_rows(
+                ba_fuel_data.groupby(keys, dropna=False)[data_columns]
+                .sum()
+                .reset_index(drop=True)
+            )
+            plan_rounding(
+                add_generated_emission_rate_columns(sample),
+                path_prefix,
+                f"power_sector_data/{resolution}/",
+                include_metric=include_metric,
+            )
+
+        ba_partitions = partition_dataframe(ba_fuel_data, "ba_code", dropna=False)
+        for ba, ba_table in ba_partitions.items():
             if type(ba) is not str:
                 logger.warning(
                     f"not aggregating {sum(ba_fuel_data.ba_code.isna())} plants with numeric BA {ba}"
                 )
                 continue
 
-            # filter the data for a single BA
-            ba_table = ba_fuel_data[ba_fuel_data["ba_code"] == ba].drop(
-                columns="ba_code"
-            )
+            # get the data for a single BA
+            ba_table = ba_table.drop(columns="ba_code")
 
             # convert the datetime_utc column back to a datetime
             ba_table["datetime_utc"] = pd.to_datetime(
@@ -501,32 +1416,6 @@ def write_power_sector_results(ba_fuel_data, path_prefix, skip_outputs):
                 .reset_index()
             )
 
-            def add_generated_emission_rate_columns(df):
-                for emission_type in ["_for_electricity", "_for_electricity_adjusted"]:
-                    for emission in ["co2", "ch4", "n2o", "co2e", "nox", "so2"]:
-                        col_name = (
-                            f"generated_{emission}_rate_lb_per_mwh{emission_type}"
-                        )
-                        df[col_name] = (
-                            (
-                                df[f"{emission}_mass_lb{emission_type}"]
-                                / df["net_generation_mwh"]
-                            )
-                            .replace(np.inf, np.NaN)
-                            .replace(-np.inf, np.NaN)
-                        )
-                        # where the rate is missing because of a divide by zero (i.e.
-                        # net_generation_mwh is zero), replace the emission rate with
-                        # zero. We want to keep all other NAs so that they get flagged
-                        # by our validation checks since this indicates an unexpected
-                        # issue
-                        df.loc[df["net_generation_mwh"] == 0, col_name] = df.loc[
-                            df["net_generation_mwh"] == 0, col_name
-                        ].fillna(0)
-                        # Set negative rates to zero, following eGRID methodology
-                        df.loc[df[col_name] < 0, col_name] = 0
-                return df
-
             # output the hourly data
             ba_table_hourly = add_generated_emission_rate_columns(ba_table_hourly)
 
@@ -559,6 +1448,10 @@ def write_power_sector_results(ba_fuel_data, path_prefix, skip_outputs):
                 "power_sector_data/hourly/",
                 path_prefix,
                 skip_outputs,
+                include_metric=include_metric,
+                csv_writer=csv_writer,
+                csv_compression=csv_compression,
+                results_dataset=results_dataset,
             )
 
             # aggregate data to monthly
@@ -580,6 +1473,10 @@ def write_power_sector_results(ba_fuel_data, path_prefix, skip_outputs):
                 "power_sector_data/monthly/",
                 path_prefix,
                 skip_outputs,
+                include_metric=include_metric,
+                csv_writer=csv_writer,
+                csv_compression=csv_compression,
+                results_dataset=results_dataset,
             )
 
             # aggregate data to annual
@@ -599,4 +1496,8 @@ def write_power_sector_results(ba_fuel_data, path_prefix, skip_outputs):
                 "power_sector_data/annual/",
                 path_prefix,
                 skip_outputs,
+                include_metric=include_metric,
+                csv_writer=csv_writer,
+                csv_compression=csv_compression,
+                results_dataset=results_dataset,
             )
@@ -1,3 +1,4 @@
+import hashlib
 import pandas as pd
 import numpy as np
 
@@ -179,39 +180,41 @@ def test_for_missing_energy_source_code(df):
     return missing_esc_test
 
 
-def check_non_missing_cems_co2_values_unchanged(cems_original, cems):
-    """Checks that no non-missing CO2 values were modified during the process of filling."""
+def summarize_non_missing_cems_co2(cems):
+    """
+    Returns a mask of the rows of `cems` with positive CO2 values and a checksum of those
+    values, which are used by `check_non_missing_cems_co2_values_unchanged()` to check
+    that the values were not modified without keeping a copy of the data.
+    """
+    co2_mass_lb = cems["co2_mass_lb"].to_numpy(dtype="float64", na_value=np.NaN)
+    non_missing_co2 = co2_mass_lb > 0
+    return non_missing_co2, hashlib.sha256(co2_mass_lb[non_missing_co2]).hexdigest()
+
+
+def check_non_missing_cems_co2_values_unchanged(cems, original_co2_summary):
+    """
+    Checks that no non-missing CO2 values were modified during the process of filling.
+
+    `original_co2_summary` is the output of `summarize_non_missing_cems_co2()` for the
+    data before filling, which must contain the same rows in the same order.
+    """
     logger.info(
         "Checking that original CO2 data in CEMS was not modified by filling missing values...",
     )
-    # only keep non-zero and non-missing co2 values, since these should have not been modified
-    cems_original = cems_original.loc[
-        cems_original["co2_mass_lb"] > 0,
-        ["plant_id_eia", "emissions_unit_id_epa", "datetime_utc", "co2_mass_lb"],
-    ]
-    test_fill = cems_original.merge(
-        cems[["plant_id_eia", "emissions_unit_id_epa", "datetime_utc", "co2_mass_lb"]],
-        how="left",
-        on=["plant_id_eia", "emissions_unit_id_epa", "datetime_utc"],
-        validate="1:1",
-        suffixes=("_original", "_postfill"),
-    )
-    test_fill["diff"] = (
-        test_fill["co2_mass_lb_postfill"] - test_fill["co2_mass_lb_original"]
-    )
-    num_nonzero_rows = len(test_fill[test_fill["diff"] != 0])
-    if num_nonzero_rows > 0:
+    # only check non-zero and non-missing co2 values, since these should have not been modified
+    non_missing_co2, original_checksum = original_co2_summary
+    co2_mass_lb = cems["co2_mass_lb"].to_numpy(dtype="float64", na_value=np.NaN)
+    if hashlib.sha256(co2_mass_lb[non_missing_co2]).hexdigest() != original_checksum:
         logger.warning(
-            f"There are {num_nonzero_rows} non-missing CO2 CEMS records that were modified by `fill_cems_missing_co2` in error"
+            "Some non-missing CO2 CEMS records were modified by `fill_cems_missing_co2` in error"
         )
     else:
         logger.info("OK")
 
 
-def check_removed_data_is_empty(cems):
+def check_removed_data_is_empty(removed_cems):
     """Checks that the rows removed by `data_cleaning.remove_cems_with_zero_monthly_data()` don't actually contain non-zero data"""
-    check_that_data_is_zero = cems.loc[
-        cems["missing_data_flag"] == "remove",
+    check_that_data_is_zero = removed_cems[
         [
             "gross_generation_mwh",
             "steam_load_1000_lb",
@@ -219,7 +222,7 @@ def check_removed_data_is_empty(cems):
             "co2_mass_lb",
             "nox_mass_lb",
             "so2_mass_lb",
-        ],
+        ]
     ].sum(numeric_only=True)
     if check_that_data_is_zero.sum() > 0:
         logger.warning("Some data being removed has non-zero data associated with it:")
@@ -953,6 +956,18 @@ def summarize_annually_reported_eia_data(eia923_allocated, year):
 
 def summarize_cems_measurement_quality(cems):
     """Creates a table summarizing what percent of CO2, SO2, and NOx mass in CEMS was measured or imputed from other hourly values"""
+    return calculate_cems_measurement_quality(
+        [sum_cems_mass_by_measurement_quality(cems)]
+    )
+
+
+def sum_cems_mass_by_measurement_quality(cems):
+    """
+    Sums the CO2, NOx, and SO2 mass in CEMS by whether it was measured or imputed.
+
+    The sums for each partition of the CEMS data can be passed together to
+    `calculate_cems_measurement_quality()` to summarize all of the data.
+    """
     cems_quality = cems[
         [
             "co2_mass_lb",
@@ -1006,17 +1021,25 @@ def summarize_cems_measurement_quality(cems):
         measurement_code_map
     )
 
-    cems_quality_summary = []
-    # calculate the percent of mass for each pollutant that is measured or imputed
+    mass_by_quality = []
     for pollutant in ["co2", "nox", "so2"]:
-        percent = (
+        mass_by_quality.append(
             cems_quality.groupby([f"{pollutant}_mass_measurement_code"], dropna=False)[
                 f"{pollutant}_mass_lb"
             ].sum()
-            / cems_quality[f"{pollutant}_mass_lb"].sum()
         )
-        cems_quality_summary.append(percent)
-    cems_quality_summary = pd.concat(cems_quality_summary, axis=1).round(4)
+    return pd.concat(mass_by_quality, axis=1)
+
+
+def calculate_cems_measurement_quality(mass_by_quality):
+    """
+    Calculates the percent of the CEMS mass of each pollutant that was measured or
+    imputed from a list of outputs of `sum_cems_mass_by_measurement_quality()`, e.g. one
+    for each partition of the CEMS data.
+    """
+    mass_by_quality = pd.concat(mass_by_quality).groupby(level=0).sum(min_count=1)
+    # calculate the percent of mass for each pollutant that is measured or imputed
+    cems_quality_summary = (mass_by_quality / mass_by_quality.sum()).round(4)
     # drop NA values
     cems_quality_summary = cems_quality_summary.loc[["Measured", "Imputed"], :]
     cems_quality_summary = cems_quality_summary.reset_index()
@@ -1025,7 +1048,8 @@ def summarize_cems_measurement_quality(cems):
 
 
 def identify_cems_gtn_method(cems):
-    method_summary = cems.groupby("gtn_method", dropna=False)[
+    # gtn_method is categorical, so only summarize the methods that are used
+    method_summary = cems.groupby("gtn_method", dropna=False, observed=True)[
         "gross_generation_mwh"
     ].sum()
     method_summary = method_summary / method_summary.sum(axis=0)
@@ -1073,72 +1097,52 @@ def validate_diba_imputation_method(hourly_profiles, year):
         ]
     ]
 
-    profiles_to_impute = data_to_validate[
-        ["ba_code", "fuel_category", "report_date"]
-    ].drop_duplicates()
-
-    profiles_to_impute = profiles_to_impute[
-        profiles_to_impute["report_date"].dt.year == year
-    ]
-
     dibas = load_data.load_diba_data(year)
+    # get a list of diba located in the same region and located in the same time zone
+    dibas = dibas.loc[
+        (dibas.ba_region == dibas.diba_region)
+        & (dibas.timezone_local == dibas.timezone_local_diba),
+        ["ba_code", "diba_code"],
+    ].drop_duplicates()
+    ba_dibas = dibas.groupby("ba_code")["diba_code"].apply(list).to_dict()
+
+    # index the actual profiles so that each ba's imputed profile can be calculated
+    # on the same hourly axis as its actual profile
+    profile_index = impute_hourly_profiles.build_profile_index(data_to_validate)
+
+    actual_profiles = []
+    imputed_profiles = []
+    profile_keys = []
+    for (fuel, report_date), fuel_month_index in profile_index.items():
+        target_bas = list(fuel_month_index["ba_rows"].keys())
+        # only impute profiles for the current year
+        averages, has_data, _ = impute_hourly_profiles.calculate_diba_averages(
+            fuel_month_index,
+            target_bas,
+            ba_dibas if report_date.year == year else {},
+        )
+        actual_profiles.append(fuel_month_index["profiles"])
+        imputed_profiles.append(np.where(has_data, averages, np.NaN))
+        profile_keys += [(fuel, report_date, ba) for ba in target_bas]
+
+    # calculate the correlation coefficient for each fleet-month in a single pass
+    n_hours = max([profiles.shape[1] for profiles in actual_profiles])
+
+    def pad_hours(profiles):
+        return np.pad(
+            profiles,
+            ((0, 0), (0, n_hours - profiles.shape[1])),
+            constant_values=np.NaN,
+        )
 
-    # create an hourly datetime series in local time for each ba/fuel type
-    hourly_profiles_to_add = []
-
-    for index, row in profiles_to_impute.iterrows():
-        ba = row["ba_code"]
-        fuel = row["fuel_category"]
-        report_date = row["report_date"]
-
-        # for wind and solar, average the wind and solar generation profiles from
-        # nearby interconnected BAs
-        if fuel in ["wind", "solar"]:
-            # get a list of diba located in the same region and located in the same time zone
-            ba_dibas = list(
-                dibas.loc[
-                    (dibas.ba_code == ba)
-                    & (dibas.ba_region == dibas.diba_region)
-                    & (dibas.timezone_local == dibas.timezone_local_diba),
-                    "diba_code",
-                ].unique()
-            )
-            if len(ba_dibas) > 0:
-                df_temporary = impute_hourly_profiles.average_diba_wind_solar_profiles(
-                    data_to_validate, ba, fuel, report_date, ba_dibas, True
-                )
-
-                hourly_profiles_to_add.append(df_temporary)
-            # if there are no neighboring DIBAs, calculate a national average profile
-            else:
-                pass
-
-    hourly_profiles_to_add = pd.concat(
-        hourly_profiles_to_add, axis=0, ignore_index=True
+    compare_method = pd.DataFrame(
+        profile_keys, columns=["fuel_category", "report_date", "ba_code"]
     )
-
-    # merge the imputed data with the actual data
-    compare_method = data_to_validate.merge(
-        hourly_profiles_to_add,
-        how="left",
-        on=[
-            "fuel_category",
-            "datetime_utc",
-            "datetime_local",
-            "report_date",
-            "ba_code",
-        ],
-        validate="1:1",
+    compare_method["imputed_profile"] = calculate_rowwise_correlation(
+        np.concatenate([pad_hours(profiles) for profiles in actual_profiles]),
+        np.concatenate([pad_hours(profiles) for profiles in imputed_profiles]),
     )
 
-    # calculate the correlation coefficient for each fleet-month
-    compare_method = (
-        compare_method.groupby(["fuel_category", "report_date", "ba_code"])
-        .corr(numeric_only=True)
-        .reset_index()
-    )
-    compare_method = compare_method[compare_method["level_3"] == "eia930_profile"]
-
     # calculate the annual average correlation coefficent for each month
     compare_method = (
         compare_method.groupby(["fuel_category", "ba_code"])["imputed_profile"]
@@ -1153,6 +1157,25 @@ def validate_diba_imputation_method(hourly_profiles, year):
     return compare_method
 
 
+def calculate_rowwise_correlation(x, y):
+    """Calculates the pearson correlation coefficient between each row of two arrays.
+
+    Like `DataFrame.corr()`, only hours where both values are not missing are used, and
+    the correlation is NaN if either row has no variance.
+    """
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    x = np.where(valid, x, 0)
+    y = np.where(valid, y, 0)
+    n = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_dev = np.where(valid, x - (x.sum(axis=1) / n)[:, np.newaxis], 0)
+        y_dev = np.where(valid, y - (y.sum(axis=1) / n)[:, np.newaxis], 0)
+        correlation = (x_dev * y_dev).sum(axis=1) / np.sqrt(
+            (x_dev**2).sum(axis=1) * (y_dev**2).sum(axis=1)
+        )
+    return np.clip(correlation, -1, 1)
+
+
 def validate_national_imputation_method(hourly_profiles):
 
     # only keep wind and solar data
@@ -1175,26 +1198,10 @@ def validate_national_imputation_method(hourly_profiles):
         ["ba_code", "fuel_category", "report_date"]
     ].drop_duplicates()
 
-    # create an hourly datetime series in local time for each ba/fuel type
-    hourly_profiles_to_add = []
-
-    for index, row in profiles_to_impute.iterrows():
-        ba = row["ba_code"]
-        fuel = row["fuel_category"]
-        report_date = row["report_date"]
-
-        # for wind and solar, average the wind and solar generation profiles from
-        # nearby interconnected BAs
-        if fuel in ["wind", "solar"]:
-            # get a list of diba located in the same region and located in the same time zone
-            df_temporary = impute_hourly_profiles.average_national_wind_solar_profiles(
-                data_to_validate, ba, fuel, report_date
-            )
-
-        hourly_profiles_to_add.append(df_temporary)
-
-    hourly_profiles_to_add = pd.concat(
-        hourly_profiles_to_add, axis=0, ignore_index=True
+    # calculate the national average profiles once and assign them to each ba-fuel-month
+    hourly_profiles_to_add = impute_hourly_profiles.impute_national_wind_solar_profiles(
+        impute_hourly_profiles.calculate_national_wind_solar_averages(data_to_validate),
+        profiles_to_impute,
     )
 
     # merge the imputed data with the actual data
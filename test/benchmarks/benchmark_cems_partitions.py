@@ -0,0 +1,148 @@
+"""
+Benchmarks the peak memory used to prepare partitioned CEMS data in step 4 of the data
+pipeline.
+
+Compares `data_cleaning.process_cems_partitions`, which loads one partition of the
+unit-level data at a time, against loading all of the partitions at once and then
+summarizing, adjusting, and aggregating the full year of unit-level data, on synthetic
+hourly unit-level CEMS data. Both use the compact dtypes from `apply_dtypes()` after
+summarizing the measurement quality. Checks that both produce the same subplant data.
+
+Run from the `test/benchmarks` directory with `python benchmark_cems_partitions.py`
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+sys.path.append("../../src")
+
+import data_cleaning  # noqa: E402
+import emissions  # noqa: E402
+import load_data  # noqa: E402
+import output_data  # noqa: E402
+import validation  # noqa: E402
+from column_checks import apply_dtypes  # noqa: E402
+
+MASS_COLUMNS = [
+    "gross_generation_mwh",
+    "steam_load_1000_lb",
+    "fuel_consumed_mmbtu",
+    "co2_mass_lb",
+    "ch4_mass_lb",
+    "n2o_mass_lb",
+    "nox_mass_lb",
+    "so2_mass_lb",
+]
+
+
+def create_synthetic_cems(year=2021, n_plants=100, units_per_plant=3, seed=0):
+    """Creates a full year of hourly unit-level CEMS data for `n_plants` plants."""
+    rng = np.random.default_rng(seed)
+    datetimes = pd.date_range(
+        f"{year}-01-01 00:00", f"{year}-12-31 23:00", freq="H", tz="UTC"
+    )
+    units = pd.DataFrame(
+        {
+            "plant_id_eia": np.repeat(np.arange(1, n_plants + 1), units_per_plant),
+            "emissions_unit_id_epa": np.tile(
+                [f"U{i}" for i in range(units_per_plant)], n_plants
+            ),
+            "subplant_id": np.tile(np.arange(units_per_plant) // 2, n_plants),
+            "energy_source_code": rng.choice(
+                ["NG", "BIT", "LFG", "WDS"], n_plants * units_per_plant
+            ),
+        }
+    )
+    cems = units.loc[units.index.repeat(len(datetimes))].reset_index(drop=True)
+    cems["datetime_utc"] = np.tile(datetimes, len(units))
+    cems["report_date"] = (
+        cems["datetime_utc"].dt.tz_localize(None).dt.to_period("M").dt.to_timestamp()
+    )
+    cems["plant_id_epa"] = cems["plant_id_eia"]
+    cems["operating_time_hours"] = 1.0
+    for column in MASS_COLUMNS:
+        cems[column] = rng.gamma(2.0, 50.0, len(cems)).round(3)
+    for pollutant in ["co2", "nox", "so2"]:
+        cems[f"{pollutant}_mass_measurement_code"] = rng.choice(
+            ["Measured", "Substitute", "LME"], len(cems)
+        )
+    return apply_dtypes(cems)
+
+
+def write_partitions(cems, folder, plants_per_partition):
+    """Writes `cems` as parquet partitions like `data_cleaning.clean_cems_partitioned`."""
+    plant_ids = cems["plant_id_eia"].unique()
+    for partition_number, start in enumerate(
+        range(0, len(plant_ids), plants_per_partition)
+    ):
+        partition_plant_ids = plant_ids[start : start + plants_per_partition]
+        output_data.write_intermediate_parquet(
+            cems[cems["plant_id_eia"].isin(partition_plant_ids)],
+            os.path.join(folder, f"part-{partition_number:04}.parquet"),
+        )
+    return ds.dataset(folder, format="parquet")
+
+
+def process_all_partitions(cems_partitions):
+    """Loads all of the partitions at once and processes the full year of unit data."""
+    cems = apply_dtypes(load_data.load_partitioned_data(cems_partitions))
+    cems_quality = validation.summarize_cems_measurement_quality(cems)
+    cems = apply_dtypes(cems, compact=True)
+    cems = emissions.adjust_emissions_for_biomass(cems)
+    cems_unit_months = data_cleaning.aggregate_cems_to_unit_month(cems)
+    return (
+        data_cleaning.aggregate_cems_to_subplant(cems),
+        cems_unit_months,
+        cems_quality,
+    )
+
+
+def measure(func, *args):
+    """Returns the time, peak traced memory in bytes, and result of `func(*args)`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    cems = create_synthetic_cems()
+    print(f"Benchmarking CEMS partitions on {len(cems):,} rows of unit-level data")
+
+    with tempfile.TemporaryDirectory() as folder:
+        cems_partitions = write_partitions(cems, folder, plants_per_partition=10)
+        del cems
+
+        full_time, full_peak, full = measure(process_all_partitions, cems_partitions)
+        partitioned_time, partitioned_peak, partitioned = measure(
+            data_cleaning.process_cems_partitions,
+            cems_partitions,
+            "",
+            2021,
+            True,
+        )
+
+    keys = ["plant_id_eia", "subplant_id", "datetime_utc"]
+    pd.testing.assert_frame_equal(
+        full[0].sort_values(keys).reset_index(drop=True),
+        partitioned[0].sort_values(keys).reset_index(drop=True),
+    )
+    pd.testing.assert_frame_equal(full[2], partitioned[2])
+
+    print(f"all partitions at once: {full_time:.2f}s, peak {full_peak / 1e9:.2f}GB")
+    print(
+        f"one partition at a time: {partitioned_time:.2f}s, peak {partitioned_peak / 1e9:.2f}GB"
+    )
+
+
+if __name__ == "__main__":
+    main()
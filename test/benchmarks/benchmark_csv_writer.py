@@ -0,0 +1,76 @@
+"""
+Benchmarks the csv writers used to export the results.
+
+Compares `output_data.write_csv` using pyarrow against `DataFrame.to_csv` on a synthetic
+year of hourly `individual_plant_data`, and checks that both files have the same header
+and contain the same data.
+
+Run from the `test/benchmarks` directory with `python benchmark_csv_writer.py`
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append("../../src")
+
+import output_data  # noqa: E402
+from data_cleaning import DATA_COLUMNS  # noqa: E402
+
+
+def create_synthetic_individual_plant_data(year=2021, n_plants=100, seed=0):
+    """Creates a full year of rounded hourly data for `n_plants` plants."""
+    rng = np.random.default_rng(seed)
+    datetimes = pd.date_range(
+        f"{year}-01-01 00:00", f"{year}-12-31 23:00", freq="H", tz="UTC"
+    )
+    index = pd.MultiIndex.from_product(
+        [np.arange(1, n_plants + 1), datetimes], names=["plant_id_eia", "datetime_utc"]
+    )
+    df = index.to_frame(index=False)
+    df["report_date"] = (
+        df["datetime_utc"].dt.tz_localize(None).dt.to_period("M").dt.to_timestamp()
+    )
+    for column in DATA_COLUMNS:
+        df[column] = rng.gamma(2.0, 50.0, len(df)).round(2)
+    return df
+
+
+def time_writer(df, path, csv_writer, compression=None, repeat=1):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output_data.write_csv(df, path, csv_writer, compression)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    df = create_synthetic_individual_plant_data()
+    print(f"Benchmarking csv writers on {len(df):,} rows")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for compression in [None, "gzip"]:
+            paths = {
+                csv_writer: os.path.join(folder, f"{csv_writer}.csv")
+                for csv_writer in output_data.CSV_WRITERS
+            }
+            timings = {
+                csv_writer: time_writer(df, path, csv_writer, compression)
+                for csv_writer, path in paths.items()
+            }
+            pandas_data = pd.read_csv(paths["pandas"], compression=compression)
+            pyarrow_data = pd.read_csv(paths["pyarrow"], compression=compression)
+            # the headers are identical, and floats only differ in their formatting
+            assert list(pandas_data.columns) == list(df.columns)
+            pd.testing.assert_frame_equal(pandas_data, pyarrow_data)
+            print(
+                f"compression={compression}: {timings['pandas']:.2f}s (to_csv) -> {timings['pyarrow']:.2f}s (pyarrow)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmarks the plant and BA-fuel aggregations used in steps 15 and 16 of the data pipeline.
+
+Compares the integer-coded aggregations in `data_cleaning.combine_plant_data` and
+`data_cleaning.aggregate_plant_data_to_ba_fuel` against the previous groupby-and-merge
+implementations on a synthetic full year of hourly plant data, and checks that both
+implementations produce the same results.
+
+Run from the `test/benchmarks` directory with `python benchmark_plant_aggregation.py`
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append("../../src")
+
+import data_cleaning  # noqa: E402
+from data_cleaning import DATA_COLUMNS  # noqa: E402
+
+KEY_COLUMNS = ["plant_id_eia", "datetime_utc", "report_date"]
+
+
+def create_synthetic_plant_data(
+    year=2021, n_cems_plants=120, n_eia_plants=80, n_bas=70, seed=0
+):
+    """Creates a full year of hourly data for cems, partial cems, and shaped eia plants."""
+    rng = np.random.default_rng(seed)
+    datetimes = pd.date_range(
+        f"{year}-01-01 00:00", f"{year}-12-31 23:00", freq="H", tz="UTC"
+    )
+
+    def hourly_data(plant_ids):
+        index = pd.MultiIndex.from_product(
+            [plant_ids, datetimes], names=["plant_id_eia", "datetime_utc"]
+        )
+        df = index.to_frame(index=False)
+        df["plant_id_eia"] = df["plant_id_eia"].astype("Int32")
+        df["report_date"] = (
+            df["datetime_utc"].dt.tz_localize(None).dt.to_period("M").dt.to_timestamp()
+        )
+        for column in DATA_COLUMNS:
+            df[column] = rng.gamma(2.0, 50.0, len(df))
+        # add some missing data
+        df.loc[rng.random(len(df)) < 0.01, "co2_mass_lb"] = np.NaN
+        return df
+
+    plant_ids = np.arange(1, n_cems_plants + n_eia_plants + 1)
+    cems = hourly_data(plant_ids[:n_cems_plants])
+    # some cems plants also have partial cems data for other subplants
+    partial_cems_plant = hourly_data(plant_ids[: n_cems_plants // 10]).drop(
+        columns=DATA_COLUMNS[-6:]
+    )
+    partial_cems_subplant = cems.iloc[:0].copy()
+    eia_data = hourly_data(plant_ids[n_cems_plants:])
+
+    plant_attributes = pd.DataFrame(
+        {
+            "plant_id_eia": plant_ids,
+            "shaped_plant_id": np.NaN,
+            "ba_code": rng.choice([f"BA{i:02}" for i in range(n_bas)], len(plant_ids)),
+            "fuel_category": rng.choice(
+                ["natural_gas", "coal", "petroleum", "biomass", "wind", "solar"],
+                len(plant_ids),
+            ),
+        }
+    )
+    return (cems, partial_cems_subplant, partial_cems_plant, eia_data), plant_attributes
+
+
+def legacy_combine_plant_data(cems, partial_cems_subplant, partial_cems_plant, eia_data):
+    """The groupby implementation of `combine_plant_data` at hourly resolution."""
+    all_columns = KEY_COLUMNS + DATA_COLUMNS
+    sources = []
+    for df in [cems, partial_cems_subplant, partial_cems_plant, eia_data]:
+        if len(df) > 0:
+            df = (
+                df.groupby(KEY_COLUMNS, dropna=False)
+                .sum(numeric_only=True)
+                .reset_index()[[col for col in df.columns if col in all_columns]]
+            )
+        sources.append(df)
+    combined_plant_data = pd.concat(sources, axis=0, ignore_index=True, copy=False)
+    combined_plant_data = (
+        combined_plant_data.groupby(KEY_COLUMNS, dropna=False).sum().reset_index()
+    )
+    combined_plant_data[DATA_COLUMNS] = combined_plant_data[DATA_COLUMNS].round(2)
+    return combined_plant_data[all_columns]
+
+
+def legacy_aggregate_plant_data_to_ba_fuel(combined_plant_data, plant_attributes):
+    """The merge-and-groupby implementation of `aggregate_plant_data_to_ba_fuel`."""
+    ba_fuel_data = combined_plant_data.merge(
+        plant_attributes[["plant_id_eia", "ba_code", "fuel_category"]],
+        how="left",
+        on=["plant_id_eia"],
+        validate="m:1",
+    )
+    return (
+        ba_fuel_data.groupby(
+            ["ba_code", "fuel_category", "datetime_utc", "report_date"], dropna=False
+        )[DATA_COLUMNS]
+        .sum()
+        .reset_index()
+    )
+
+
+def time_function(func, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    sources, plant_attributes = create_synthetic_plant_data()
+    print(
+        f"Benchmarking plant aggregation on {sum(len(df) for df in sources):,} rows"
+    )
+
+    legacy_time, legacy = time_function(legacy_combine_plant_data, *sources)
+    current_time, current = time_function(
+        lambda *args: data_cleaning.combine_plant_data(
+            *args, resolution="hourly", validate=False
+        ),
+        *sources,
+    )
+    # the sums are rounded to two decimals, but may be added in a different order
+    pd.testing.assert_frame_equal(legacy, current, check_exact=False, atol=0.011)
+    print(f"combine_plant_data: {legacy_time:.2f}s (groupby) -> {current_time:.2f}s")
+
+    legacy_time, legacy = time_function(
+        legacy_aggregate_plant_data_to_ba_fuel, current, plant_attributes
+    )
+    current_time, current = time_function(
+        data_cleaning.aggregate_plant_data_to_ba_fuel, current, plant_attributes
+    )
+    pd.testing.assert_frame_equal(legacy, current)
+    print(
+        f"aggregate_plant_data_to_ba_fuel: {legacy_time:.2f}s (merge and groupby) -> {current_time:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
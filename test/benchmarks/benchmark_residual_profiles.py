@@ -0,0 +1,204 @@
+"""
+Benchmarks the residual profile calculations used in step 13 of the data pipeline.
+
+Compares the broadcast group reductions in `impute_hourly_profiles` against the
+previous groupby-and-merge implementation on a synthetic full year of hourly BA-fuel
+data, and checks that both implementations produce the same profiles.
+
+Run from the `test/benchmarks` directory with `python benchmark_residual_profiles.py`
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append("../../src")
+
+import impute_hourly_profiles  # noqa: E402
+
+KEYS = ["ba_code", "fuel_category", "report_date"]
+
+
+def create_synthetic_combined_data(year=2021, n_bas=70, n_fuels=8, seed=0):
+    """Creates a full year of hourly eia930 and cems profiles for each BA-fuel."""
+    rng = np.random.default_rng(seed)
+    datetimes = pd.date_range(
+        f"{year}-01-01 00:00", f"{year}-12-31 23:00", freq="H", tz="UTC"
+    )
+    index = pd.MultiIndex.from_product(
+        [
+            [f"BA{i:02}" for i in range(n_bas)],
+            [f"fuel{i}" for i in range(n_fuels)],
+            datetimes,
+        ],
+        names=["ba_code", "fuel_category", "datetime_utc"],
+    )
+    df = index.to_frame(index=False)
+    df["datetime_local"] = df["datetime_utc"].astype(str)
+    df["report_date"] = df["datetime_utc"].dt.tz_localize(None).dt.to_period(
+        "M"
+    ).dt.to_timestamp()
+    df["eia930_profile"] = rng.gamma(2.0, 100.0, len(df))
+    df["cems_profile"] = df["eia930_profile"] * rng.uniform(0.2, 1.2, len(df))
+    # add some missing and zero data
+    df.loc[rng.random(len(df)) < 0.01, "eia930_profile"] = np.NaN
+    df.loc[rng.random(len(df)) < 0.05, "cems_profile"] = 0
+    return df
+
+
+def legacy_scaled_and_shifted_residual(combined_data):
+    """The groupby-and-merge implementation of the scaled and shifted residual."""
+    scaling_factors = combined_data.copy()[combined_data["cems_profile"] > 0]
+    scaling_factors["scaling_factor"] = (
+        scaling_factors["eia930_profile"] / scaling_factors["cems_profile"]
+    )
+    scaling_factors = (
+        scaling_factors.groupby(KEYS, dropna=False)["scaling_factor"]
+        .min()
+        .reset_index()
+    )
+    scaling_factors = scaling_factors[
+        (scaling_factors["scaling_factor"] < 1)
+        & (scaling_factors["scaling_factor"] > 0)
+    ]
+    combined_data = combined_data.merge(
+        scaling_factors, how="left", on=KEYS, validate="m:1"
+    )
+    combined_data["scaling_factor"] = combined_data["scaling_factor"].fillna(1)
+    combined_data["scaled_residual_profile"] = combined_data["eia930_profile"] - (
+        combined_data["cems_profile"] * combined_data["scaling_factor"]
+    )
+
+    shift_factors = combined_data.copy()[combined_data["cems_profile"] != 0]
+    shift_factors["shift_factor"] = (
+        shift_factors["eia930_profile"] - shift_factors["cems_profile"]
+    )
+    shift_factors = (
+        shift_factors.groupby(KEYS, dropna=False)["shift_factor"].min().reset_index()
+    )
+    shift_factors = shift_factors[shift_factors["shift_factor"] < 0]
+    combined_data = combined_data.merge(
+        shift_factors, how="left", on=KEYS, validate="m:1"
+    )
+    combined_data["shift_factor"] = combined_data["shift_factor"].fillna(0)
+    combined_data["shifted_residual_profile"] = combined_data["eia930_profile"] - (
+        combined_data["cems_profile"] + combined_data["shift_factor"]
+    )
+    combined_data["residual_profile"] = (
+        combined_data["eia930_profile"] - combined_data["cems_profile"]
+    )
+    return combined_data
+
+
+def legacy_profile_filters(hourly_profiles):
+    """The merge-with-indicator implementation of the profile filters."""
+    residual_filter = (
+        hourly_profiles.groupby(KEYS)["residual_profile"].min().reset_index()
+    )
+    residual_filter = residual_filter[residual_filter["residual_profile"] < 0]
+    hourly_profiles = hourly_profiles.merge(
+        residual_filter[KEYS],
+        how="outer",
+        on=KEYS,
+        indicator="negative_filter",
+        validate="m:1",
+    )
+    hourly_profiles["residual_profile_filtered"] = hourly_profiles["residual_profile"]
+    hourly_profiles.loc[
+        hourly_profiles["negative_filter"] == "both", "residual_profile_filtered"
+    ] = np.NaN
+    hourly_profiles = hourly_profiles.drop(columns=["negative_filter"])
+
+    shifted_filter = hourly_profiles.groupby(KEYS).sum(numeric_only=True).reset_index()
+    shifted_filter = shifted_filter.loc[
+        shifted_filter["shifted_residual_profile"] > shifted_filter["eia930_profile"],
+        KEYS,
+    ]
+    hourly_profiles = hourly_profiles.merge(
+        shifted_filter,
+        how="outer",
+        on=KEYS,
+        indicator="shifted_filter",
+        validate="m:1",
+    )
+    hourly_profiles["shifted_residual_profile_filtered"] = hourly_profiles[
+        "shifted_residual_profile"
+    ]
+    hourly_profiles.loc[
+        hourly_profiles["shifted_filter"] == "both", "shifted_residual_profile_filtered"
+    ] = np.NaN
+    return hourly_profiles.drop(columns=["shifted_filter"])
+
+
+def current_implementation(combined_data):
+    group_ids = impute_hourly_profiles.monthly_profile_group_ids(combined_data)
+    combined_data = impute_hourly_profiles.calculate_scaled_residual(
+        combined_data, group_ids
+    )
+    combined_data = impute_hourly_profiles.calculate_shifted_residual(
+        combined_data, group_ids
+    )
+    combined_data["residual_profile"] = (
+        combined_data["eia930_profile"] - combined_data["cems_profile"]
+    )
+    # the filters are the first step of `select_best_available_profile`
+    negative_filter = (
+        impute_hourly_profiles.broadcast_group_reduction(
+            combined_data["residual_profile"], group_ids, how="min"
+        )
+        < 0
+    )
+    combined_data["residual_profile_filtered"] = combined_data[
+        "residual_profile"
+    ].mask(negative_filter)
+    shifted_filter = impute_hourly_profiles.broadcast_group_reduction(
+        combined_data["shifted_residual_profile"], group_ids, how="sum"
+    ) > impute_hourly_profiles.broadcast_group_reduction(
+        combined_data["eia930_profile"], group_ids, how="sum"
+    )
+    combined_data["shifted_residual_profile_filtered"] = combined_data[
+        "shifted_residual_profile"
+    ].mask(shifted_filter)
+    return combined_data
+
+
+def time_function(func, df, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df.copy())
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    combined_data = create_synthetic_combined_data()
+    print(f"Benchmarking residual profile calculation on {len(combined_data):,} rows")
+
+    legacy_time, legacy = time_function(
+        lambda df: legacy_profile_filters(legacy_scaled_and_shifted_residual(df)),
+        combined_data,
+    )
+    current_time, current = time_function(current_implementation, combined_data)
+
+    # check that both implementations return the same profiles
+    columns_to_compare = [
+        "scaled_residual_profile",
+        "shifted_residual_profile",
+        "residual_profile_filtered",
+        "shifted_residual_profile_filtered",
+    ]
+    sort_keys = ["ba_code", "fuel_category", "datetime_utc"]
+    pd.testing.assert_frame_equal(
+        legacy.sort_values(sort_keys, ignore_index=True)[columns_to_compare],
+        current.sort_values(sort_keys, ignore_index=True)[columns_to_compare],
+    )
+
+    print(f"  groupby and merge:      {legacy_time:.2f} s")
+    print(f"  broadcast reductions:   {current_time:.2f} s")
+    print(f"  speedup:                {legacy_time / current_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def column_checks():
+    """Need to provide this import as a fixture to avoid complaints from the linter."""
+    sys.path.append("../")
+    import src.column_checks as column_checks
+
+    return column_checks
+
+
+@pytest.fixture
+def hourly_cems():
+    """Three days of hourly unit-level CEMS data for two units."""
+    hours = pd.date_range("2021-03-13", "2021-03-15 23:00", freq="H", tz="UTC")
+    cems = pd.DataFrame(
+        {
+            "plant_id_eia": np.repeat([1, 2], len(hours)),
+            "emissions_unit_id_epa": np.repeat(["1A", "CT2"], len(hours)),
+            "datetime_utc": np.tile(hours, 2),
+            "energy_source_code": np.repeat(["NG", "LFG"], len(hours)),
+            "fuel_consumed_mmbtu": np.linspace(0.0, 500.5, 2 * len(hours)),
+            "co2_mass_measurement_code": np.tile(
+                ["Measured", "Substitute"], len(hours)
+            ),
+        }
+    )
+    return cems
+
+
+def test_hour_ordinal_round_trip(column_checks, hourly_cems):
+    hour_ordinal = column_checks.to_hour_ordinal(hourly_cems["datetime_utc"])
+    assert hour_ordinal.dtype == "int32"
+    assert hour_ordinal.iloc[0] == (
+        pd.Timestamp("2021-03-13", tz="UTC") - pd.Timestamp("1970-01-01", tz="UTC")
+    ) // pd.Timedelta(hours=1)
+    pd.testing.assert_series_equal(
+        column_checks.from_hour_ordinal(hour_ordinal),
+        hourly_cems["datetime_utc"],
+        check_dtype=False,
+    )
+
+
+def test_hour_ordinal_requires_whole_hours(column_checks, hourly_cems):
+    datetimes = hourly_cems["datetime_utc"].copy()
+    datetimes.iloc[3] += pd.Timedelta(minutes=30)
+    assert column_checks.to_hour_ordinal(datetimes) is None
+    datetimes.iloc[3] = pd.NaT
+    assert column_checks.to_hour_ordinal(datetimes) is None
+
+
+def test_can_convert_to_float32(column_checks):
+    assert column_checks.can_convert_to_float32(pd.Series([0.1, 2.5, np.NaN, 1e6]))
+    # float32 cannot represent 100,000,001, so the total is 0 instead of 1
+    assert not column_checks.can_convert_to_float32(pd.Series([100_000_001.0, -1e8]))
+
+
+def test_apply_compact_dtypes_round_trip(column_checks, hourly_cems):
+    cems = column_checks.apply_dtypes(hourly_cems)
+    compact = column_checks.apply_dtypes(cems, compact=True)
+
+    assert compact["datetime_utc"].dtype == "int32"
+    assert compact["fuel_consumed_mmbtu"].dtype == "float32"
+    assert compact["emissions_unit_id_epa"].dtype == "category"
+    assert compact["energy_source_code"].dtype == "category"
+    assert compact["co2_mass_measurement_code"].dtype == "category"
+    assert compact.memory_usage(deep=True).sum() < cems.memory_usage(deep=True).sum()
+
+    restored = column_checks.apply_dtypes(compact)
+    pd.testing.assert_frame_equal(restored, cems, check_exact=False, rtol=1e-6)
+
+
+def test_group_compact_dtypes_by_observed_categories(column_checks, hourly_cems):
+    compact = column_checks.apply_dtypes(hourly_cems, compact=True)
+    fuel = compact.groupby(["plant_id_eia", "emissions_unit_id_epa"], observed=True)[
+        "fuel_consumed_mmbtu"
+    ].sum()
+    assert len(fuel) == 2
+    assert fuel.sum() == pytest.approx(hourly_cems["fuel_consumed_mmbtu"].sum())
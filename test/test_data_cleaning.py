@@ -0,0 +1,45 @@
+import sys
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def data_cleaning():
+    """Need to provide this import as a fixture to avoid complaints from the linter."""
+    sys.path.append("../")
+    import src.data_cleaning as data_cleaning
+
+    return data_cleaning
+
+
+def test_sum_by_keys_matches_groupby(data_cleaning):
+    dfs = [
+        pd.DataFrame(
+            {
+                "plant_id_eia": [2, 1, 2],
+                "report_date": ["b", "a", "b"],
+                "x": [1.0, 2, 3],
+            }
+        ),
+        pd.DataFrame(
+            {"plant_id_eia": [1], "report_date": ["a"], "x": [4.0], "y": [5.0]}
+        ),
+    ]
+    expected = (
+        pd.concat(dfs, ignore_index=True)
+        .groupby(["plant_id_eia", "report_date"], dropna=False)[["x", "y"]]
+        .sum()
+        .reset_index()
+    )
+
+    result = data_cleaning.sum_by_keys(dfs, ["plant_id_eia", "report_date"], ["x", "y"])
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_sum_by_keys_without_data(data_cleaning):
+    result = data_cleaning.sum_by_keys([], ["plant_id_eia", "report_date"], ["x", "y"])
+
+    assert len(result) == 0
+    assert list(result.columns) == ["plant_id_eia", "report_date", "x", "y"]
@@ -0,0 +1,176 @@
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.formula.api as smf
+
+
+@pytest.fixture
+def gross_to_net_generation():
+    """Need to provide this import as a fixture to avoid complaints from the linter."""
+    sys.path.append("../")
+    import src.gross_to_net_generation as gross_to_net_generation
+
+    return gross_to_net_generation
+
+
+@pytest.fixture
+def monthly_gen_data():
+    """Monthly gross and net generation for several subplants, some with outliers."""
+    rng = np.random.default_rng(0)
+    subplants = []
+    for subplant_id, number_of_months in enumerate([12, 12, 24, 36, 6, 4]):
+        gross = rng.gamma(2.0, 50.0, number_of_months)
+        net = 0.9 * gross - 2.0 + rng.normal(0, 1.0, number_of_months)
+        if subplant_id in [1, 3]:
+            net[0] += 100.0
+            net[1] -= 40.0
+        subplants.append(
+            pd.DataFrame(
+                {
+                    "plant_id_eia": 1,
+                    "subplant_id": subplant_id,
+                    "gross_generation_mw": gross,
+                    "net_generation_mw": net,
+                }
+            )
+        )
+    return pd.concat(subplants, ignore_index=True)
+
+
+def statsmodels_gross_to_net(df):
+    """The statsmodels regression with recursive outlier removal."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = smf.ols("net_generation_mw ~ gross_generation_mw", data=df).fit()
+        for _ in range(2):
+            student_resid = model.outlier_test()["student_resid"]
+            if abs(student_resid).max() <= 3:
+                break
+            df = df[~df.index.isin(student_resid[abs(student_resid) > 3].index)]
+            model = smf.ols("net_generation_mw ~ gross_generation_mw", data=df).fit()
+    return model
+
+
+def test_batched_linear_regression_matches_statsmodels(
+    gross_to_net_generation, monthly_gen_data
+):
+    group_ids = monthly_gen_data["subplant_id"].to_numpy()
+    result = gross_to_net_generation.batched_linear_regression(
+        monthly_gen_data["gross_generation_mw"].to_numpy(),
+        monthly_gen_data["net_generation_mw"].to_numpy(),
+        group_ids,
+        group_ids.max() + 1,
+    )
+
+    for subplant_id, df in monthly_gen_data.groupby("subplant_id"):
+        model = smf.ols("net_generation_mw ~ gross_generation_mw", data=df).fit()
+        assert np.isclose(result["intercept"][subplant_id], model.params[0])
+        assert np.isclose(result["slope"][subplant_id], model.params[1])
+        assert np.isclose(result["rsquared"][subplant_id], model.rsquared)
+        assert np.isclose(result["rsquared_adj"][subplant_id], model.rsquared_adj)
+        assert result["observations"][subplant_id] == model.nobs
+        assert np.allclose(
+            result["student_resid"][group_ids == subplant_id],
+            model.outlier_test()["student_resid"],
+        )
+
+
+def test_batched_linear_regression_ignores_unused_observations(
+    gross_to_net_generation, monthly_gen_data
+):
+    use_observation = np.arange(len(monthly_gen_data)) % 3 != 0
+    group_ids = monthly_gen_data["subplant_id"].to_numpy()
+    result = gross_to_net_generation.batched_linear_regression(
+        monthly_gen_data["gross_generation_mw"].to_numpy(),
+        monthly_gen_data["net_generation_mw"].to_numpy(),
+        group_ids,
+        group_ids.max() + 1,
+        use_observation,
+    )
+
+    assert np.isnan(result["student_resid"][~use_observation]).all()
+    for subplant_id, df in monthly_gen_data[use_observation].groupby("subplant_id"):
+        model = smf.ols("net_generation_mw ~ gross_generation_mw", data=df).fit()
+        assert np.isclose(result["slope"][subplant_id], model.params[1])
+        assert result["observations"][subplant_id] == model.nobs
+
+
+def test_model_gross_to_net_removes_outliers_like_statsmodels(
+    gross_to_net_generation, monthly_gen_data
+):
+    # add a subplant with a single observation, which can't be modeled
+    monthly_gen_data = pd.concat(
+        [
+            monthly_gen_data,
+            pd.DataFrame(
+                {
+                    "plant_id_eia": [1],
+                    "subplant_id": [99],
+                    "gross_generation_mw": [10.0],
+                    "net_generation_mw": [9.0],
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+    gtn_regression = gross_to_net_generation.model_gross_to_net(
+        monthly_gen_data, ["plant_id_eia", "subplant_id"]
+    ).set_index("subplant_id")
+
+    assert 99 not in gtn_regression.index
+    for subplant_id, df in monthly_gen_data.groupby("subplant_id"):
+        if subplant_id == 99:
+            continue
+        model = statsmodels_gross_to_net(df)
+        assert np.isclose(gtn_regression.loc[subplant_id, "slope"], model.params[1])
+        assert np.isclose(gtn_regression.loc[subplant_id, "intercept"], model.params[0])
+        assert np.isclose(
+            gtn_regression.loc[subplant_id, "rsquared_adj"],
+            model.rsquared_adj,
+            equal_nan=True,
+        )
+        assert gtn_regression.loc[subplant_id, "observations"] == model.nobs
+
+
+def test_multiyear_gtn_factors_from_store(
+    gross_to_net_generation, monthly_gen_data, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(
+        gross_to_net_generation, "outputs_folder", lambda rel="": str(tmp_path / rel)
+    )
+    # add the same subplants to the store for two years, each with 720 hours per month
+    monthly_gen_data["data_source"] = "both"
+    monthly_gen_data["hours_in_month_subplant"] = 720
+    monthly_gen_data["gross_generation_mwh"] = (
+        monthly_gen_data["gross_generation_mw"] * 720
+    )
+    monthly_gen_data["net_generation_mwh"] = monthly_gen_data["net_generation_mw"] * 720
+    for year in [2020, 2021]:
+        monthly_gen_data["report_date"] = pd.Timestamp(
+            f"{year}-01-01"
+        ) + pd.to_timedelta(
+            monthly_gen_data.groupby("subplant_id").cumcount(), unit="D"
+        )
+        gross_to_net_generation.update_gtn_store(monthly_gen_data, year)
+
+    multiyear_factors = gross_to_net_generation.calculate_multiyear_gtn_factors(
+        2021, 2
+    ).set_index("subplant_id")
+
+    subplant_totals = monthly_gen_data.groupby("subplant_id")[
+        ["gross_generation_mwh", "net_generation_mwh"]
+    ].sum()
+    assert np.allclose(
+        multiyear_factors["multiyear_subplant_ratio"],
+        subplant_totals["net_generation_mwh"] / subplant_totals["gross_generation_mwh"],
+    )
+    # each month of the subplants without outliers is used once in each year
+    subplant_months = monthly_gen_data.groupby("subplant_id").size()
+    for subplant_id in [0, 2, 4, 5]:
+        assert (
+            multiyear_factors.loc[subplant_id, "subplant_regression_observations"]
+            == 2 * subplant_months[subplant_id]
+        )
@@ -0,0 +1,109 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def impute_hourly_profiles():
+    """Need to provide this import as a fixture to avoid complaints from the linter."""
+    sys.path.append("../")
+    import src.impute_hourly_profiles as impute_hourly_profiles
+
+    return impute_hourly_profiles
+
+
+@pytest.fixture
+def partial_cems_subplant_data(impute_hourly_profiles):
+    """One month of hourly CEMS data for three subplants, and EIA totals to scale to."""
+    hours = pd.date_range("2021-02-01", "2021-02-28 23:00", freq="H", tz="UTC")
+    cems = []
+    for subplant_id, gross_generation, fuel in [
+        (1, 10.0, 100.0),
+        (2, 0.0, 50.0),
+        (3, 0.0, 0.0),
+    ]:
+        subplant = pd.DataFrame({"datetime_utc": hours})
+        subplant["report_date"] = pd.Timestamp("2021-02-01")
+        subplant["plant_id_eia"] = 1
+        subplant["subplant_id"] = subplant_id
+        subplant["gross_generation_mwh"] = gross_generation
+        subplant["steam_load_1000_lb"] = 0.0
+        subplant["fuel_consumed_mmbtu"] = fuel
+        subplant["co2_mass_lb"] = fuel * 100
+        cems.append(subplant)
+    cems = pd.concat(cems, ignore_index=True)
+    cems[["plant_id_eia", "subplant_id"]] = cems[
+        ["plant_id_eia", "subplant_id"]
+    ].astype("Int32")
+
+    eia923_allocated = pd.DataFrame(
+        {
+            "report_date": pd.Timestamp("2021-02-01"),
+            "plant_id_eia": [1, 1, 1],
+            "subplant_id": [1, 2, 3],
+            "hourly_data_source": "partial_cems_subplant",
+        }
+    )
+    for column in impute_hourly_profiles.DATA_COLUMNS:
+        eia923_allocated[column] = [2.0 * len(hours), 672.0, 0.0]
+    eia923_allocated["net_generation_mwh"] = [len(hours) * 5.0, 672.0, -672.0]
+
+    return cems, eia923_allocated
+
+
+def test_shape_partial_cems_subplants(
+    impute_hourly_profiles, partial_cems_subplant_data
+):
+    cems, eia923_allocated = partial_cems_subplant_data
+    remaining_cems, shaped = impute_hourly_profiles.shape_partial_cems_subplants(
+        cems, eia923_allocated
+    )
+
+    assert len(remaining_cems) == 0
+    shaped = shaped.set_index("subplant_id")
+    # subplant 1: both totals are positive, so the data is scaled
+    assert np.allclose(shaped.loc[1, "net_generation_mwh"], 5.0)
+    assert np.allclose(shaped.loc[1, "co2_mass_lb"], 2.0)
+    # subplant 2: no gross generation, so net generation is shaped using fuel
+    assert np.allclose(shaped.loc[2, "net_generation_mwh"], 1.0)
+    assert np.allclose(shaped.loc[2, "co2_mass_lb"], 1.0)
+    # subplant 3: negative net generation is shifted, and zero totals stay zero
+    assert np.allclose(shaped.loc[3, "net_generation_mwh"], -1.0)
+    assert np.allclose(shaped.loc[3, "co2_mass_lb"], 0.0)
+
+
+def test_shape_monthly_eia_data_with_empty_profiles(impute_hourly_profiles):
+    hourly_profiles = pd.DataFrame(
+        {
+            "ba_code": pd.Series(dtype="str"),
+            "fuel_category": pd.Series(dtype="str"),
+            "report_date": pd.Series(dtype="datetime64[ns]"),
+            "datetime_utc": pd.Series(dtype="datetime64[ns, UTC]"),
+            "profile": pd.Series(dtype="float64"),
+            "flat_profile": pd.Series(dtype="float64"),
+            "profile_method": pd.Series(dtype="str"),
+        }
+    )
+    profile_index = impute_hourly_profiles.index_hourly_profiles(hourly_profiles)
+    assert len(profile_index["keys"]) == 0
+    assert len(profile_index["keys"]["start"]) == 0
+    assert len(profile_index["profile"]) == 0
+
+    monthly_eia_data = pd.DataFrame(
+        {
+            "plant_id_eia": [1],
+            "ba_code": ["ABC"],
+            "fuel_category": ["natural_gas"],
+            "report_date": pd.to_datetime(["2021-02-01"]),
+        }
+    )
+    for column in impute_hourly_profiles.DATA_COLUMNS:
+        monthly_eia_data[column] = 10.0
+    shaped = impute_hourly_profiles.shape_monthly_eia_data_as_hourly(
+        monthly_eia_data, hourly_profiles, profile_index
+    )
+    # plant-months without a profile are kept as a single row with missing data
+    assert len(shaped) == 1
+    assert shaped["net_generation_mwh"].isna().all()